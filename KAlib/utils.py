@@ -1,20 +1,20 @@
 import streamlit as st
 from typing import List, Dict, Any, Optional
 
-def display_session_msg(container_obj, user_image: Optional[str] = None):
-    # Initialize messages list if not present
-    messages = st.session_state.setdefault("messages", [])
+from coding.chatstore import RENDER_WINDOW, windowed_messages
 
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
+def display_session_msg(container_obj, user_image: Optional[str] = None, window: int = RENDER_WINDOW):
+    # Only the newest `window` messages are materialized; older ones are paged in on request
+    for msg in windowed_messages(container_obj, window):
+        role = msg.role
+        content = msg.markdown
         avatar = None
 
         # Determine avatar to use
         if role == "user":
             avatar = user_image
         elif role not in ["user", "assistant"]:
-            avatar = msg.get("image", None)
+            avatar = msg.image
 
         # Display message
         if avatar:
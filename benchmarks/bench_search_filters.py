@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: search_news section/date filtering on a raw DataFrame versus a NewsCorpus.
+
+Usage:
+    python benchmarks/bench_search_filters.py [--rows 100000] [--repeat 20]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coding.tools import NewsCorpus, search_news  # noqa: E402
+
+SECTIONS = ['Taiwan News', 'World News', 'Sports', 'Front Page', 'Features',
+            'Editorials', 'Business', 'Bilingual Pages']
+
+CASES = {
+    "one section": dict(sections=['Sports']),
+    "week": dict(date_from='2024-06-01', date_to='2024-06-07'),
+    "section + week": dict(sections=['Business', 'Sports'], date_from='2024-06-01', date_to='2024-06-07'),
+    "since date, all rows": dict(date_from='2024-01-01', news_number=None),
+}
+
+
+def synthetic_news(rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2020-01-01', '2025-12-31', freq='D')
+    return pd.DataFrame({
+        'ar_id': np.arange(rows, 0, -1),
+        'ar_section': rng.choice(SECTIONS, size=rows),
+        'ar_pubdate': rng.choice(days, size=rows).astype('datetime64[s]').astype(str),
+        'ar_head': [f"headline {i}" for i in range(rows)],
+        'ar_desc': [f"description {i}" for i in range(rows)],
+    })
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # search_news calls st.info outside a Streamlit session
+
+    df = synthetic_news(args.rows)
+    start = time.perf_counter()
+    corpus = NewsCorpus(df)
+    print(f"{args.rows} rows, NewsCorpus build: {(time.perf_counter() - start) * 1e3:.1f} ms (once per corpus)")
+    print(f"{'case':<24}{'raw frame':>14}{'NewsCorpus':>14}{'speedup':>10}")
+    for name, kwargs in CASES.items():
+        raw = best_of(lambda: search_news(df, **kwargs), args.repeat)
+        fast = best_of(lambda: search_news(corpus, **kwargs), args.repeat)
+        print(f"{name:<24}{raw * 1e3:>11.2f} ms{fast * 1e3:>11.2f} ms{raw / fast:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Regression gate: compare two run_suite.py JSON files.
+
+Exits with status 1 when any benchmark present in both runs got slower than the
+baseline by more than the threshold:
+
+    python benchmarks/compare.py baseline.json current.json [--threshold 0.2] [--min-ms 0.5]
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown, as a fraction")
+    parser.add_argument("--min-ms", type=float, default=0.5,
+                        help="Ignore benchmarks faster than this in both runs (timer noise)")
+    parser.add_argument("--metric", choices=["best_s", "median_s"], default="best_s")
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    base_results, cur_results = baseline["results"], current["results"]
+    print(f"baseline {baseline['meta'].get('commit', '?')}  vs  current {current['meta'].get('commit', '?')}")
+
+    regressions = []
+    width = max((len(name) for name in cur_results), default=0)
+    for name, cur in cur_results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<{width}}  new")
+            continue
+        before, after = base[args.metric], cur[args.metric]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if max(before, after) * 1000 >= args.min_ms and change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<{width}}  {before * 1e3:10.3f} ms -> {after * 1e3:10.3f} ms  {change:+7.1%}{flag}")
+    for name in base_results.keys() - cur_results.keys():
+        print(f"{name:<{width}}  missing from current run")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Offline evaluation of the local intent classifier against LLM labels.
+
+Reads a JSONL file of {"prompt": ..., "job": <label the LLM gave>} records and
+reports how much traffic the local fast path answers, how often it agrees with
+the LLM, and how long a local classification takes:
+
+    python benchmarks/eval_intent.py --labels intent_labels.jsonl --min-accuracy 0.9
+
+To build the labels file, label a plain-text list of prompts (one per line)
+with the same classification prompt the app escalates with (needs OPEN_API_KEY):
+
+    python benchmarks/eval_intent.py --collect prompts.txt --labels intent_labels.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from coding.intent import INTENT_CLASSIFIER, build_classification_prompt, parse_job  # noqa: E402
+
+LABEL_MODEL = "gpt-4o-mini"
+
+
+def collect_labels(prompts_path: str, labels_path: str):
+    """
+    Label every prompt in `prompts_path` with the LLM and append the records to `labels_path`.
+    """
+    from autogen import ConversableAgent, LLMConfig
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+    with LLMConfig(api_type="openai", model=LABEL_MODEL, api_key=os.getenv("OPEN_API_KEY")):
+        labeler = ConversableAgent(name="Intent_Labeler", human_input_mode="NEVER")
+
+    with open(prompts_path, encoding="utf-8") as f:
+        prompts = [line.strip() for line in f if line.strip()]
+    with open(labels_path, "a", encoding="utf-8") as out:
+        for prompt in prompts:
+            reply = labeler.generate_reply(messages=[{"role": "user", "content": build_classification_prompt(prompt)}])
+            reply = reply.get("content") if isinstance(reply, dict) else reply
+            out.write(json.dumps({"prompt": prompt, "job": parse_job(reply or "")}, ensure_ascii=False) + "\n")
+    print(f"Labelled {len(prompts)} prompts into {labels_path}")
+
+
+def evaluate(records: List[Dict[str, str]]) -> Dict[str, object]:
+    sources: Counter = Counter()
+    mistakes: Counter = Counter()
+    correct = 0
+    timings = []
+    for record in records:
+        started = time.perf_counter()
+        intent = INTENT_CLASSIFIER.classify(record["prompt"])
+        timings.append((time.perf_counter() - started) * 1e6)
+        if intent is None:
+            sources["llm"] += 1
+            continue
+        sources[intent.source] += 1
+        if intent.job == record["job"]:
+            correct += 1
+        else:
+            mistakes[f"{record['job']} -> {intent.job}"] += 1
+
+    local = sum(n for source, n in sources.items() if source != "llm")
+    timings.sort()
+    return {
+        "prompts": len(records),
+        "local_share": round(local / len(records), 3) if records else 0.0,
+        "by_source": dict(sources),
+        "local_accuracy": round(correct / local, 3) if local else None,
+        # Escalated prompts get the LLM's own label, so only local answers can disagree
+        "routed_accuracy": round((correct + sources["llm"]) / len(records), 3) if records else None,
+        "local_mistakes": dict(mistakes.most_common()),
+        "latency_us": {
+            "p50": round(statistics.median(timings), 1) if timings else None,
+            "p99": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 1) if timings else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", required=True, help="JSONL file of {prompt, job} records labelled by the LLM")
+    parser.add_argument("--collect", metavar="PROMPTS", help="Label the prompts in this text file first")
+    parser.add_argument("--min-accuracy", type=float, default=None, help="Fail when local accuracy is lower")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if args.collect:
+        collect_labels(args.collect, args.labels)
+
+    with open(args.labels, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    skipped = [r for r in records if not r.get("job")]
+    if skipped:
+        logging.warning(f"Skipping {len(skipped)} records without an LLM label")
+    report = evaluate([r for r in records if r.get("job")])
+
+    print(f"Prompts:          {report['prompts']}")
+    print(f"Handled locally:  {report['local_share']:.1%}  {report['by_source']}")
+    print(f"Local accuracy:   {report['local_accuracy']}")
+    print(f"Routed accuracy:  {report['routed_accuracy']}")
+    print(f"Local latency:    p50 {report['latency_us']['p50']} us, p99 {report['latency_us']['p99']} us")
+    for mistake, count in report["local_mistakes"].items():
+        print(f"    {count:4d}  {mistake}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.min_accuracy is not None and (report["local_accuracy"] or 0.0) < args.min_accuracy:
+        print(f"FAIL: local accuracy below {args.min_accuracy}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
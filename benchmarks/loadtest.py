@@ -0,0 +1,197 @@
+"""
+Offline load test of the two-agent conversation.
+
+Runs many student/teacher conversations through the page's own agents, tools and
+agent pool, with the deterministic local model (coding/localllm.py) in place of
+OpenAI/Gemini and the canned news server (benchmarks/newsserver.py) behind
+AG_search_news. Reports how much of every turn is spent outside the model, in the
+tools and in the framework:
+
+    python benchmarks/loadtest.py --conversations 200 --concurrency 16
+    python benchmarks/loadtest.py --latency-ms 0 --tps 0        # framework overhead only
+    python benchmarks/loadtest.py --transcript transcripts/<id>.json --json load.json
+    python benchmarks/loadtest.py --fallback-latency-ms 100 --error-rate 0.2   # hedging and failover
+
+Transcripts are recorded by running the two-agent page with TRANSCRIPT_DIR set. With a
+fallback model, hedged calls that lose the race still count as model time, so the
+framework overhead is understated.
+"""
+import argparse
+import functools
+import importlib.util
+import json
+import logging
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from newsserver import NewsServer  # noqa: E402
+
+_tool_lock = threading.Lock()
+_tool_stats = {"calls": 0, "seconds": 0.0}
+
+
+def load_page(path: str):
+    spec = importlib.util.spec_from_file_location("two_agents_page", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed_tool(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with _tool_lock:
+                _tool_stats["calls"] += 1
+                _tool_stats["seconds"] += time.perf_counter() - start
+    return wrapper
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-turns", type=int, default=10)
+    parser.add_argument("--transcript", help="Recorded transcript to replay (default: built-in script)")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Model latency before the first token")
+    parser.add_argument("--tps", type=float, default=80.0, help="Model tokens per second; 0 is instant")
+    parser.add_argument("--reply-tokens", type=int, default=300)
+    parser.add_argument("--news-latency-ms", type=float, default=50.0)
+    parser.add_argument("--rps", type=float, default=0.0,
+                        help="Model requests per second allowed by the client pool; 0 is unlimited")
+    parser.add_argument("--max-llm-concurrency", type=int, default=None,
+                        help="Model calls in flight (default: LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--fallback-latency-ms", type=float, default=None,
+                        help="Add a second local model with this latency as the fallback provider")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of the primary model's calls failing with a 429")
+    parser.add_argument("--hedge-after-ms", type=float, default=None,
+                        help="Hedge delay until the router has measured a provider (default: LLM_HEDGE_AFTER)")
+    parser.add_argument("--summary", choices=("none", "last_msg", "extractive", "llm"), default=None,
+                        help="Summary mode of every conversation (default: the page's SUMMARY_MODE)")
+    parser.add_argument("--lang", default="English")
+    parser.add_argument("--json", dest="json_path", help="Write the summary to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    # Wrapping the registered tools for timing re-registers them on purpose
+    warnings.filterwarnings("ignore", message="Function '.*' is being overridden")
+
+    # Read by coding.localllm, coding.llmpool, coding.llmrouter and coding.tools at import time
+    os.environ.update({
+        "LOCAL_LLM_LATENCY": str(args.latency_ms / 1000),
+        "LOCAL_LLM_TPS": str(args.tps),
+        "LOCAL_LLM_REPLY_TOKENS": str(args.reply_tokens),
+        "LLM_REQUESTS_PER_SECOND": str(args.rps),
+    })
+    if args.max_llm_concurrency is not None:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.max_llm_concurrency)
+    if args.hedge_after_ms is not None:
+        os.environ["LLM_HEDGE_AFTER"] = str(args.hedge_after_ms / 1000)
+    if args.transcript:
+        os.environ["LOCAL_LLM_TRANSCRIPT"] = os.path.abspath(args.transcript)
+
+    with NewsServer(latency=args.news_latency_ms / 1000) as server:
+        os.environ["TAIPEI_TIMES_BASE_URL"] = server.base_url
+        page = load_page(os.path.join(ROOT, "pages", "two_agents.py"))
+        from autogen.io.base import IOStream
+        from coding.agentpool import AgentPool
+        from coding.llmpool import LLM_POOL
+        from coding.localllm import local_llm_config, local_llm_stats, reset_local_llm_stats
+        from coding.streaming import ChunkStream
+        from coding.summaries import summary_method
+
+        # Keep autogen's per-message console output (tool calls and results) out of the report
+        IOStream.set_global_default(ChunkStream(queue.Queue()))
+
+        # Stand-ins for the two providers: the primary, failing as asked, and an optional fallback
+        configs = page.get_llm_configs()
+        configs["local"] = local_llm_config(error_rate=args.error_rate)
+        fallback_key = None
+        if args.fallback_latency_ms is not None:
+            configs["local_backup"] = local_llm_config(model="local-backup", latency=args.fallback_latency_ms / 1000)
+            fallback_key = "local_backup"
+
+        def build():
+            group = page.build_agent_group(args.lang, "local", fallback_key, page.TOOL_MEMO)
+            student_agent = group[0]
+            student_agent.register_function(
+                {name: timed_tool(func) for name, func in student_agent.function_map.items()})
+            return group
+
+        summary_mode = args.summary or page.SUMMARY_MODE
+        pool = AgentPool(build, reset=page.reset_agents, max_idle=args.concurrency)
+
+        def converse(i):
+            message = page.prompt_with_history(f"Tell me about Taiwan ({i})", "")
+            start = time.perf_counter()
+            with pool.lease() as (student_agent, teacher_agent, _):
+                result = student_agent.initiate_chat(
+                    teacher_agent, message=message, summary_method=summary_method(summary_mode),
+                    max_turns=args.max_turns, silent=True)
+            return time.perf_counter() - start, len(result.chat_history)
+
+        # One conversation first: imports autogen before threads race for it and warms the news cache
+        converse(-1)
+        reset_local_llm_stats()
+        _tool_stats.update(calls=0, seconds=0.0)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="conversation") as executor:
+            runs = list(executor.map(converse, range(args.conversations)))
+        elapsed = time.perf_counter() - start
+        news_requests = server.requests
+
+    walls = [wall for wall, _ in runs]
+    messages = sum(count for _, count in runs)
+    model = local_llm_stats()
+    overhead = sum(walls) - model["simulated_seconds"] - _tool_stats["seconds"]
+    summary = {
+        "conversations": args.conversations,
+        "concurrency": args.concurrency,
+        "summary_mode": summary_mode,
+        "elapsed_s": elapsed,
+        "conversations_per_s": args.conversations / elapsed,
+        "conversation_p50_s": statistics.median(walls),
+        "conversation_p95_s": percentile(walls, 0.95),
+        "messages": messages,
+        "model_calls": model["calls"],
+        "replayed_replies": model["replayed"],
+        "prompt_tokens": model["prompt_tokens"],
+        "completion_tokens": model["completion_tokens"],
+        "model_s_per_call": model["simulated_seconds"] / max(1, model["calls"]),
+        "tool_calls": _tool_stats["calls"],
+        "tool_s_per_call": _tool_stats["seconds"] / max(1, _tool_stats["calls"]),
+        "framework_s_per_model_call": overhead / max(1, model["calls"]),
+        "news_requests": news_requests,
+        "agent_pool": pool.stats(),
+        "model_errors": model["errors"],
+        "llm_pool": LLM_POOL.stats(),
+        "providers": LLM_POOL.provider_stats(),
+    }
+    for key, value in summary.items():
+        print(f"{key:<28} {value:.4f}" if isinstance(value, float) else f"{key:<28} {value}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
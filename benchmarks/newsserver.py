@@ -0,0 +1,135 @@
+"""
+Local stand-in for the Taipei Times ajax_json API.
+
+Serves canned news pages at /ajax_json/<page>/list/ (and /list/<type>/) with a
+configurable per-request latency, so fetch_all_news and the news cache can be
+measured without the network:
+
+    python benchmarks/newsserver.py --port 8765 --latency-ms 120
+    TAIPEI_TIMES_BASE_URL=http://127.0.0.1:8765/ajax_json streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+SECTIONS = ['Taiwan News', 'World News', 'Sports', 'Front Page', 'Features',
+            'Editorials', 'Business', 'Bilingual Pages']
+ITEMS_PER_PAGE = 20
+
+_PATH_RE = re.compile(r"^/ajax_json/(\d+)/list/(?:([\w-]+)/)?$")
+
+
+def canned_page(page: int, items: int = ITEMS_PER_PAGE) -> List[Dict[str, object]]:
+    """
+    One page of news records shaped like the Taipei Times API; newest (highest ar_id) on page 1.
+    """
+    first = 1_000_000 - (page - 1) * items
+    records = []
+    for ar_id in range(first, first - items, -1):
+        day = 1 + ar_id % 28
+        records.append({
+            "ar_id": ar_id,
+            "ar_head": f"Headline {ar_id} about Taiwan technology and society",
+            "ar_desc": f"Description of article {ar_id}: digital platforms, policy and communities. " * 3,
+            "ar_pubdate": f"2024-06-{day:02d} 08:00:00",
+            "ar_section": SECTIONS[ar_id % len(SECTIONS)],
+            "url": f"https://www.taipeitimes.com/News/taiwan/archives/2024/06/{day:02d}/{ar_id}",
+        })
+    return records
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # A full round of concurrent page fetches connects at once; the default backlog of 5
+    # would make the rest wait out a SYN retransmit
+    request_queue_size = 128
+
+
+class NewsServer:
+    """
+    Threaded HTTP server on localhost serving canned pages after `latency` seconds.
+
+    Usable as a context manager; `base_url` is what fetch_news_json expects.
+    """
+
+    def __init__(self, latency: float = 0.0, items: int = ITEMS_PER_PAGE, port: int = 0):
+        self.latency = latency
+        self.items = items
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._pages: Dict[int, bytes] = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = _PATH_RE.match(self.path)
+                if not match:
+                    self.send_error(404)
+                    return
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.page_bytes(int(match.group(1)))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _HTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def page_bytes(self, page: int) -> bytes:
+        with self._lock:
+            body = self._pages.get(page)
+        if body is None:
+            body = json.dumps(canned_page(page, self.items)).encode("utf-8")
+            with self._lock:
+                self._pages[page] = body
+        return body
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/ajax_json"
+
+    def start(self) -> "NewsServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="news-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "NewsServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--items", type=int, default=ITEMS_PER_PAGE)
+    args = parser.parse_args()
+    server = NewsServer(latency=args.latency_ms / 1000, items=args.items, port=args.port)
+    print(f"Serving canned news at {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
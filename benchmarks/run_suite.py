@@ -0,0 +1,179 @@
+"""
+Benchmark suite for the search and fetch hot paths.
+
+Covers search_news on synthetic corpora (raw frame, NewsCorpus and ranked index
+paths, several filter combinations), the catalog searches, the AG_* tool
+wrappers, fetch_all_news against a local canned news server with configurable
+latency, and json_to_dataframe on large payloads. Results are written as JSON
+for benchmarks/compare.py:
+
+    python benchmarks/run_suite.py --json bench.json
+    python benchmarks/run_suite.py --quick --json bench.json   # 1k and 10k rows only
+    python benchmarks/compare.py baseline.json bench.json --threshold 0.25
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# coding.tools reads TAIPEI_TIMES_BASE_URL at import, so it (and the benchmarks
+# importing it) is only imported once the local news server is up
+from newsserver import NewsServer, canned_page  # noqa: E402
+
+ROW_COUNTS = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_ROW_COUNTS = [1_000, 10_000]
+QUERY = "headline 123"
+FETCH_PAGES = 10
+
+Results = Dict[str, Dict[str, float]]
+
+
+def timed(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"best_s": min(timings), "median_s": statistics.median(timings), "repeat": repeat}
+
+
+def once(fn: Callable[[], object]) -> Dict[str, float]:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"best_s": elapsed, "median_s": elapsed, "repeat": 1}
+
+
+def bench_search_news(rows: int, repeat: int, results: Results):
+    from bench_search_filters import CASES as FILTER_CASES, synthetic_news
+    from coding.newsindex import NewsIndex
+    from coding.tools import NewsCorpus, search_news
+
+    df = synthetic_news(rows)
+    corpus_holder: List[NewsCorpus] = []
+    results[f"search_news[{rows}]/build corpus"] = once(lambda: corpus_holder.append(NewsCorpus(df)))
+    corpus = corpus_holder[0]
+    index_holder: List[NewsIndex] = []
+    results[f"search_news[{rows}]/build index"] = once(lambda: index_holder.append(NewsIndex.build(corpus.df)))
+    index = index_holder[0]
+
+    # Fewer repetitions on the big corpora keep the suite's runtime bounded
+    repeat = max(3, min(repeat, 2_000_000 // rows))
+    cases = dict(FILTER_CASES)
+    cases["query"] = dict(query=QUERY)
+    cases["query + section"] = dict(query=QUERY, sections=['Sports', 'Business'])
+    for name, kwargs in cases.items():
+        results[f"search_news[{rows}]/raw/{name}"] = timed(lambda: search_news(df, **kwargs), repeat)
+        results[f"search_news[{rows}]/corpus/{name}"] = timed(lambda: search_news(corpus, **kwargs), repeat)
+        if "query" in kwargs:
+            results[f"search_news[{rows}]/index/{name}"] = timed(
+                lambda: search_news(corpus, index=index, **kwargs), repeat)
+
+
+def bench_catalogs(repeat: int, results: Results):
+    from coding.agenttools import AG_search_expert, AG_search_textbook
+    from coding.tools import search_expert, search_textbook
+
+    disciplines = ["Digital Sociology", "Technology and Society", "Computational Social Science"]
+    results["search_expert/discipline"] = timed(lambda: search_expert(discipline="Digital Sociology"), repeat)
+    results["search_expert/name"] = timed(lambda: search_expert(name="Gild"), repeat)
+    results["search_textbook/discipline"] = timed(lambda: search_textbook(discipline="Digital Sociology"), repeat)
+    results["AG_search_expert/3 disciplines"] = timed(lambda: AG_search_expert(discipline=disciplines), repeat)
+    results["AG_search_textbook/3 disciplines"] = timed(lambda: AG_search_textbook(discipline=disciplines), repeat)
+
+
+def bench_ag_search_news(repeat: int, results: Results):
+    from coding.agenttools import AG_search_news
+    from coding.newscache import NEWS_CACHE
+
+    NEWS_CACHE.invalidate()
+    results["AG_search_news/cold (fetch + index)"] = once(lambda: AG_search_news(query="Taiwan"))
+    results["AG_search_news/warm query"] = timed(lambda: AG_search_news(query="technology"), repeat)
+    results["AG_search_news/warm sections"] = timed(
+        lambda: AG_search_news(sections=["Sports", "Business"], date_from="2024-06-01"), repeat)
+
+
+def bench_fetch(server: NewsServer, results: Results):
+    from coding.tools import fetch_all_news
+
+    latency_ms = round(server.latency * 1000)
+    for workers in (1, 8):
+        results[f"fetch_all_news/{FETCH_PAGES} pages, {latency_ms} ms latency, {workers} workers"] = timed(
+            lambda: fetch_all_news(1, FETCH_PAGES, max_workers=workers, base_url=server.base_url), repeat=3)
+
+
+def bench_json_to_dataframe(repeat: int, results: Results):
+    from coding.tools import json_to_dataframe
+
+    for records in (10_000, 100_000):
+        payload = canned_page(1, records)
+        results[f"json_to_dataframe/{records} records"] = timed(lambda: json_to_dataframe(payload),
+                                                               max(3, repeat // 5))
+
+
+def metadata() -> Dict[str, str]:
+    import numpy
+    import pandas
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "machine": f"{platform.system()} {platform.machine()}",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=lambda v: [int(x) for x in v.split(",")], default=None,
+                        help="Comma-separated corpus sizes (default: 1k,10k,100k,1M)")
+    parser.add_argument("--quick", action="store_true", help="Only the 1k and 10k corpora")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latency of the local news server")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # search_news calls st.info outside a Streamlit session
+
+    rows = args.rows or (QUICK_ROW_COUNTS if args.quick else ROW_COUNTS)
+    results: Results = {}
+    with NewsServer(latency=args.latency_ms / 1000) as server:
+        # Every fetch, including the news cache behind AG_search_news, goes to the local server
+        os.environ["TAIPEI_TIMES_BASE_URL"] = server.base_url
+        for count in rows:
+            bench_search_news(count, args.repeat, results)
+        bench_catalogs(args.repeat * 10, results)
+        bench_ag_search_news(args.repeat, results)
+        bench_fetch(server, results)
+        bench_json_to_dataframe(args.repeat, results)
+
+    width = max(len(name) for name in results)
+    for name, r in results.items():
+        print(f"{name:<{width}}  best {r['best_s'] * 1e3:10.3f} ms   median {r['median_s'] * 1e3:10.3f} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup-time report for the Streamlit entry points.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`,
+prints the slowest top-level packages, and fails when a budget is exceeded or a
+heavy dependency is loaded eagerly. Intended to run in CI:
+
+    python benchmarks/startup_report.py --max-ms 2000 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["streamlit_app.py", os.path.join("pages", "two_agents.py")]
+# Must not be imported just to render a page; they load when a prompt is sent
+DEFERRED = ["autogen", "openai", "pandas", "dotenv"]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+_IMPORT_SNIPPET = (
+    "import importlib.util, sys; sys.path.insert(0, {root!r}); "
+    "spec = importlib.util.spec_from_file_location('entry_point', {path!r}); "
+    "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)"
+)
+
+
+def measure(entry_point: str) -> Dict[str, object]:
+    """
+    Import `entry_point` without running main() and collect per-package import times.
+    """
+    path = os.path.join(ROOT, entry_point)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _IMPORT_SNIPPET.format(root=ROOT, path=path)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {entry_point} failed:\n{proc.stderr[-2000:]}")
+
+    packages: Dict[str, int] = {}
+    imported = set()
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        imported.add(name)
+        if len(indent) <= 1:  # top-level import of this process
+            top = name.split(".")[0]
+            packages[top] = packages.get(top, 0) + int(cumulative)
+    return {
+        "entry_point": entry_point,
+        "total_ms": round(sum(packages.values()) / 1000, 1),
+        "packages_ms": {k: round(v / 1000, 1) for k, v in sorted(packages.items(), key=lambda kv: -kv[1])},
+        "eager_deferred": [name for name in DEFERRED if name in imported],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if an entry point imports slower than this.")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list per entry point.")
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this file.")
+    args = parser.parse_args()
+
+    reports: List[Dict[str, object]] = [measure(entry) for entry in ENTRY_POINTS]
+    failures = []
+    for report in reports:
+        print(f"{report['entry_point']}: {report['total_ms']} ms")
+        for name, ms in list(report["packages_ms"].items())[:args.top]:
+            print(f"    {name:<28}{ms:>10.1f} ms")
+        if report["eager_deferred"]:
+            failures.append(f"{report['entry_point']} imports {', '.join(report['eager_deferred'])} at startup")
+        if args.max_ms is not None and report["total_ms"] > args.max_ms:
+            failures.append(f"{report['entry_point']} took {report['total_ms']} ms (budget {args.max_ms} ms)")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
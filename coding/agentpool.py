@@ -0,0 +1,75 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class AgentPool(Generic[T]):
+    """
+    Process-wide pool of pre-built agent groups (e.g. a student/teacher pair).
+
+    Agents hold per-conversation message state, so they cannot be shared by two
+    conversations at once. Instead a session leases a group for the duration of
+    one conversation and hands it back afterwards. Groups, and their registered
+    tools, are built only when no idle one is available, so the number of agents
+    follows the number of concurrent conversations rather than sessions or reruns.
+
+    Args:
+        factory (Callable): Builds a new agent group.
+        reset (Callable, optional): Called on a group when it is returned, e.g. to clear history.
+        max_idle (int): Idle groups kept for reuse; extra ones are dropped.
+    """
+
+    def __init__(self, factory: Callable[[], T],
+                 reset: Optional[Callable[[T], None]] = None,
+                 max_idle: int = 8):
+        self.factory = factory
+        self.reset = reset
+        self.max_idle = max_idle
+        self._idle: List[T] = []
+        self._lock = threading.Lock()
+        self._counters = {"built": 0, "leased": 0, "in_use": 0}
+
+    @contextmanager
+    def lease(self) -> Iterator[T]:
+        """
+        Borrow an agent group for one conversation.
+        """
+        with self._lock:
+            group = self._idle.pop() if self._idle else None
+        if group is None:
+            group = self.factory()
+            with self._lock:
+                self._counters["built"] += 1
+        with self._lock:
+            self._counters["leased"] += 1
+            self._counters["in_use"] += 1
+        try:
+            yield group
+        finally:
+            if self.reset is not None:
+                self.reset(group)
+            with self._lock:
+                self._counters["in_use"] -= 1
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(group)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["idle"] = len(self._idle)
+        return snapshot
+
+
+def ask_agent(agent, prompt: str) -> str:
+    """
+    One-shot question to a single agent, answered on the calling thread.
+
+    The reply is generated from the prompt alone and nothing is added to the
+    agent's history, so the agent can go straight back to its pool.
+    """
+    reply = agent.generate_reply(messages=[{"role": "user", "content": prompt}])
+    if isinstance(reply, dict):
+        reply = reply.get("content")
+    return reply or ""
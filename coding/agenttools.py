@@ -1,6 +1,10 @@
 from typing import List, Dict, Optional, Any, Annotated
-from coding.tools import search_expert, search_textbook, search_news, fetch_all_news
+from coding.tools import search_news
+from coding.catalog import EXPERT_INDEX, TEXTBOOK_INDEX
+from coding.newscache import NEWS_CACHE
+from coding.toolresults import NEWS_RESULT, EXPERT_RESULT, TEXTBOOK_RESULT
 from datetime import datetime
+import pandas as pd
 import streamlit as st
 
 def AG_search_expert(
@@ -9,20 +13,11 @@ def AG_search_expert(
     interest: Annotated[Optional[List[str]], "List of input strings containing interests to filter by."] = None
 ):
     """
-    Wrapper around search_expert that accepts lists for discipline and interest.
+    Like search_expert, but accepts lists for discipline and interest.
     """
-    # If multiple disciplines or interests are provided, return experts matching ANY of them
-    matched = []
-    for d in (discipline or []):
-        matched.extend(search_expert(name=name, discipline=d, interest=None))
-    for i in (interest or []):
-        matched.extend(search_expert(name=name, discipline=None, interest=i))
-    # If no lists provided, fall back to single-value search
-    if not discipline and not interest:
-        matched = search_expert(name=name)
-    # Deduplicate results
-    unique = {expert["EMAIL"]: expert for expert in matched if "EMAIL" in expert}
-    return list(unique.values())
+    # Experts matching ANY of the name, disciplines or interests, resolved in one pass
+    experts = EXPERT_INDEX.lookup(NAME=name, DISCIPLINE=discipline, INTEREST=interest)
+    return EXPERT_RESULT(experts)
 
 def AG_search_textbook(
     title: Annotated[Optional[str], "Textbook title."] = None,
@@ -30,17 +25,10 @@ def AG_search_textbook(
     related_expert: Annotated[Optional[List[str]], "List of input strings containing related expert names to filter by."] = None
 ):
     """
-    Wrapper around search_textbook that accepts lists for discipline and related_expert.
+    Like search_textbook, but accepts lists for discipline and related_expert.
     """
-    matched = []
-    for d in (discipline or []):
-        matched.extend(search_textbook(title=title, discipline=d, related_expert=None))
-    for e in (related_expert or []):
-        matched.extend(search_textbook(title=title, discipline=None, related_expert=e))
-    if not discipline and not related_expert:
-        matched = search_textbook(title=title)
-    unique = {tb["TITLE"]: tb for tb in matched if "TITLE" in tb}
-    return list(unique.values())
+    textbooks = TEXTBOOK_INDEX.lookup(TITLE=title, DISCIPLINE=discipline, RELATED_EXPERT=related_expert)
+    return TEXTBOOK_RESULT(textbooks)
 
 def AG_search_news(
     query: Annotated[
@@ -67,7 +55,7 @@ def AG_search_news(
     """
     Tool wrapper: takes a list-of-dicts, runs search_news, returns list-of-dicts.
     """
-    df = fetch_all_news(1,5,list_type='all')
+    df, index = NEWS_CACHE.get_indexed(1, 5, list_type='all')
 
     # Apply search
     result_df = search_news(
@@ -76,10 +64,13 @@ def AG_search_news(
         search_columns=search_columns,
         sections=sections,
         date_from=date_from,
-        date_to=date_to
+        date_to=date_to,
+        index=index
     )
-    # Return as plain JSON-serializable list
-    return result_df.to_dict(orient="records")
+    # Return as plain JSON-serializable list, projected and trimmed to the tool budget
+    if pd.api.types.is_datetime64_any_dtype(result_df['ar_pubdate']):
+        result_df = result_df.assign(ar_pubdate=result_df['ar_pubdate'].dt.strftime('%Y-%m-%d'))
+    return NEWS_RESULT(result_df)
 
 def get_time() -> str:
         """
@@ -0,0 +1,113 @@
+import json
+import os
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from coding.constant import TEXTBOOK_LIST, EXPERTS_LIST
+
+MAX_MEMOIZED_MATCHES = 4096
+
+
+def load_catalog(path: str, list_key: str) -> List[Dict[str, str]]:
+    """
+    Load catalog entries from a JSON file shaped like the constants, e.g. {"EXPERTS": [...]}.
+    A bare JSON list of entries is accepted as well.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data[list_key] if isinstance(data, dict) else data
+
+
+class CatalogIndex:
+    """
+    Precomputed lookup structure over a list of catalog entries (experts, textbooks).
+
+    Every searchable field is lowercased once and kept as posting lists from its
+    distinct values to entry ids, so a multi-value query is answered with set
+    unions. Substring matching (the semantics of the original linear scan) walks
+    the distinct values of a field rather than the entries, and is memoized since
+    the catalog does not change after loading.
+
+    Args:
+        entries (List[dict]): Catalog entries.
+        key_field (str): Field that identifies an entry (e.g. 'EMAIL', 'TITLE').
+        fields (Sequence[str]): Fields that can be searched.
+    """
+
+    def __init__(self, entries: List[Dict[str, str]], key_field: str, fields: Sequence[str]):
+        self.entries = list(entries)
+        self.key_field = key_field
+        self.fields = tuple(fields)
+        self.keys: Dict[str, int] = {}
+        # field -> lowercased value -> entry ids
+        self.postings: Dict[str, Dict[str, Set[int]]] = {f: {} for f in self.fields}
+        self._matches: Dict[Tuple[str, str], FrozenSet[int]] = {}
+
+        for i, entry in enumerate(self.entries):
+            key = str(entry.get(key_field, '')).lower()
+            self.keys.setdefault(key, i)
+            for field in self.fields:
+                value = str(entry.get(field, '')).lower()
+                self.postings[field].setdefault(value, set()).add(i)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        Entry whose key field equals `key` (case-insensitive), or None.
+        """
+        i = self.keys.get(key.lower())
+        return None if i is None else self.entries[i]
+
+    def match(self, field: str, query: str) -> FrozenSet[int]:
+        """
+        Ids of entries whose `field` contains `query` (case-insensitive).
+        """
+        q = query.lower()
+        ids = self._matches.get((field, q))
+        if ids is None:
+            ids = frozenset().union(*(value_ids for value, value_ids in self.postings[field].items()
+                                      if q in value))
+            if len(self._matches) >= MAX_MEMOIZED_MATCHES:
+                self._matches.clear()
+            self._matches[(field, q)] = ids
+        return ids
+
+    def lookup(self, **criteria: Union[str, Iterable[str], None]) -> List[Dict[str, str]]:
+        """
+        Entries matching ANY of the given values in ANY of the given fields.
+
+        Each keyword names a field and takes a string or a list of strings, e.g.
+        lookup(DISCIPLINE=['Digital Sociology'], INTEREST=['privacy']). Results are
+        unique by key field and returned in catalog order.
+        """
+        ids: Set[int] = set()
+        for field, values in criteria.items():
+            if not values:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            for value in values:
+                if value:
+                    ids |= self.match(field, value)
+
+        results, seen = [], set()
+        for i in sorted(ids):
+            entry = self.entries[i]
+            key = entry.get(self.key_field)
+            if key not in seen:
+                seen.add(key)
+                results.append(entry)
+        return results
+
+
+def _catalog_entries(env_var: str, default: Dict[str, List[Dict[str, str]]], list_key: str):
+    path = os.getenv(env_var)
+    return load_catalog(path, list_key) if path else default[list_key]
+
+
+EXPERT_INDEX = CatalogIndex(_catalog_entries('EXPERTS_FILE', EXPERTS_LIST, 'EXPERTS'),
+                            key_field='EMAIL', fields=('NAME', 'DISCIPLINE', 'INTEREST'))
+
+TEXTBOOK_INDEX = CatalogIndex(_catalog_entries('TEXTBOOKS_FILE', TEXTBOOK_LIST, 'TEXTBOOKS'),
+                              key_field='TITLE', fields=('TITLE', 'DISCIPLINE', 'RELATED_EXPERT'))
@@ -0,0 +1,271 @@
+import os
+import re
+import sys
+import streamlit as st
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Union
+
+MAX_MESSAGES = 2000  # messages kept per session; older ones are folded into the summary
+TRIM_SLACK = 200  # fold in chunks so appends stay amortized O(1)
+RENDER_WINDOW = 20  # messages rendered per page of chat history
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))  # tokens of verbatim history sent to the model
+FOLD_TARGET = 0.75  # fraction of the budget left after folding
+SUMMARY_TOKEN_BUDGET = 500  # tokens kept in the rolling summary
+SUMMARY_LINE_CHARS = 160  # characters kept per folded message
+
+_FIELDS = ("role", "content", "image")
+_WIDE = re.compile(r"[\u2e80-\uffff]")
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s*")
+_HISTORY_BLOCK = re.compile(r"\s*<CONVERSATION_HISTORY>.*?</CONVERSATION_HISTORY>\s*", re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count: one per CJK character, one per four other characters.
+    """
+    wide = len(_WIDE.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+class ChatMessage:
+    """
+    One chat message.
+
+    Slotted, so a long history costs a few pointers per message instead of a dict.
+    Still readable like the dicts the pages used to store (`msg["role"]`, `msg.get("image")`).
+    `key` identifies the message across repeated saves of the same conversation.
+    """
+
+    __slots__ = ("role", "content", "image", "key", "tokens")
+
+    def __init__(self, role: str = "user", content: Any = "", image: Optional[str] = None,
+                 key: Optional[Hashable] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.image = image
+        self.key = key
+        self.tokens = estimate_tokens(self.markdown)
+
+    @classmethod
+    def from_dict(cls, msg: Dict[str, Any]) -> "ChatMessage":
+        return cls(msg.get("role", "user"), msg.get("content", ""), msg.get("image"))
+
+    @property
+    def markdown(self) -> str:
+        # The body as passed to st.markdown
+        content = self.content
+        return content if isinstance(content, str) else str(content)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _FIELDS else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        msg = {"role": self.role, "content": self.content}
+        if self.image is not None:
+            msg["image"] = self.image
+        return msg
+
+    def __repr__(self) -> str:
+        return f"ChatMessage(role={self.role!r}, content={self.markdown[:40]!r})"
+
+
+def fold_extractive(summary: str, folded: List[ChatMessage]) -> str:
+    """
+    Default rolling summarizer: the first sentence of every folded message, one per line.
+
+    The oldest lines go once the summary exceeds SUMMARY_TOKEN_BUDGET.
+    """
+    lines = summary.splitlines() if summary else []
+    for msg in folded:
+        text = " ".join(strip_history(msg.markdown).split())
+        if text:
+            lines.append(f"- {msg.role}: {_SENTENCE_END.split(text, 1)[0][:SUMMARY_LINE_CHARS]}")
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    total = sum(costs)
+    start = 0
+    while total > SUMMARY_TOKEN_BUDGET and start < len(lines):
+        total -= costs[start]
+        start += 1
+    return "\n".join(lines[start:])
+
+
+class MessageStore:
+    """
+    Append-only, bounded log of a session's chat messages with a rolling summary.
+
+    Messages carrying a `key` are added once: saving the same conversation again only
+    appends its new turns. The log is what the page renders and pages through; it
+    keeps up to `max_messages`. The history sent back to the model (`context()`) is a
+    view over its newest turns: once those exceed `token_budget`, the oldest of them
+    are folded into `summary` and leave the context, but stay in the log.
+    Accepts plain dicts on append and supports len(), iteration and indexing like
+    the list it replaces.
+
+    Args:
+        messages (Iterable): Initial messages (ChatMessage or dict).
+        max_messages (int): Messages kept in the log at most.
+        token_budget (int): Estimated tokens of verbatim history sent to the model.
+        summarize (Callable): Folds `(summary, folded_messages)` into the new summary.
+    """
+
+    def __init__(self, messages: Iterable[Union[ChatMessage, Dict[str, Any]]] = (),
+                 max_messages: int = MAX_MESSAGES,
+                 token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summarize: Callable[[str, List[ChatMessage]], str] = fold_extractive):
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary = ""
+        self.tokens = 0  # of the verbatim turns in the context
+        self.folded = 0  # messages summarized out of the context
+        self.dropped = 0  # messages removed from the log
+        self._log: List[ChatMessage] = []
+        self._context_start = 0  # first message of the log sent verbatim
+        self._keys: Dict[Hashable, None] = {}
+        self.extend(messages)
+
+    def append(self, message: Union[ChatMessage, Dict[str, Any]]) -> bool:
+        """
+        Add a message; returns False if a message with the same key was already added.
+        """
+        if not isinstance(message, ChatMessage):
+            message = ChatMessage.from_dict(message)
+        if message.key is not None:
+            if message.key in self._keys:
+                return False
+            self._keys[message.key] = None
+            if len(self._keys) > 2 * (self.max_messages + TRIM_SLACK):
+                del self._keys[next(iter(self._keys))]
+        self._log.append(message)
+        self.tokens += message.tokens
+        if self.tokens > self.token_budget:
+            self._fold()
+        if len(self._log) > self.max_messages + TRIM_SLACK:
+            self._trim()
+        return True
+
+    def _fold_until(self, stop: int):
+        # Summarize log[_context_start:stop] out of the context
+        folded = self._log[self._context_start:stop]
+        if folded:
+            self.tokens -= sum(msg.tokens for msg in folded)
+            self.folded += len(folded)
+            self._context_start = stop
+            self.summary = self.summarize(self.summary, folded)
+
+    def _fold(self):
+        target = int(self.token_budget * FOLD_TARGET)
+        stop, tokens = self._context_start, self.tokens
+        # Always keep the newest message verbatim
+        while stop < len(self._log) - 1 and tokens > target:
+            tokens -= self._log[stop].tokens
+            stop += 1
+        self._fold_until(stop)
+
+    def _trim(self):
+        # Drop the oldest messages from the log, in chunks so appends stay amortized O(1);
+        # any still in the context are summarized first
+        count = len(self._log) - self.max_messages
+        if count > self._context_start:
+            self._fold_until(count)
+        del self._log[:count]
+        self._context_start -= count
+        self.dropped += count
+
+    def extend(self, messages: Iterable[Union[ChatMessage, Dict[str, Any]]]):
+        for message in messages:
+            self.append(message)
+
+    def window(self, count: int) -> List[ChatMessage]:
+        """
+        The newest `count` messages, oldest first.
+        """
+        return self._log[-count:] if count > 0 else []
+
+    def context(self) -> str:
+        """
+        The history to send back to the model: the rolling summary plus the verbatim turns.
+        """
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        turns = "\n".join(f"{msg.role}: {strip_history(msg.markdown)}"
+                          for msg in self._log[self._context_start:])
+        if turns:
+            parts.append(turns)
+        return "\n\n".join(parts)
+
+    def clear(self):
+        self.dropped += len(self._log)
+        self._log.clear()
+        self._keys.clear()
+        self._context_start = 0
+        self.summary = ""
+        self.tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._log)
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        return iter(self._log)
+
+    def __getitem__(self, index):
+        return self._log[index]
+
+
+def session_messages() -> MessageStore:
+    """
+    The current session's message store, converting a legacy list of dicts in place.
+    """
+    store = st.session_state.get("messages")
+    if not isinstance(store, MessageStore):
+        store = MessageStore(store or [])
+        st.session_state["messages"] = store
+    return store
+
+
+def prompt_with_history(prompt: str, history: str) -> str:
+    """
+    Append the session history (see MessageStore.context) to a prompt for the model.
+    """
+    if not history:
+        return prompt
+    return (f"{prompt}\n\n<CONVERSATION_HISTORY>\n"
+            "Earlier in this conversation (for context only):\n"
+            f"{history}\n</CONVERSATION_HISTORY>")
+
+
+def strip_history(text: str) -> str:
+    """
+    Remove a history block added by prompt_with_history, e.g. before showing a prompt.
+    """
+    return _HISTORY_BLOCK.sub("", text) if "<CONVERSATION_HISTORY>" in text else text
+
+
+def _show_earlier(window: int):
+    st.session_state["messages_shown"] = st.session_state.get("messages_shown", window) + window
+
+
+def windowed_messages(container_obj, window: int = RENDER_WINDOW) -> List[ChatMessage]:
+    """
+    The session messages to render on this rerun.
+
+    Only the newest `window` messages are returned; when older ones exist a
+    "Load earlier messages" button is drawn that widens the window by one page.
+    Once every kept message is shown and older ones were dropped from the log, the
+    rolling summary is offered in an expander in their place.
+    """
+    messages = session_messages()
+    visible = messages.window(st.session_state.get("messages_shown", window))
+    hidden = len(messages) - len(visible)
+    if hidden:
+        container_obj.button(f"Load earlier messages ({hidden} more)", key="load_earlier_messages",
+                             on_click=_show_earlier, args=(window,))
+    elif messages.dropped and messages.summary:
+        container_obj.expander(f"Earlier conversation ({messages.dropped} messages, summarized)") \
+            .markdown(messages.summary)
+    return visible
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+HEARTBEAT_TIMEOUT = 30.0  # seconds without a poll before a conversation counts as abandoned
+
+
+class ConversationCancelled(Exception):
+    """Raised inside the worker to stop a conversation at the next message."""
+
+
+class ConversationRun:
+    """
+    One agent conversation running on a background thread.
+
+    Every message an attached agent sends (including tool calls and tool results)
+    is recorded as it is produced, so the page can render the exchange turn by
+    turn while the script thread stays free. The run stops at the next message
+    boundary when `cancel()` is called, or when nobody has polled it (`touch()`)
+    for `heartbeat_timeout` seconds, so an abandoned session stops spending tokens.
+
+    Args:
+        conversation (Callable): Called with this run on the worker thread. It should
+            attach its agents with `run.watch(...)` and return the chat result.
+        heartbeat_timeout (float): Seconds without touch() before the run cancels itself.
+    """
+
+    def __init__(self, conversation: Callable[["ConversationRun"], Any],
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT):
+        self._conversation = conversation
+        self.id = uuid.uuid4().hex
+        self.heartbeat_timeout = heartbeat_timeout
+        self._messages: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._last_seen = time.monotonic()
+        self._initiator = None
+        self._thread = threading.Thread(target=self._target, name="conversation", daemon=True)
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.first_message_at: Optional[float] = None
+
+    def start(self) -> "ConversationRun":
+        self.started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def _target(self):
+        try:
+            self.result = self._conversation(self)
+        except ConversationCancelled:
+            logging.info("Conversation cancelled")
+        except Exception as e:
+            logging.error(f"Conversation failed: {e}")
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def touch(self):
+        """
+        Record that a session is still watching this run.
+        """
+        self._last_seen = time.monotonic()
+
+    def messages(self) -> List[Dict[str, Any]]:
+        """
+        Messages produced so far, shaped like autogen's chat_history from the initiator's side.
+        """
+        with self._lock:
+            return list(self._messages)
+
+    def _on_send(self, sender, message, recipient, silent):
+        if not self._cancel.is_set() and time.monotonic() - self._last_seen > self.heartbeat_timeout:
+            logging.info("Conversation abandoned; cancelling")
+            self._cancel.set()
+        if self._cancel.is_set():
+            raise ConversationCancelled()
+
+        entry = dict(message) if isinstance(message, dict) else {"content": message}
+        if entry.get("tool_responses"):
+            entry["role"] = "tool"
+        else:
+            entry["role"] = "assistant" if sender is self._initiator else "user"
+        entry["name"] = sender.name
+        with self._lock:
+            if self.first_message_at is None:
+                self.first_message_at = time.monotonic()
+            self._messages.append(entry)
+        return message
+
+    @contextmanager
+    def watch(self, initiator, *agents) -> Iterator[None]:
+        """
+        Record messages sent by `initiator` and `agents` for the duration of the block.
+        """
+        self._initiator = initiator
+        watched = (initiator, *agents)
+        for agent in watched:
+            agent.register_hook("process_message_before_send", self._on_send)
+        try:
+            yield
+        finally:
+            for agent in watched:
+                hooks = agent.hook_lists["process_message_before_send"]
+                if self._on_send in hooks:
+                    hooks.remove(self._on_send)
@@ -0,0 +1,179 @@
+import json
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Pattern, Sequence, Tuple, Union
+
+from coding.constant import JOB_DEFINITION, RESPONSE_FORMAT
+from coding.newsindex import tokenize
+
+MIN_SIMILARITY = 0.25  # cosine similarity needed to answer locally
+MIN_MARGIN = 0.35  # relative lead over the runner-up needed to answer locally
+
+# High-precision rules, checked in order before the TF-IDF model
+KEYWORD_RULES: List[Tuple[Pattern, str]] = [
+    (re.compile(r"^\s*\[REPLY_TASK\]"), "REPLY_TASK"),
+    (re.compile(r"^\s*\[OPENING_MSG\]"), "OPENING_MSG"),
+    (re.compile(r"\b(introduce yourself|what can you do|what can i do)\b|自我介紹|你能做什麼|你會做什麼", re.I), "SELF_INTRODUCE"),
+    (re.compile(r"\b(who are you|what('?s| is) your name|your name is|call yourself)\b|你是誰|你叫什麼", re.I), "AGENT_PERSONA"),
+    (re.compile(r"\b(my name is|what('?s| is) my name|call me|who am i)\b|我的名字|我叫|我是誰", re.I), "USER_PERSONA"),
+]
+
+# Extra phrasing per job, added to the job definition text the TF-IDF vectors are built from
+SEED_PHRASES: Dict[str, List[str]] = {
+    "DOCUMENT_TASK": ["summarize this document", "open the file", "upload a pdf", "translate this report", "文件 檔案"],
+    "SELF_INTRODUCE": ["introduce yourself", "what can you do for me", "what are your features"],
+    "LEARNING_TASK": ["remember that", "actually it means", "let me correct you", "i think that", "in my opinion"],
+    "USER_PERSONA": ["my name is", "change my profile", "my preferences", "who am i"],
+    "AGENT_PERSONA": ["who are you", "what is your name", "change your personality", "be more polite"],
+    "SOCIAL_NETWORK": ["my friends", "group members", "community activity", "notify the group", "send a message to the group"],
+    "ASK_QUESTION": ["what is", "how does", "why is", "explain", "tell me about"],
+    "FALLBACK_TASK": ["hack into", "do something illegal", "book a flight", "order food"],
+}
+
+
+@dataclass
+class Intent:
+    """
+    A classified prompt.
+
+    Attributes:
+        job (str): JOB_DEFINITION key.
+        confidence (float): 1.0 for keyword rules, the TF-IDF cosine similarity otherwise.
+        source (str): "rule", "tfidf" (answered locally) or "llm" (escalated).
+    """
+    job: str
+    confidence: float
+    source: str
+
+    @property
+    def local(self) -> bool:
+        return self.source != "llm"
+
+
+def _definition_text(definition: Union[str, Sequence[str]]) -> str:
+    return definition if isinstance(definition, str) else " ".join(definition)
+
+
+class IntentClassifier:
+    """
+    Local fast path for routing a prompt to one of the JOB_DEFINITION jobs.
+
+    Keyword rules answer the unambiguous cases (tagged messages, introductions,
+    name questions). Everything else is scored by TF-IDF cosine similarity against
+    each job's definition plus seed phrases. `classify` returns None when the best
+    job is not clearly ahead, so only uncertain prompts need an LLM call.
+
+    Args:
+        definitions (Dict): Job name -> description (or list of descriptions).
+        seeds (Dict): Job name -> extra example phrases.
+        min_similarity (float): Best similarity needed to answer locally.
+        min_margin (float): Needed lead of the best over the runner-up, relative to the best.
+    """
+
+    def __init__(self, definitions: Dict[str, Union[str, Sequence[str]]] = JOB_DEFINITION,
+                 seeds: Optional[Dict[str, List[str]]] = None,
+                 rules: Sequence[Tuple[Pattern, str]] = KEYWORD_RULES,
+                 min_similarity: float = MIN_SIMILARITY,
+                 min_margin: float = MIN_MARGIN):
+        seeds = SEED_PHRASES if seeds is None else seeds
+        self.jobs = list(definitions)
+        self.rules = list(rules)
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+
+        docs = [Counter(tokenize(_definition_text(definitions[job]) + " " + " ".join(seeds.get(job, []))))
+                for job in self.jobs]
+        df = Counter(term for doc in docs for term in doc)
+        n = len(docs)
+        self._idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        # Postings of unit-length job vectors: term -> [(job position, weight)]
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        for pos, doc in enumerate(docs):
+            weights = {t: (1 + math.log(c)) * self._idf[t] for t, c in doc.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._postings.setdefault(term, []).append((pos, weight / norm))
+
+    def scores(self, prompt: str) -> List[Tuple[str, float]]:
+        """
+        Cosine similarity of `prompt` to every job, best first.
+        """
+        counts = Counter(t for t in tokenize(prompt) if t in self._idf)
+        weights = {t: (1 + math.log(c)) * self._idf[t] for t, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        totals = [0.0] * len(self.jobs)
+        if norm:
+            for term, weight in weights.items():
+                for pos, job_weight in self._postings[term]:
+                    totals[pos] += weight * job_weight / norm
+        return sorted(zip(self.jobs, totals), key=lambda item: item[1], reverse=True)
+
+    def classify(self, prompt: str) -> Optional[Intent]:
+        """
+        Classify locally, or return None when the prompt should go to the LLM.
+        """
+        for pattern, job in self.rules:
+            if pattern.search(prompt):
+                return Intent(job, 1.0, "rule")
+        ranked = self.scores(prompt)
+        (job, best), (_, runner_up) = ranked[0], ranked[1]
+        if best >= self.min_similarity and (best - runner_up) / best >= self.min_margin:
+            return Intent(job, best, "tfidf")
+        return None
+
+    def route(self, prompt: str, ask_llm: Callable[[str], str], template: Optional[str] = None) -> Intent:
+        """
+        Classify locally when confident, otherwise ask the LLM with the classification prompt.
+
+        Args:
+            ask_llm (Callable): Sends a prompt to the model and returns its reply text.
+            template (str, optional): Classification prompt with a ##PROMPT## placeholder;
+                defaults to build_classification_prompt.
+        """
+        intent = self.classify(prompt)
+        if intent is not None:
+            return intent
+        task = template.replace('##PROMPT##', prompt) if template else build_classification_prompt(prompt)
+        reply = ask_llm(task)
+        job = parse_job(reply)
+        if job not in self.jobs:
+            logging.warning(f"Unrecognized job from the LLM: {job!r}")
+            job = "FALLBACK_TASK"
+        return Intent(job, 0.0, "llm")
+
+
+def build_classification_prompt(prompt: str, lang_setting: Optional[str] = None) -> str:
+    """
+    The LLM classification prompt for `prompt` (the page's classification_template).
+    """
+    template = ("You are a classification agent, your job is to classify what ##PROMPT## is according to the job definition list in <JOB_DEFINITION>"
+    "<JOB_DEFINITION>"
+    f"{JOB_DEFINITION}"
+    "</JOB_DEFINITION>"
+    "Please output in JSON-format only."
+    "JSON-format is as below:"
+    f"{RESPONSE_FORMAT}"
+    "Let's think step by step.")
+    if lang_setting:
+        template += f"Please output in {lang_setting}"
+    return template.replace('##PROMPT##', prompt)
+
+
+def parse_job(reply: str) -> Optional[str]:
+    """
+    The JOB field of the LLM's JSON reply (code fences and surrounding text tolerated).
+    """
+    match = re.search(r"\{.*\}", reply or "", re.S)
+    if match:
+        try:
+            return str(json.loads(match.group(0)).get("JOB", "")).strip() or None
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    match = re.search(r"\b(" + "|".join(JOB_DEFINITION) + r")\b", reply or "")
+    return match.group(1) if match else None
+
+
+INTENT_CLASSIFIER = IntentClassifier()
@@ -0,0 +1,24 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return `name` as a module whose actual import is deferred to its first attribute access.
+
+    Used by the Streamlit entry points so that heavy dependencies (autogen, the LLM
+    clients, pandas) are only loaded once a code path actually needs them.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+EVICT_EVERY = 64  # single puts between size checks
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Content address for a cache entry: sha256 over the JSON encoding of `parts`.
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_tokens(tokens: Iterable[Any]) -> List[str]:
+    return [str(t).strip() for t in tokens]
+
+
+class SQLiteCache:
+    """
+    Size-bounded, LRU-evicting key/value cache stored in a SQLite file.
+
+    Values are stored as JSON. With a `ttl`, entries older than `ttl` seconds
+    are no longer returned and are removed on the next eviction. The database runs in WAL mode with a busy timeout,
+    so several Streamlit worker processes can share one file; every thread gets
+    its own connection.
+
+    Args:
+        path (str): Database file; parent directories are created.
+        max_entries (int): Entries kept after eviction; least recently used go first.
+        ttl (float, optional): Seconds an entry stays valid; None keeps entries until evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 100_000,
+                 ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache(last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def _oldest_valid(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else 0.0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Look up several keys at once; missing and expired keys are absent from the result.
+        """
+        keys = list(dict.fromkeys(keys))
+        conn = self._connect()
+        found: Dict[str, Any] = {}
+        oldest = self._oldest_valid()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT key, value FROM cache WHERE key IN ({marks}) AND created >= ?",
+                                [*chunk, oldest]).fetchall()
+            if rows:
+                hits = [k for k, _ in rows]
+                conn.execute(f"UPDATE cache SET last_access = ? WHERE key IN ({','.join('?' * len(hits))})",
+                             [time.time(), *hits])
+            found.update((k, json.loads(v)) for k, v in rows)
+        return found
+
+    def put(self, key: str, value: Any):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]):
+        now = time.time()
+        rows = [(k, json.dumps(v, ensure_ascii=False), now, now) for k, v in items]
+        if not rows:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO cache (key, value, created, last_access) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._writes += len(rows)
+            due = self._writes >= EVICT_EVERY or len(rows) > 1
+            if due:
+                self._writes = 0
+        if due:
+            self.evict()
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        All unexpired entries, most recently used first.
+        """
+        rows = self._connect().execute("SELECT key, value FROM cache WHERE created >= ? "
+                                       "ORDER BY last_access DESC", (self._oldest_valid(),)).fetchall()
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def evict(self):
+        """
+        Drop expired entries, then least recently used entries beyond `max_entries`.
+        """
+        conn = self._connect()
+        if self.ttl is not None:
+            conn.execute("DELETE FROM cache WHERE created < ?", (self._oldest_valid(),))
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM cache WHERE key IN "
+                         "(SELECT key FROM cache ORDER BY last_access LIMIT ?)", (excess,))
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
@@ -0,0 +1,299 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from coding.llmcache import make_key
+from coding.llmrouter import ROUTER, ProviderRouter, Route
+from coding.metrics import METRICS
+from coding.ratelimit import TokenBucket
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # model calls in flight per process
+DEFAULT_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))
+# Per provider or provider/model overrides, e.g. "google=0.25,openai/gpt-4o-mini=8"
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+DEFAULT_SESSION = "default"
+
+_session: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("llm_session", default=None)
+
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    """
+    "google=0.25,openai/gpt-4o-mini=8" -> {"google": 0.25, "openai/gpt-4o-mini": 8.0}
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        try:
+            limits[name.strip()] = float(rate)
+        except ValueError:
+            logging.warning(f"Ignoring malformed rate limit {item!r}")
+    return limits
+
+
+@contextmanager
+def llm_session(session_id: Optional[str]) -> Iterator[None]:
+    """
+    Attribute the model calls made on this thread, and work it hands off with
+    contextvars.copy_context(), to `session_id` for fair scheduling.
+    """
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def in_session(session_id: Optional[str], func: Callable) -> Callable:
+    """
+    `func` running under `llm_session(session_id)`, for handing work to other threads.
+    """
+    def run(*args, **kwargs):
+        with llm_session(session_id):
+            return func(*args, **kwargs)
+    return run
+
+
+class FairScheduler:
+    """
+    Bounded number of slots, handed out round-robin across sessions.
+
+    Each session waits in its own FIFO queue; whenever a slot frees up it goes to the
+    session at the front of the rotation, which then moves to the back. A session
+    firing many calls at once therefore cannot starve one waiting with a single call.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._in_use = 0
+        self._waiting: "OrderedDict[str, Deque[object]]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def _next(self) -> object:
+        return next(iter(self._waiting.values()))[0]
+
+    @contextmanager
+    def slot(self, session: str) -> Iterator[None]:
+        ticket = object()
+        with self._cond:
+            self._waiting.setdefault(session, deque()).append(ticket)
+            while self._in_use >= self.slots or self._next() is not ticket:
+                self._cond.wait()
+            queue = self._waiting.pop(session)
+            queue.popleft()
+            if queue:
+                self._waiting[session] = queue  # back of the rotation
+            self._in_use += 1
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"in_use": self._in_use, "waiting": sum(len(q) for q in self._waiting.values()),
+                    "waiting_sessions": len(self._waiting)}
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _fallback_creates(agent, fallback) -> Dict[Route, Callable[..., Any]]:
+    """
+    A client for each entry of `fallback` carrying `agent`'s own settings (its tools), by route.
+    """
+    from autogen import OpenAIWrapper
+    from coding.localllm import LOCAL_CLIENT_CLS, LocalModelClient
+
+    creates = {}
+    for entry in fallback.config_list:
+        try:
+            client = OpenAIWrapper(**{**dict(**agent.llm_config), "config_list": [entry]})
+        except ImportError as e:
+            # The agent keeps working on its own provider
+            logging.warning(f"No fallback {entry.api_type}/{entry.model} for {agent.name}: {e}")
+            continue
+        if getattr(entry, "model_client_cls", None) == LOCAL_CLIENT_CLS:
+            client.register_model_client(LocalModelClient, agent_name=agent.name)
+        creates[(entry.api_type, entry.model)] = client.create
+    return creates
+
+
+class ClientPool:
+    """
+    Process-wide gate for every model call made by the agents of both pages.
+
+    Calls are coalesced first: a request identical to one already in flight (same
+    route, messages and tools) waits for that call and shares its response instead
+    of going upstream again. The remaining calls queue for one of `max_concurrency`
+    slots, handed out fairly across sessions, then take a token from the bucket of
+    their provider/model before they are sent.
+
+    Args:
+        max_concurrency (int): Model calls in flight at once.
+        rate_limits (Dict[str, float], optional): Requests per second by "provider" or
+            "provider/model"; the more specific entry wins.
+        default_rate (float): Requests per second for routes without an entry; <= 0 is unlimited.
+        router (ProviderRouter, optional): Picks the provider for agents attached with a
+            fallback; the process-wide ROUTER by default.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 default_rate: float = DEFAULT_REQUESTS_PER_SECOND,
+                 router: Optional[ProviderRouter] = None):
+        self.router = ROUTER if router is None else router
+        self.scheduler = FairScheduler(max_concurrency)
+        self.rate_limits = parse_rate_limits(LLM_RATE_LIMITS) if rate_limits is None else rate_limits
+        self.default_rate = default_rate
+        self._buckets: Dict[Route, TokenBucket] = {}
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "upstream": 0, "coalesced": 0}
+
+    def _bucket(self, route: Route) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(route)
+            if bucket is None:
+                provider, model = route
+                rate = self.rate_limits.get(f"{provider}/{model}",
+                                            self.rate_limits.get(provider, self.default_rate))
+                bucket = self._buckets[route] = TokenBucket(rate)
+            return bucket
+
+    @contextmanager
+    def _admitted(self, route: Route) -> Iterator[None]:
+        """
+        Hold a slot and a token of `route` for one upstream call.
+        """
+        session = _session.get() or DEFAULT_SESSION
+        labels = {"provider": route[0], "model": route[1]}
+        queued = time.perf_counter()
+        with self.scheduler.slot(session):
+            self._bucket(route).acquire()
+            METRICS.observe("llm_queue_seconds", time.perf_counter() - queued, labels, session=session)
+            with self._lock:
+                self._counters["upstream"] += 1
+            yield
+
+    def _send(self, route: Route, call: Callable[[], Any]) -> Any:
+        with self._admitted(route):
+            return call()
+
+    def call(self, route: Route, call: Callable[[], Any], request_key: Optional[str] = None) -> Any:
+        """
+        Run `call` (one upstream model request on `route`) through the pool.
+
+        Args:
+            route (Tuple[str, str]): (provider, model), selecting the rate limit.
+            call (Callable): Makes the request.
+            request_key (str, optional): Identity of the request; identical keys in flight
+                share one call. None never coalesces (e.g. streamed replies).
+        """
+        return self._coalesce(route, request_key, functools.partial(self._send, route, call))
+
+    def routed_call(self, calls: Dict[Route, Callable[[], Any]], request_key: Optional[str] = None,
+                    hedge: bool = True) -> Any:
+        """
+        Like `call`, for a request several providers can answer, preferred one first.
+
+        The router picks the provider, hedges a slow call on the next one and fails
+        over on errors; every copy it sends takes a slot and a token on its own route.
+        A copy still queued for those is not yet sent, so it is neither timed nor hedged.
+        """
+        return self._coalesce(next(iter(calls)), request_key,
+                              lambda: self.router.call(calls, hedge=hedge, admit=self._admitted))
+
+    def _coalesce(self, route: Route, request_key: Optional[str], send: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._counters["calls"] += 1
+            flight = self._inflight.get(request_key) if request_key is not None else None
+            leader = flight is None
+            if leader and request_key is not None:
+                flight = self._inflight[request_key] = _Flight()
+        if request_key is None:
+            return send()
+
+        if not leader:
+            with self._lock:
+                self._counters["coalesced"] += 1
+            METRICS.count("llm_coalesced", labels={"provider": route[0], "model": route[1]})
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = send()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(request_key, None)
+            flight.done.set()
+
+    def attach(self, *agents, fallback=None):
+        """
+        Route every model call of `agents` through the pool.
+
+        Call it once the agents' tools are registered, since registering a tool
+        rebuilds an agent's client.
+
+        Args:
+            fallback (LLMConfig, optional): Another provider able to answer the same
+                requests. The agents' calls then go through the router, which hedges
+                slow calls on it and fails over between the two.
+        """
+        for agent in agents:
+            client = getattr(agent, "client", None)
+            if client is None or getattr(client.create, "_pooled", False):
+                continue
+            entry = agent.llm_config.config_list[0]
+            route = (entry.api_type, entry.model)
+            streaming = bool(getattr(entry, "stream", False))
+            tools = agent.llm_config.get("tools") or []
+            creates = {route: client.create}
+            if fallback is not None:
+                for fallback_route, create in _fallback_creates(agent, fallback).items():
+                    creates.setdefault(fallback_route, create)
+
+            def pooled_create(_creates=creates, _route=route, _streaming=streaming, _tools=tools, **params):
+                # Streamed replies are delivered to the caller's own output stream, so never shared
+                key = None if _streaming else make_key(_route, params.get("messages"), _tools)
+                if len(_creates) == 1:
+                    return self.call(_route, lambda: _creates[_route](**params), key)
+                # Two racing streams would both reach the user, so streamed replies only fail over
+                calls = {r: functools.partial(create, **params) for r, create in _creates.items()}
+                return self.routed_call(calls, key, hedge=not _streaming)
+
+            pooled_create._pooled = True
+            client.create = pooled_create
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["inflight"] = len(self._inflight)
+        snapshot.update(self.scheduler.stats())
+        return snapshot
+
+    def provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.router.stats()
+
+
+LLM_POOL = ClientPool()
@@ -0,0 +1,228 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Deque, Dict, List, Optional, Sequence, Tuple
+
+from coding.metrics import METRICS
+
+HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))  # hedge once the primary is slower than this
+HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "10"))  # seconds, until a provider has enough samples
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200  # recent calls per provider behind its p50/p95
+ERROR_COOLDOWN = float(os.getenv("LLM_ERROR_COOLDOWN", "10"))  # seconds a failing provider goes last
+RATE_LIMIT_COOLDOWN = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", "30"))  # the same after a 429
+ROUTER_WORKERS = 64  # threads carrying routed calls; each waits on the pool's own bound
+
+Route = Tuple[str, str]  # (provider, model)
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """
+    HTTP status of a provider error: openai's errors carry `status_code`, google's `code`.
+    """
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+class _Provider:
+    __slots__ = ("latencies", "calls", "errors", "rate_limited", "hedges_won", "cooldown_until")
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.hedges_won = 0
+        self.cooldown_until = 0.0
+
+
+class ProviderRouter:
+    """
+    Treats interchangeable model configs (say Gemini and OpenAI) as one pool.
+
+    Each request goes to the healthy provider with the lowest recent p50 (one without
+    enough samples yet counts as fastest, so it gets measured). If the reply has not
+    arrived by that provider's p95, the same request is sent to the next provider
+    and whichever answers first wins; the other call finishes in the background and
+    only updates the statistics. A provider that fails, or answers 429, loses its turn
+    to the next one immediately and goes to the back of the order for a cooldown.
+
+    Latencies and the hedge delay are measured from the moment a call leaves the
+    process: time spent waiting for admission (a concurrency slot, a rate-limit
+    token) neither counts towards a provider's latency nor triggers a hedge.
+
+    Args:
+        hedge_quantile (float): Latency percentile of the primary after which to hedge.
+        hedge_after (float): Hedge delay used until a provider has HEDGE_MIN_SAMPLES calls.
+        error_cooldown (float): Seconds a provider is tried last after an error.
+        rate_limit_cooldown (float): The same after a 429.
+    """
+
+    def __init__(self, hedge_quantile: float = HEDGE_QUANTILE, hedge_after: float = HEDGE_AFTER,
+                 error_cooldown: float = ERROR_COOLDOWN, rate_limit_cooldown: float = RATE_LIMIT_COOLDOWN):
+        self.hedge_quantile = hedge_quantile
+        self.hedge_after = hedge_after
+        self.error_cooldown = error_cooldown
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self._providers: Dict[Route, _Provider] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _provider(self, route: Route) -> _Provider:
+        provider = self._providers.get(route)
+        if provider is None:
+            provider = self._providers[route] = _Provider()
+        return provider
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=ROUTER_WORKERS, thread_name_prefix="llm-route")
+            return self._executor
+
+    def order(self, routes: Sequence[Route]) -> List[Route]:
+        """
+        `routes` in the order to try them: healthy before cooling down, then fastest p50 first.
+        Ties keep the given order, so the configured provider stays primary until measured.
+        """
+        now = time.monotonic()
+        with self._lock:
+            def rank(route: Route) -> Tuple[bool, float]:
+                provider = self._provider(route)
+                measured = len(provider.latencies) >= HEDGE_MIN_SAMPLES
+                return provider.cooldown_until > now, _quantile(list(provider.latencies), 0.5) if measured else 0.0
+            return sorted(routes, key=rank)
+
+    def hedge_delay(self, route: Route) -> float:
+        with self._lock:
+            latencies = list(self._provider(route).latencies)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return self.hedge_after
+        return _quantile(latencies, self.hedge_quantile)
+
+    def record(self, route: Route, seconds: float, error: Optional[BaseException] = None):
+        labels = {"provider": route[0], "model": route[1]}
+        with self._lock:
+            provider = self._provider(route)
+            provider.calls += 1
+            if error is None:
+                provider.latencies.append(seconds)
+            else:
+                provider.errors += 1
+                limited = status_code(error) == 429
+                provider.rate_limited += limited
+                cooldown = self.rate_limit_cooldown if limited else self.error_cooldown
+                provider.cooldown_until = max(provider.cooldown_until, time.monotonic() + cooldown)
+        if error is None:
+            METRICS.observe("llm_provider_seconds", seconds, labels)
+        else:
+            METRICS.count("llm_provider_errors", labels={**labels, "status": status_code(error) or type(error).__name__})
+
+    def _start(self, route: Route, call: Callable[[], Any],
+               admit: Callable[[Route], ContextManager], sent: Future) -> Future:
+        # Carries the caller's context (its output stream) onto the worker thread
+        context = contextvars.copy_context()
+
+        def timed():
+            with admit(route):
+                # Admitted: from here on the call is upstream
+                start = time.perf_counter()
+                sent.set_result(start)
+                try:
+                    result = call()
+                except Exception as e:
+                    self.record(route, time.perf_counter() - start, e)
+                    raise
+                self.record(route, time.perf_counter() - start)
+                return result
+
+        return self._pool().submit(context.run, timed)
+
+    def call(self, calls: Dict[Route, Callable[[], Any]], hedge: bool = True,
+             admit: Optional[Callable[[Route], ContextManager]] = None) -> Any:
+        """
+        Make one request through whichever provider answers it first.
+
+        Args:
+            calls (Dict[Route, Callable]): The request, prepared for each provider.
+            hedge (bool): Send a second copy when the first is slow. Off for streamed
+                replies, which would otherwise reach the user twice.
+            admit (Callable, optional): admit(route) is entered before each call is sent
+                and held while it runs, e.g. to queue for a slot and a rate-limit token.
+
+        Raises:
+            The first provider's error, if every provider failed.
+        """
+        admit = admit or (lambda route: nullcontext())
+        remaining = self.order(list(calls))
+        running: Dict[Future, Route] = {}
+        first_error: Optional[BaseException] = None
+        hedged = False
+        primary_sent: Future = Future()
+
+        def launch(sent: Future):
+            route = remaining.pop(0)
+            running[self._start(route, calls[route], admit, sent)] = route
+
+        launch(primary_sent)
+        primary_future, primary = next(iter(running.items()))
+        while running:
+            # Only a slow first call is hedged, timed from when it was sent rather than queued;
+            # failures move on to the next provider right away
+            hedging = hedge and not hedged and bool(remaining) and primary_future in running
+            if hedging and not primary_sent.done():
+                done, _ = wait([*running, primary_sent], return_when=FIRST_COMPLETED)
+                done.discard(primary_sent)
+                if not done:
+                    continue
+            else:
+                delay = None
+                if hedging:
+                    delay = max(0.0, primary_sent.result() + self.hedge_delay(primary) - time.perf_counter())
+                done, _ = wait(running, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                METRICS.count("llm_hedged", labels={"provider": remaining[0][0], "model": remaining[0][1]})
+                launch(Future())
+                continue
+            for future in done:
+                route = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    if hedged and route != primary:
+                        with self._lock:
+                            self._provider(route).hedges_won += 1
+                    return future.result()
+                first_error = first_error or error
+                if remaining:
+                    METRICS.count("llm_failover", labels={"provider": remaining[0][0], "model": remaining[0][1]})
+                    launch(Future())
+        raise first_error
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{route[0]}/{route[1]}": {
+                    "calls": p.calls, "errors": p.errors, "rate_limited": p.rate_limited,
+                    "hedges_won": p.hedges_won, "cooling_down": p.cooldown_until > now,
+                    "p50_s": _quantile(list(p.latencies), 0.5) if p.latencies else None,
+                    "p95_s": _quantile(list(p.latencies), 0.95) if p.latencies else None,
+                }
+                for route, p in sorted(self._providers.items())
+            }
+
+
+ROUTER = ProviderRouter()
@@ -0,0 +1,294 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from coding.chatstore import estimate_tokens
+
+LOCAL_CLIENT_CLS = "LocalModelClient"
+LOCAL_MODEL = "local-replay"
+LOCAL_LATENCY = float(os.getenv("LOCAL_LLM_LATENCY", "0.3"))  # seconds before the first token
+LOCAL_TOKENS_PER_SECOND = float(os.getenv("LOCAL_LLM_TPS", "80"))  # <= 0 generates instantly
+LOCAL_REPLY_TOKENS = int(os.getenv("LOCAL_LLM_REPLY_TOKENS", "300"))  # length of generated text replies
+STREAM_CHUNK_TOKENS = 4  # tokens per streamed delta
+
+_FILLER = ("the", "news", "expert", "textbook", "society", "technology", "digital", "platform",
+           "community", "policy", "research", "students", "Taiwan", "change", "data", "culture")
+
+_stats = {"calls": 0, "simulated_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "replayed": 0,
+          "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def local_llm_config(transcript: Optional[str] = None,
+                     latency: Optional[float] = None,
+                     tokens_per_second: Optional[float] = None,
+                     reply_tokens: Optional[int] = None,
+                     stream: bool = False,
+                     model: str = LOCAL_MODEL,
+                     error_rate: float = 0.0,
+                     error_status: int = 429):
+    """
+    LLMConfig selecting the local stand-in model.
+
+    Agents built under it need `register_local_clients` once their tools are registered
+    (registering a tool rebuilds the agent's client).
+    Unset arguments fall back to the LOCAL_LLM_* environment variables.
+
+    Args:
+        transcript (str, optional): JSON transcript to replay (LOCAL_LLM_TRANSCRIPT);
+            without one the built-in student/teacher script is used.
+        latency (float, optional): Seconds before the first token of every reply.
+        tokens_per_second (float, optional): Generation speed; <= 0 generates instantly.
+        reply_tokens (int, optional): Length of generated text replies.
+        stream (bool): Emit the reply as stream events, like an OpenAI config with stream=True.
+        model (str): Model name; stand-ins with different names count as different
+            providers, e.g. to exercise failover between two of them.
+        error_rate (float): Share of calls that fail after the latency with a LocalModelError.
+        error_status (int): HTTP status carried by those errors; 429 is a rate limit.
+    """
+    import autogen
+
+    return autogen.LLMConfig(
+        api_type="openai",
+        model=model,
+        api_key="local",  # never sent anywhere
+        model_client_cls=LOCAL_CLIENT_CLS,
+        transcript=transcript or os.getenv("LOCAL_LLM_TRANSCRIPT"),
+        latency=LOCAL_LATENCY if latency is None else latency,
+        tokens_per_second=LOCAL_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second,
+        reply_tokens=LOCAL_REPLY_TOKENS if reply_tokens is None else reply_tokens,
+        stream=stream,
+        error_rate=error_rate,
+        error_status=error_status,
+    )
+
+
+class LocalModelError(Exception):
+    """
+    Injected failure of the local model, shaped like a provider's HTTP error.
+    """
+
+    def __init__(self, status_code: int, model: str):
+        super().__init__(f"{model} answered {status_code} (injected)")
+        self.status_code = status_code
+
+
+def register_local_clients(*agents):
+    """
+    Attach a LocalModelClient to every agent whose config selects it; other agents are left alone.
+    """
+    for agent in agents:
+        if getattr(agent, "client", None) is None:
+            continue
+        try:
+            agent.register_model_client(LocalModelClient, agent_name=agent.name)
+        except ValueError:
+            pass  # the agent talks to a real model
+
+
+def scripted_transcript(student: str = "Student_Agent", teacher: str = "Teacher_Agent",
+                        query: str = "Taiwan", discipline: str = "Technology and Society",
+                        reply_tokens: int = LOCAL_REPLY_TOKENS) -> List[Dict[str, Any]]:
+    """
+    The two-agent conversation as the page's teacher persona runs it: get_time, a news
+    search, an expert and a textbook search, then the essay and the student's thanks.
+    """
+    def tool_call(call_id: str, name: str, **arguments) -> Dict[str, Any]:
+        return {"id": call_id, "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+    return [
+        {"role": "assistant", "name": student, "content": f"Tell me about {query}."},
+        {"role": "user", "name": teacher, "content": None,
+         "tool_calls": [tool_call("call_local_time", "get_time")]},
+        {"role": "tool", "name": student, "content": None},
+        {"role": "user", "name": teacher, "content": None,
+         "tool_calls": [tool_call("call_local_news", "AG_search_news", query=query)]},
+        {"role": "tool", "name": student, "content": None},
+        {"role": "user", "name": teacher, "content": None,
+         "tool_calls": [tool_call("call_local_expert", "AG_search_expert", discipline=[discipline]),
+                        tool_call("call_local_textbook", "AG_search_textbook", discipline=[discipline])]},
+        {"role": "tool", "name": student, "content": None},
+        {"role": "user", "name": teacher, "content": filler_text(query, reply_tokens)},
+        {"role": "assistant", "name": student, "content": "Thank you, I learned a lot. ALL DONE"},
+    ]
+
+
+def save_transcript(path: str, chat_history: List[Dict[str, Any]]):
+    """
+    Write a finished conversation's chat history as a replayable transcript.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chat_history, f, ensure_ascii=False, indent=1, default=str)
+
+
+def load_transcript(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def filler_text(seed: str, tokens: int) -> str:
+    """
+    Deterministic placeholder prose of about `tokens` tokens; the same seed gives the same text.
+    """
+    start = zlib.crc32(seed.encode("utf-8"))
+    words, chars = [], 0
+    while chars < tokens * 4:
+        word = _FILLER[(start + len(words) * 7) % len(_FILLER)]
+        words.append(word)
+        chars += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+
+def _position(messages: List[Dict[str, Any]]) -> int:
+    """
+    Index in the shared transcript of the reply being asked for.
+
+    Every message of the conversation counts once; the tool results of one turn,
+    which autogen unrolls into a message per call, count as the single turn they are.
+    """
+    position, previous_tool = 0, False
+    for message in messages:
+        if message.get("role") == "system":
+            continue
+        is_tool = message.get("role") == "tool"
+        if not (is_tool and previous_tool):
+            position += 1
+        previous_tool = is_tool
+    return position
+
+
+def local_llm_stats() -> Dict[str, float]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_local_llm_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = type(_stats[key])()
+
+
+class LocalModelClient:
+    """
+    Deterministic stand-in for a chat model, implementing autogen's ModelClient protocol.
+
+    Replies come from a transcript shared by both agents of a conversation: the reply
+    to a conversation of n messages is transcript entry n, unless another agent sent
+    it. Tool calls are replayed with their recorded arguments, so the executing agent
+    runs the real tools. Turns the transcript does not cover, and summaries, get
+    deterministic filler text. Every reply waits `latency` plus its length divided by
+    `tokens_per_second`, so the time spent outside the model can be measured.
+    A share `error_rate` of calls fails instead, after the latency, with a LocalModelError.
+
+    Args:
+        config (dict): The config entry; see `local_llm_config` for its keys.
+        agent_name (str, optional): Name of the agent this client answers for.
+    """
+
+    def __init__(self, config: Dict[str, Any], agent_name: Optional[str] = None, **kwargs):
+        self.model = config.get("model", LOCAL_MODEL)
+        self.agent_name = agent_name
+        self.latency = float(config.get("latency", LOCAL_LATENCY))
+        self.tokens_per_second = float(config.get("tokens_per_second", LOCAL_TOKENS_PER_SECOND))
+        self.reply_tokens = int(config.get("reply_tokens", LOCAL_REPLY_TOKENS))
+        self.error_rate = float(config.get("error_rate", 0.0))
+        self.error_status = int(config.get("error_status", 429))
+        self._random = random.Random(zlib.crc32(f"{self.model}/{agent_name}".encode("utf-8")))
+        path = config.get("transcript")
+        self.transcript = load_transcript(path) if path else scripted_transcript(reply_tokens=self.reply_tokens)
+
+    def _reply(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        said = [m for m in messages if isinstance(m.get("content"), str) and m["content"]]
+        seed = said[-1]["content"] if said else ""
+        if len(messages) > 1 and messages[-1].get("role") == "system":
+            # Summary request (reflection_with_llm): the prompt goes last
+            earlier = said[-2]["content"] if len(said) > 1 else ""
+            return {"content": earlier[:300] or filler_text(seed, 40)}
+
+        position = _position(messages)
+        if position < len(self.transcript):
+            entry = self.transcript[position]
+            if (entry.get("role") != "tool" and not entry.get("tool_responses")
+                    and entry.get("name") in (None, self.agent_name)):  # autogen leaves tool calls unnamed
+                with _stats_lock:
+                    _stats["replayed"] += 1
+                return {"content": entry.get("content"), "tool_calls": entry.get("tool_calls") or None}
+        return {"content": filler_text(seed, self.reply_tokens)}
+
+    def _generate(self, text: str, stream: bool) -> float:
+        tokens = estimate_tokens(text)
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        time.sleep(self.latency)
+        if stream and text:
+            from autogen.events.client_events import StreamEvent
+            from autogen.io.base import IOStream
+
+            iostream = IOStream.get_default()
+            step = STREAM_CHUNK_TOKENS * 4
+            for start in range(0, len(text), step):
+                chunk = text[start:start + step]
+                time.sleep(estimate_tokens(chunk) * per_token)
+                iostream.send(StreamEvent(content=chunk))
+        else:
+            time.sleep(tokens * per_token)
+        return self.latency + tokens * per_token
+
+    def create(self, params: Dict[str, Any]) -> SimpleNamespace:
+        messages = params.get("messages", [])
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            time.sleep(self.latency)
+            with _stats_lock:
+                _stats["errors"] += 1
+                _stats["simulated_seconds"] += self.latency
+            raise LocalModelError(self.error_status, self.model)
+        reply = self._reply(messages)
+        content = reply.get("content") or ""
+        tool_calls = reply.get("tool_calls")
+        generated = content + "".join(call["function"]["arguments"] for call in tool_calls or ())
+        # Tool calls are never streamed as text
+        simulated = self._generate(generated, bool(params.get("stream")) and not tool_calls)
+
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        completion_tokens = estimate_tokens(generated)
+        with _stats_lock:
+            _stats["calls"] += 1
+            _stats["simulated_seconds"] += simulated
+            _stats["prompt_tokens"] += prompt_tokens
+            _stats["completion_tokens"] += completion_tokens
+
+        message = {"role": "assistant", "content": reply.get("content"),
+                   "tool_calls": tool_calls, "function_call": None}
+        return SimpleNamespace(
+            id=f"local-{uuid.uuid4().hex}",
+            model=self.model,
+            choices=[SimpleNamespace(index=0, message=message,
+                                     finish_reason="tool_calls" if tool_calls else "stop")],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens),
+            cost=0.0,
+        )
+
+    def message_retrieval(self, response: SimpleNamespace) -> List[Any]:
+        return [choice.message if choice.message.get("tool_calls") else choice.message["content"]
+                for choice in response.choices]
+
+    def cost(self, response: SimpleNamespace) -> float:
+        return 0.0
+
+    @staticmethod
+    def get_usage(response: SimpleNamespace) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens,
+            "cost": 0.0,
+            "model": response.model,
+        }
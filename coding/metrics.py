@@ -0,0 +1,327 @@
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+METRICS_PREFIX = "kassistant"
+METRICS_LOG = os.getenv("METRICS_LOG")  # JSON-lines file of every measurement; unset disables
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # OpenMetrics endpoint at /metrics; 0 disables
+# Interface the endpoint listens on; loopback only unless a scraper elsewhere needs it, e.g. "0.0.0.0"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SAMPLES_PER_SERIES = 512  # recent values kept per series for the p50/p95 shown in the sidebar
+RECENT_EVENTS = 2000
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# A context variable rather than a thread-local, so work handed to helper threads with
+# contextvars.copy_context() stays attributed to its conversation
+_conversation: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("conversation", default=None)
+
+
+@contextmanager
+def conversation_scope(conversation_id: str) -> Iterator[None]:
+    """
+    Tag every measurement taken on this thread with `conversation_id`.
+    """
+    token = _conversation.set(conversation_id)
+    try:
+        yield
+    finally:
+        _conversation.reset(token)
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum", "samples")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLES_PER_SERIES)
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+
+class Metrics:
+    """
+    Process-wide latency histograms and counters, exported three ways.
+
+    Every measurement updates an in-memory series (for the sidebar panel and the
+    OpenMetrics endpoint), is kept in a bounded list of recent events tagged with the
+    current conversation, and is appended as one JSON line to `log_path` if set.
+
+    Args:
+        log_path (str, optional): JSON-lines file for structured logs.
+    """
+
+    def __init__(self, log_path: Optional[str] = METRICS_LOG):
+        self.log_path = log_path
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_EVENTS)
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def _event(self, kind: str, name: str, value: float, labels: Dict[str, Any], fields: Dict[str, Any]):
+        event = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), kind: name,
+                 "value": value, "conversation": _conversation.get(), **labels, **fields}
+        with self._lock:
+            self._recent.append(event)
+        if self.log_path:
+            line = json.dumps(event, ensure_ascii=False, default=str)
+            try:
+                with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logging.warning(f"Could not write metrics log {self.log_path}: {e}")
+
+    def observe(self, name: str, seconds: float, labels: Optional[Dict[str, Any]] = None, **fields: Any):
+        """
+        Record a duration in histogram `name`; `fields` only go to the event log.
+        """
+        labels = labels or {}
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(seconds)
+        self._event("metric", name, seconds, labels, fields)
+
+    def count(self, name: str, value: float = 1, labels: Optional[Dict[str, Any]] = None, log: bool = True):
+        labels = labels or {}
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        if log:
+            self._event("counter", name, value, labels, {})
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time the block into histogram `name`; keys added to the yielded dict are logged with it.
+        """
+        fields: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            fields["error"] = type(e).__name__
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, labels, **fields)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        One row per histogram series: calls, p50, p95 and total seconds.
+        """
+        with self._lock:
+            rows = [(name, key, h.count, h.sum, list(h.samples))
+                    for name, series in self._histograms.items() for key, h in series.items()]
+        return [{"metric": name, **dict(key), "calls": count, "total_s": total,
+                 "p50_s": _quantile(samples, 0.5), "p95_s": _quantile(samples, 0.95)}
+                for name, key, count, total, samples in sorted(rows) if samples]
+
+    def counters(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"metric": name, **dict(key), "value": value}
+                    for name, series in sorted(self._counters.items()) for key, value in sorted(series.items())]
+
+    def conversation_events(self, conversation_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [e for e in self._recent if e["conversation"] == conversation_id]
+
+    def openmetrics(self) -> str:
+        """
+        All series in the OpenMetrics text format.
+        """
+        def render_labels(key: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{METRICS_PREFIX}_{name}"
+                lines += [f"# TYPE {metric} histogram", f"# UNIT {metric} seconds"]
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket in zip(LATENCY_BUCKETS + (float("inf"),), h.buckets):
+                        cumulative += bucket
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{metric}_bucket{render_labels(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_count{render_labels(key)} {h.count}")
+                    lines.append(f"{metric}_sum{render_labels(key)} {h.sum}")
+            for name, series in sorted(self._counters.items()):
+                metric = f"{METRICS_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{metric}_total{render_labels(key)} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def instrument_tool(func: Callable) -> Callable:
+    """
+    Wrap an agent tool so every execution is timed; signature and docs are kept for the tool schema.
+    """
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        with METRICS.timer("tool_call_seconds", tool=func.__name__):
+            return func(*args, **kwargs)
+
+    return timed
+
+
+def measured(step: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing a library function (an HTTP fetch, a search) as `step`.
+    """
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with METRICS.timer("step_seconds", step=step):
+                return func(*args, **kwargs)
+        return timed
+    return decorate
+
+
+_model_metrics_lock = threading.Lock()
+_model_metrics_enabled = False
+
+
+def enable_model_metrics():
+    """
+    Record every model call (latency, tokens, cache hits) through autogen's runtime logging.
+
+    autogen reports each completion, from any agent, to a single process-wide logger;
+    the one installed here only keeps the completions. Safe to call more than once.
+    """
+    global _model_metrics_enabled
+    with _model_metrics_lock:
+        if _model_metrics_enabled:
+            return
+        from autogen import runtime_logging
+
+        runtime_logging.start(logger=_completion_logger())
+        _model_metrics_enabled = True
+
+
+def _completion_logger():
+    from autogen.logger.base_logger import BaseLogger
+
+    class CompletionLogger(BaseLogger):
+        def start(self) -> str:
+            return "metrics"
+
+        def log_chat_completion(self, invocation_id, client_id, wrapper_id, source, request, response,
+                                is_cached, cost, start_time):
+            try:
+                started = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc)
+                elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+            except (TypeError, ValueError):
+                elapsed = 0.0
+            messages = request.get("messages") or []
+            # reflection_with_llm appends its summary prompt as a trailing system message
+            call = "summary" if len(messages) > 1 and messages[-1].get("role") == "system" else "reply"
+            labels = {"agent": getattr(source, "name", source), "model": request.get("model", ""), "call": call}
+            usage = getattr(response, "usage", None)
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            fields = {"error": response} if isinstance(response, str) else {}  # failed calls log a message
+            METRICS.observe("model_call_seconds", elapsed, {**labels, "cached": bool(is_cached)},
+                            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost=cost, **fields)
+            METRICS.count("model_tokens", prompt_tokens, {**labels, "direction": "prompt"}, log=False)
+            METRICS.count("model_tokens", completion_tokens, {**labels, "direction": "completion"}, log=False)
+
+        def log_new_agent(self, agent, init_args):
+            pass
+
+        def log_event(self, source, name, **kwargs):
+            pass
+
+        def log_new_wrapper(self, wrapper, init_args):
+            pass
+
+        def log_new_client(self, client, wrapper, init_args):
+            pass
+
+        def log_function_use(self, source, function, args, returns):
+            pass
+
+        def stop(self):
+            pass
+
+        def get_connection(self):
+            return None
+
+    return CompletionLogger()
+
+
+_server_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def serve_metrics(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve METRICS at http://host:port/metrics in the OpenMetrics format, once per process.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = METRICS.openmetrics().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # Another worker process already serves this port
+            logging.warning(f"Metrics endpoint not started on port {port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logging.info(f"Serving metrics at http://{host}:{port}/metrics")
+        return _server
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from coding.newsindex import NewsIndex
+from coding.tools import NewsCorpus, fetch_all_news
+
+CacheKey = Tuple[int, int, str]
+
+
+class _Entry:
+    __slots__ = ("value", "index", "loaded_at")
+
+    def __init__(self, value: Any, index: Any, loaded_at: float):
+        self.value = value
+        self.index = index
+        self.loaded_at = loaded_at
+
+
+class NewsCache:
+    """
+    Process-wide cache of fetched news corpora, keyed by (start_page, end_page, list_type).
+
+    Entries younger than `ttl` are served directly. Entries between `ttl` and
+    `max_stale` are still served (stale-while-revalidate) while a single
+    background thread refreshes them. Anything older, or missing, is loaded
+    synchronously; concurrent callers for the same key wait on that one load
+    instead of fetching again.
+
+    When an `indexer` is given, each loaded corpus is indexed as part of the load
+    (so in the background for refreshes), with the previous index for the same
+    key passed along for incremental updates.
+
+    Args:
+        loader (Callable): Called as loader(start_page, end_page, list_type) to build a corpus.
+        ttl (float): Seconds an entry is considered fresh.
+        max_stale (float): Seconds after which a stale entry is no longer served.
+        indexer (Callable, optional): Called as indexer(corpus, previous_index).
+    """
+
+    def __init__(self,
+                 loader: Callable[[int, int, str], Any] = fetch_all_news,
+                 ttl: float = 300.0,
+                 max_stale: float = 3600.0,
+                 indexer: Optional[Callable[[Any, Any], Any]] = None):
+        self.loader = loader
+        self.indexer = indexer
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self._entries: Dict[CacheKey, _Entry] = {}
+        self._inflight: Dict[CacheKey, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    def get(self, start_page: int = 1, end_page: int = 1, list_type: str = 'all') -> Any:
+        """
+        Return the corpus for the given page range, loading or refreshing it as needed.
+        """
+        return self.get_indexed(start_page, end_page, list_type)[0]
+
+    def get_indexed(self, start_page: int = 1, end_page: int = 1,
+                    list_type: str = 'all') -> Tuple[Any, Any]:
+        """
+        Return (corpus, index) for the given page range; index is None without an indexer.
+        """
+        key = (start_page, end_page, list_type)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                age = time.monotonic() - entry.loaded_at if entry else None
+
+                if entry is not None and age < self.ttl:
+                    self._counters["hits"] += 1
+                    return entry.value, entry.index
+
+                if entry is not None and age < self.max_stale:
+                    self._counters["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = threading.Event()
+                        threading.Thread(target=self._refresh, args=(key,),
+                                         name=f"news-refresh-{key}", daemon=True).start()
+                    return entry.value, entry.index
+
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._counters["misses"] += 1
+                    self._inflight[key] = threading.Event()
+                    break
+
+            # Another caller is already loading this key; wait for it and re-check.
+            waiter.wait()
+
+        try:
+            return self._load(key)
+        finally:
+            self._finish(key)
+
+    def _load(self, key: CacheKey) -> Tuple[Any, Any]:
+        value = self.loader(*key)
+        if self._is_empty(value):
+            return value, None
+        index = None
+        if self.indexer is not None:
+            with self._lock:
+                previous = self._entries.get(key)
+            index = self.indexer(value, previous.index if previous else None)
+        with self._lock:
+            self._entries[key] = _Entry(value, index, time.monotonic())
+        return value, index
+
+    def _refresh(self, key: CacheKey):
+        try:
+            value, _ = self._load(key)
+            with self._lock:
+                if self._is_empty(value):
+                    self._counters["refresh_errors"] += 1
+                else:
+                    self._counters["refreshes"] += 1
+        except Exception as e:
+            logging.error(f"Failed to refresh news cache {key}: {e}")
+            with self._lock:
+                self._counters["refresh_errors"] += 1
+        finally:
+            self._finish(key)
+
+    def _finish(self, key: CacheKey):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    @staticmethod
+    def _is_empty(value: Any) -> bool:
+        # fetch_all_news returns an empty frame when every page failed; never cache that.
+        return value is None or bool(getattr(value, 'empty', False))
+
+    def invalidate(self, start_page: Optional[int] = None,
+                   end_page: Optional[int] = None,
+                   list_type: Optional[str] = None):
+        """
+        Drop every entry matching the given parts of the key; parts left as None match
+        anything, so calling without arguments clears the cache.
+        """
+        wanted = (start_page, end_page, list_type)
+        with self._lock:
+            for key in [key for key in self._entries
+                        if all(part is None or part == value for part, value in zip(wanted, key))]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Snapshot of the hit/miss/refresh counters plus the number of cached entries.
+        """
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["entries"] = len(self._entries)
+            snapshot["inflight"] = len(self._inflight)
+        return snapshot
+
+
+def load_news_corpus(start_page: int = 1, end_page: int = 1, list_type: str = 'all') -> NewsCorpus:
+    return NewsCorpus(fetch_all_news(start_page, end_page, list_type=list_type))
+
+
+def _build_index(corpus: NewsCorpus, previous: Optional[NewsIndex]) -> NewsIndex:
+    return NewsIndex.build(corpus.df, previous=previous)
+
+
+NEWS_CACHE = NewsCache(loader=load_news_corpus, indexer=_build_index)
@@ -0,0 +1,204 @@
+import heapq
+import math
+import re
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+INDEX_FIELDS = ('ar_head', 'ar_desc')
+MAX_EXPANSIONS = 10_000  # (field, query term) expansions remembered per index; oldest go first
+
+_WORD_RE = re.compile(r"[0-9a-z]+|[㐀-䶿一-鿿豈-﫿]+")
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+
+
+def tokenize(text) -> List[str]:
+    """
+    Split text into index terms: lowercased latin/digit words, and character
+    bigrams for runs of CJK characters (a lone CJK character is kept as-is).
+    """
+    if text is None or (isinstance(text, float) and math.isnan(text)):
+        return []
+    terms = []
+    for run in _WORD_RE.findall(str(text).lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+class NewsIndex:
+    """
+    Per-field inverted index over a news DataFrame with BM25 ranking.
+
+    Documents are keyed by `ar_id` (or by row position when the column is absent),
+    so `NewsIndex.build(new_df, previous=old_index)` only tokenizes articles
+    that were not in the previous corpus version. Building never mutates the
+    previous index, so searches against an older version stay consistent.
+    """
+
+    def __init__(self, fields: Sequence[str] = INDEX_FIELDS, k1: float = 1.5, b: float = 0.75):
+        self.fields = tuple(fields)
+        self.k1 = k1
+        self.b = b
+        # field -> term -> {doc_key: term frequency}
+        self.postings: Dict[str, Dict[str, Dict[Hashable, int]]] = {f: {} for f in self.fields}
+        # field -> {doc_key: field length in terms}
+        self.lengths: Dict[str, Dict[Hashable, int]] = {f: {} for f in self.fields}
+        self.total_length: Dict[str, int] = {f: 0 for f in self.fields}
+        # doc_key -> row position in the DataFrame this index was built for
+        self.rows: Dict[Hashable, int] = {}
+        # (field, query term) -> indexed terms containing it; filled on first search
+        self._expansions: Dict[Tuple[str, str], List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, previous: Optional["NewsIndex"] = None,
+              fields: Sequence[str] = INDEX_FIELDS) -> "NewsIndex":
+        """
+        Build an index for `df`, reusing postings from `previous` for unchanged articles.
+        """
+        fields = tuple(f for f in fields if f in df.columns)
+        if 'ar_id' in df.columns:
+            keys = df['ar_id'].tolist()
+        else:
+            keys = list(range(len(df)))
+            previous = None  # row positions are not stable across versions
+        if previous is None or previous.fields != fields:
+            index = cls(fields)
+            previous_keys = set()
+        else:
+            index = previous._copy()
+            previous_keys = set(previous.rows)
+
+        index.rows = dict(zip(keys, range(len(df))))
+        current = set(keys)
+        removed = previous_keys - current
+        touched = {f: set() for f in fields}
+        if removed:
+            index._remove(removed, touched)
+
+        added = [pos for pos, key in enumerate(keys) if key not in previous_keys]
+        for field in fields:
+            column = df[field].tolist()
+            for pos in added:
+                index._add(field, keys[pos], tokenize(column[pos]), touched[field])
+        return index
+
+    def _copy(self) -> "NewsIndex":
+        # Shallow copy; inner posting dicts are copied lazily in _touch before mutation.
+        index = NewsIndex(self.fields, self.k1, self.b)
+        index.postings = {f: dict(p) for f, p in self.postings.items()}
+        index.lengths = {f: dict(l) for f, l in self.lengths.items()}
+        index.total_length = dict(self.total_length)
+        return index
+
+    def _touch(self, field: str, term: str, touched: set) -> Dict[Hashable, int]:
+        postings = self.postings[field]
+        if term not in touched:
+            postings[term] = dict(postings.get(term, {}))
+            touched.add(term)
+        return postings[term]
+
+    def _add(self, field: str, key: Hashable, terms: List[str], touched: set):
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self._touch(field, term, touched)[key] = tf
+        self.lengths[field][key] = len(terms)
+        self.total_length[field] += len(terms)
+
+    def _remove(self, keys: Iterable[Hashable], touched: Dict[str, set]):
+        keys = set(keys)
+        for field in self.fields:
+            postings = self.postings[field]
+            for term in list(postings):
+                if keys.isdisjoint(postings[term]):
+                    continue
+                docs = self._touch(field, term, touched[field])
+                for key in keys & docs.keys():
+                    del docs[key]
+                if not docs:
+                    del postings[term]
+            lengths = self.lengths[field]
+            for key in keys:
+                self.total_length[field] -= lengths.pop(key, 0)
+
+    def expand(self, field: str, term: str) -> List[str]:
+        """
+        Indexed terms of `field` that contain `term`, so "taiwan" also finds "taiwanese"
+        the way a substring scan would.
+        """
+        key = (field, term)
+        terms = self._expansions.get(key)
+        if terms is None:
+            terms = [t for t in self.postings[field] if term in t]
+            if len(self._expansions) >= MAX_EXPANSIONS:
+                del self._expansions[next(iter(self._expansions))]
+            self._expansions[key] = terms
+        return terms
+
+    def search(self, query: str, fields: Optional[Sequence[str]] = None,
+               limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Rank documents where every query term occurs, as a term or inside one, in at least one of `fields`.
+
+        The result is a superset of the documents whose text contains `query` as a
+        substring; callers wanting exact substring semantics filter it afterwards.
+
+        Args:
+            query (str): Free-text query; tokenized the same way as the corpus.
+            fields (Sequence[str], optional): Fields to match and score. Defaults to all indexed fields.
+            limit (int, optional): Return only the top `limit` results.
+
+        Returns:
+            List[Tuple[int, float]]: (row position, BM25 score), best first.
+        """
+        fields = [f for f in (fields or self.fields) if f in self.postings]
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not fields or not self.rows:
+            return []
+
+        # AND across query terms, OR across fields and the indexed terms containing them:
+        # intersect starting from the rarest term.
+        expanded = {(field, term): self.expand(field, term) for field in fields for term in terms}
+        term_docs = []
+        for term in terms:
+            docs = set()
+            for field in fields:
+                for indexed in expanded[field, term]:
+                    docs.update(self.postings[field][indexed])
+            if not docs:
+                return []
+            term_docs.append(docs)
+        term_docs.sort(key=len)
+        candidates = term_docs[0].intersection(*term_docs[1:])
+
+        n_docs = len(self.rows)
+        scores = dict.fromkeys(candidates, 0.0)
+        for field in fields:
+            postings = self.postings[field]
+            lengths = self.lengths[field]
+            avg_len = (self.total_length[field] / n_docs) or 1.0
+            for term in terms:
+                for indexed in expanded[field, term]:
+                    docs = postings[indexed]
+                    idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for key in candidates.intersection(docs):
+                        tf = docs[key]
+                        norm = self.k1 * (1 - self.b + self.b * lengths[key] / avg_len)
+                        scores[key] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = scores.items()
+        if limit is not None:
+            ranked = heapq.nlargest(limit, ranked, key=lambda item: item[1])
+        else:
+            ranked = sorted(ranked, key=lambda item: item[1], reverse=True)
+        return [(self.rows[key], score) for key, score in ranked]
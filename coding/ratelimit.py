@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`.
+
+    Args:
+        rate (float): Refill rate in tokens per second; <= 0 disables limiting.
+        capacity (float, optional): Bucket size. Defaults to max(1, rate).
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take `tokens` if available. Returns 0 on success, otherwise the seconds to wait.
+        """
+        if self.rate <= 0:
+            return 0.0
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Block until `tokens` can be taken from the bucket.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
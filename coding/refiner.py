@@ -0,0 +1,149 @@
+import ast
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from coding.ratelimit import TokenBucket
+
+BATCH_SIZE = 20
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 2.0
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+def build_batch_prompt(batch: Sequence[Tuple[int, list]]) -> str:
+    """
+    One prompt carrying several token lists, each tagged with its row id.
+    """
+    payload = json.dumps({str(row_id): tokens for row_id, tokens in batch}, ensure_ascii=False)
+    return (
+        "Refine each of the following token lists. The input is a JSON object that maps a row id "
+        "to that row's token list.\n"
+        "Return ONLY a JSON object with exactly the same row ids as keys and the refined token "
+        "lists as values.\n"
+        f"{payload}"
+    )
+
+
+def parse_batch_reply(reply: Any, row_ids: Sequence[int]) -> Dict[int, list]:
+    """
+    Extract {row_id: refined tokens} from a batch reply.
+
+    Rows that are missing from the reply, or whose value is not a list, are left
+    out so the caller can retry them individually.
+
+    Raises:
+        ValueError: If the reply is not a JSON (or Python literal) object.
+    """
+    text = _FENCE_RE.sub("", str(reply).strip())
+    try:
+        data = json.loads(text)
+    except ValueError:
+        try:
+            data = ast.literal_eval(text)
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(f"Unparseable batch reply: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError(f"Batch reply is a {type(data).__name__}, expected an object")
+
+    wanted = set(row_ids)
+    refined = {}
+    for key, tokens in data.items():
+        try:
+            row_id = int(key)
+        except (TypeError, ValueError):
+            continue
+        if row_id in wanted and isinstance(tokens, list):
+            refined[row_id] = tokens
+    return refined
+
+
+def refine_in_batches(token_lists: Sequence[Any],
+                      ask: Callable[[str], Any],
+                      refine_one: Callable[[list], Any],
+                      batch_size: int = BATCH_SIZE,
+                      max_workers: int = MAX_WORKERS,
+                      requests_per_second: float = REQUESTS_PER_SECOND,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      cache_get: Optional[Callable[[List[list]], Dict[int, Any]]] = None,
+                      cache_put: Optional[Callable[[List[Tuple[list, Any]]], None]] = None) -> List[Any]:
+    """
+    Refine many token lists with few LLM calls.
+
+    Rows are packed `batch_size` at a time into one prompt, batches run on a
+    bounded thread pool behind a shared rate limit, and the results are put
+    back in input order. A row falls back to `refine_one` only when its batch
+    reply could not be parsed or did not include it. Non-list rows are returned
+    unchanged. With a cache, rows it already knows
+    never reach the model and every new result is written back.
+
+    `ask` and `refine_one` are called from several worker threads at once. An
+    agent keeps its chat history and client state between runs, so each call
+    must run on an agent no other thread is using, e.g. one leased from an
+    AgentPool; never close over a single shared agent.
+
+    Args:
+        token_lists (Sequence): One entry per row.
+        ask (Callable): Sends a prompt to the model on an agent of its own and returns its reply text.
+        refine_one (Callable): Single-row fallback, with the same agent requirement as `ask`.
+        batch_size (int): Rows per prompt.
+        max_workers (int): Batches in flight at once.
+        requests_per_second (float): Upper bound on model calls per second.
+        progress (Callable, optional): Called as progress(done_rows, total_rows) from
+            the calling thread, so it may safely update Streamlit elements.
+        cache_get (Callable, optional): Given the pending token lists, returns
+            {position in that list: cached result} for the ones already known.
+        cache_put (Callable, optional): Stores [(token list, refined result), ...] for
+            rows refined by a batch reply; `refine_one` is expected to cache its own.
+
+    Returns:
+        List: Refined rows, aligned with `token_lists`.
+    """
+    results = list(token_lists)
+    pending = [(i, tokens) for i, tokens in enumerate(token_lists) if isinstance(tokens, list)]
+    total = len(pending)
+    if cache_get and pending:
+        cached = cache_get([tokens for _, tokens in pending])
+        for pos, refined in cached.items():
+            results[pending[pos][0]] = refined
+        pending = [item for pos, item in enumerate(pending) if pos not in cached]
+    if progress:
+        progress(total - len(pending), total)
+    if not pending:
+        return results
+
+    limiter = TokenBucket(requests_per_second)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), max(1, batch_size))]
+
+    def run_batch(batch: List[Tuple[int, list]]) -> Tuple[Dict[int, Any], Dict[int, Any]]:
+        row_ids = [row_id for row_id, _ in batch]
+        try:
+            limiter.acquire()
+            refined = parse_batch_reply(ask(build_batch_prompt(batch)), row_ids)
+        except Exception as e:
+            logging.error(f"Batch refinement failed for rows {row_ids[0]}-{row_ids[-1]}: {e}")
+            refined = {}
+        fallback = {}
+        for row_id, tokens in batch:
+            if row_id not in refined:
+                limiter.acquire()
+                fallback[row_id] = refine_one(tokens)
+        return refined, fallback
+
+    done = total - len(pending)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="token-refiner") as pool:
+        futures = {pool.submit(run_batch, batch): len(batch) for batch in batches}
+        for future in as_completed(futures):
+            refined, fallback = future.result()
+            for row_id, tokens in {**refined, **fallback}.items():
+                results[row_id] = tokens
+            # refine_one returns its input on failure, so only batch replies are cached here
+            if cache_put and refined:
+                cache_put([(token_lists[row_id], tokens) for row_id, tokens in refined.items()])
+            done += futures[future]
+            if progress:
+                progress(done, total)
+    return results
@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Set
+
+from coding.llmcache import SQLiteCache, make_key
+
+RESPONSE_CACHE_PATH = os.path.join(".cache", "response_cache.sqlite3")
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "on").lower() not in ("off", "0", "false")
+RESPONSE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))  # seconds a cached answer is served
+MAX_RESPONSES = 5000  # cached answers kept; least recently used go first
+NEAR_DUPLICATE_THRESHOLD = 0.9  # Jaccard similarity of prompt terms; None disables near matches
+
+_TRAILING = " .!?。！？"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Case- and whitespace-insensitive form of a prompt, without trailing punctuation.
+    """
+    return " ".join(prompt.lower().split()).strip(_TRAILING)
+
+
+def _terms(prompt: str) -> Set[str]:
+    # Imported on first use: the news index pulls in pandas, which the pages load lazily
+    from coding.newsindex import tokenize
+
+    return set(tokenize(prompt))
+
+
+class _ScopeIndex:
+    """
+    Inverted index of the cached prompts of one scope, for near-duplicate lookups.
+    """
+
+    def __init__(self):
+        self.terms: Dict[str, Set[str]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+
+    def add(self, key: str, prompt: str):
+        terms = _terms(prompt)
+        if not terms or key in self.terms:
+            return
+        self.terms[key] = terms
+        for term in terms:
+            self.postings.setdefault(term, set()).add(key)
+
+    def remove(self, key: str):
+        for term in self.terms.pop(key, ()):
+            keys = self.postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[term]
+
+    def nearest(self, prompt: str, threshold: float) -> Optional[str]:
+        terms = _terms(prompt)
+        if not terms:
+            return None
+        overlap = Counter(key for term in terms for key in self.postings.get(term, ()))
+        best, best_score = None, threshold
+        for key, shared in overlap.items():
+            score = shared / (len(terms) + len(self.terms[key]) - shared)
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+
+class ResponseCache:
+    """
+    Cache of complete answers to repeated prompts, shared by all sessions and processes.
+
+    Answers are keyed by the normalized prompt and a scope (language, persona, model,
+    ...), so a cached answer is only served where the same agent setup would have
+    produced it. Exact matches are looked up first; with a `near_threshold`, a prompt
+    whose terms nearly match a cached prompt of the same scope is served too. Entries
+    expire after the store's TTL, or sooner when put with a `max_age`, and the least
+    recently used are evicted beyond the store's size.
+
+    Args:
+        store (SQLiteCache): Backing store (carries the TTL and size bound).
+        near_threshold (float, optional): Jaccard similarity needed for a near-duplicate hit.
+    """
+
+    def __init__(self, store: SQLiteCache, near_threshold: Optional[float] = NEAR_DUPLICATE_THRESHOLD):
+        self.store = store
+        self.near_threshold = near_threshold
+        self._indexes: Optional[Dict[str, _ScopeIndex]] = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "near_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _scope_key(scope: Dict[str, Any]) -> str:
+        return make_key(sorted(scope.items()))
+
+    def _index(self, scope_key: str) -> _ScopeIndex:
+        with self._lock:
+            if self._indexes is None:
+                # Built once per process from the stored answers
+                self._indexes = {}
+                for key, value in self.store.items():
+                    self._indexes.setdefault(value["scope"], _ScopeIndex()).add(key, value["prompt"])
+            return self._indexes.setdefault(scope_key, _ScopeIndex())
+
+    def get(self, prompt: str, **scope: Any) -> Optional[Any]:
+        """
+        The cached answer for `prompt` in `scope`, or None.
+        """
+        scope_key = self._scope_key(scope)
+        normalized = normalize_prompt(prompt)
+        entry = self.store.get(make_key("response", scope_key, normalized))
+        counter = "hits"
+        if entry is None and self.near_threshold is not None:
+            index = self._index(scope_key)
+            with self._lock:
+                near_key = index.nearest(normalized, self.near_threshold)
+            if near_key is not None:
+                entry = self.store.get(near_key)
+                counter = "near_hits"
+                if entry is None:
+                    with self._lock:
+                        index.remove(near_key)  # expired or evicted
+        if entry is not None and entry.get("expires") is not None and entry["expires"] <= time.time():
+            entry = None
+        with self._lock:
+            self._counters[counter if entry is not None else "misses"] += 1
+        if entry is not None:
+            logging.info(f"Response cache {counter[:-1].replace('_', ' ')} for {normalized[:60]!r}")
+            return entry["response"]
+        return None
+
+    def put(self, prompt: str, response: Any, max_age: Optional[float] = None, **scope: Any):
+        """
+        Cache `response` for `prompt` in `scope`; with `max_age`, serve it for at most that
+        many seconds, e.g. for answers built on data that goes stale sooner than the store's TTL.
+        """
+        if not response:
+            return
+        scope_key = self._scope_key(scope)
+        normalized = normalize_prompt(prompt)
+        key = make_key("response", scope_key, normalized)
+        value = {"scope": scope_key, "prompt": normalized, "response": response}
+        if max_age is not None:
+            value["expires"] = time.time() + max_age
+        self.store.put(key, value)
+        if self.near_threshold is not None:
+            index = self._index(scope_key)
+            with self._lock:
+                index.add(key, normalized)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+def open_response_cache(path: Optional[str] = None) -> ResponseCache:
+    """
+    The response cache at `path` (RESPONSE_CACHE_PATH env var, or the default location).
+    """
+    path = path or os.getenv("RESPONSE_CACHE_PATH", RESPONSE_CACHE_PATH)
+    return ResponseCache(SQLiteCache(path, max_entries=MAX_RESPONSES, ttl=RESPONSE_TTL))
@@ -0,0 +1,122 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+_DONE = object()
+_REPLY_END = object()
+
+
+class ChunkStream:
+    """
+    autogen IOStream that forwards streamed completion chunks to a queue.
+
+    With `stream=True` in an LLM config, the OpenAI client sends every content delta
+    as a StreamEvent to the current IOStream. Any other event (a message being
+    received, the termination check) means the streamed reply is over; those are
+    otherwise only logged at debug level.
+    """
+
+    def __init__(self, chunks: queue.Queue):
+        from autogen.events.client_events import StreamEvent
+
+        self._chunks = chunks
+        self._stream_event = StreamEvent
+
+    def send(self, message: Any):
+        if isinstance(message, self._stream_event):
+            # Events arrive wrapped; the wrapped event carries the text delta
+            event = message.content
+            self._chunks.put(getattr(event, "content", event))
+        else:
+            self._chunks.put(_REPLY_END)
+            logging.debug(f"autogen event: {type(message).__name__}")
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False):
+        logging.debug(sep.join(map(str, objects)))
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        return ""
+
+
+class StreamingRun:
+    """
+    Run a blocking agent call in a worker thread and follow its replies as they stream.
+
+    Usage from a Streamlit script:
+
+        run = StreamingRun(lambda: user_proxy.initiate_chat(assistant, message=prompt).summary)
+        placeholder = container.chat_message("assistant").empty()
+        for text in run.replies(final=lambda summary: summary):
+            placeholder.markdown(text)
+
+    Args:
+        run (Callable): The blocking call; its return value is kept in `result`.
+    """
+
+    def __init__(self, run: Callable[[], Any]):
+        self._run = run
+        self._chunks: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._target, name="llm-stream", daemon=True)
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.ttft: Optional[float] = None
+        self.elapsed: Optional[float] = None
+
+    def _target(self):
+        from autogen.io import IOStream
+
+        try:
+            with IOStream.set_default(ChunkStream(self._chunks)):
+                self.result = self._run()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._chunks.put(_DONE)
+
+    def replies(self, final: Optional[Callable[[Any], str]] = None) -> Iterator[str]:
+        """
+        Start the call and yield the text streamed so far of the reply in progress.
+
+        A conversation can stream several replies (e.g. the story, then the
+        termination turn); each new one starts again from empty, so showing every
+        yielded value in one placeholder leaves only the latest reply on screen.
+
+        Args:
+            final (Callable, optional): Builds the text to show from `result` once the
+                call is done, e.g. the chat summary. It replaces whatever was streamed,
+                and is all that is shown when the provider streamed nothing (streaming
+                disabled or unsupported).
+
+        Raises:
+            Exception: Whatever the wrapped call raised, after the stream is drained.
+        """
+        started = time.perf_counter()
+        self._thread.start()
+        text = ""
+        reply_over = False
+        while True:
+            chunk = self._chunks.get()
+            if chunk is _DONE:
+                break
+            if chunk is _REPLY_END:
+                reply_over = True
+                continue
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - started
+            if reply_over:
+                text, reply_over = "", False
+            text += chunk
+            yield text
+        self.elapsed = time.perf_counter() - started
+
+        if self.error is not None:
+            raise self.error
+        if final is not None:
+            final_text = final(self.result)
+            if final_text and final_text != text:
+                if self.ttft is None:
+                    self.ttft = self.elapsed
+                yield final_text
+        logging.info(f"LLM reply: time to first token {self.ttft}s, total {self.elapsed:.3f}s")
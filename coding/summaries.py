@@ -0,0 +1,37 @@
+from typing import Any, Callable, Dict, Optional, Union
+
+from coding.chatstore import ChatMessage, fold_extractive
+
+# Cheapest first: "llm" is a whole extra model call after the last turn
+SUMMARY_MODES = ("none", "last_msg", "extractive", "llm")
+
+
+def extractive_summary(sender, recipient, summary_args: Dict[str, Any]) -> str:
+    """
+    `summary_method` for initiate_chat summarizing locally, without a model call: the
+    first sentence of every message that says something (tool calls and results are
+    left out), within SUMMARY_TOKEN_BUDGET.
+    """
+    said = [ChatMessage.from_dict(message) for message in sender.chat_messages.get(recipient, [])
+            if isinstance(message.get("content"), str) and message["content"].strip()
+            and message.get("role") != "tool" and not message.get("tool_calls")]
+    return fold_extractive("", said)
+
+
+def summary_method(mode: str) -> Union[None, str, Callable]:
+    """
+    The initiate_chat `summary_method` for one of SUMMARY_MODES.
+
+    "none" skips the summary (ChatResult.summary is ""), "last_msg" takes the final
+    message, "extractive" runs `extractive_summary`, and "llm" asks the model
+    (autogen's reflection_with_llm).
+    """
+    methods: Dict[str, Optional[Union[str, Callable]]] = {
+        "none": None,
+        "last_msg": "last_msg",
+        "extractive": extractive_summary,
+        "llm": "reflection_with_llm",
+    }
+    if mode not in methods:
+        raise ValueError(f"Unknown summary mode {mode!r}; expected one of {', '.join(SUMMARY_MODES)}")
+    return methods[mode]
@@ -0,0 +1,121 @@
+import re
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tokens that carry no meaning once punctuation is gone (HTML entities, URL parts, ...)
+JUNK_TOKENS = frozenset({"nbsp", "amp", "quot", "lt", "gt", "br", "http", "https", "www", "com", "html"})
+
+_QUOTED = r"""(['"])((?:\\.|(?!\1).)*)\1"""
+# Escape sequences as they appear inside a stringified list, and the raw characters themselves
+_CONTROL = (r"\\(?:x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|[nrtvfab0])"
+            r"|[\x00-\x1f\x7f-\x9f​-‏  　﻿]")
+_PUNCTUATION = r"[^\w\s]|_"
+_SINGLE_CJK = re.compile(r"^[㐀-䶿一-鿿豈-﫿]$")
+_NAME_WORD = re.compile(r"^[A-Z][A-Za-z0-9]*$")
+
+
+def parse_token_lists(values: pd.Series) -> pd.Series:
+    """
+    Turn stringified token lists (as read from CSV, e.g. "['遊戲', '玩家']") into real lists.
+
+    Values that already are lists are kept; other text is split on whitespace and
+    missing values become empty lists.
+    """
+    is_list = values.map(lambda v: isinstance(v, list))
+    # Object dtype keeps Python's unicode-aware regex engine for the str methods
+    text = values.where(~is_list).fillna("").astype(object)
+    bracketed = text.str.lstrip().str.startswith("[")
+
+    parsed = pd.Series([[] for _ in range(len(values))], index=values.index, dtype=object)
+    if is_list.any():
+        parsed[is_list] = values[is_list]
+    quoted = text[bracketed & ~is_list].str.findall(_QUOTED)
+    parsed[quoted.index] = [[token for _, token in matches] for matches in quoted]
+    plain = text[~bracketed & ~is_list].str.split()
+    parsed[plain.index] = plain
+    return parsed
+
+
+def _clean_tokens(tokens: pd.Series) -> pd.Series:
+    tokens = (tokens.str.replace(_CONTROL, "", regex=True)
+                    .str.replace(r"\\?['’]", "", regex=True)
+                    .str.replace(_PUNCTUATION, " ", regex=True)
+                    .str.replace(r"\s+", " ", regex=True)
+                    .str.strip())
+    keep = (tokens.str.len() > 0) & ~tokens.str.lower().isin(JUNK_TOKENS) & ~tokens.str.fullmatch(r"[A-Za-z]")
+    return tokens.where(keep)
+
+
+def clean_token_lists(lists: pd.Series) -> pd.Series:
+    """
+    Strip control characters and punctuation from every token and drop empty, junk
+    and single-letter latin tokens.
+
+    All rows are flattened into one token column and every distinct token is cleaned
+    once, so the regex work follows the vocabulary size rather than the corpus size.
+    """
+    tokens = lists.explode().dropna()
+    result = pd.Series([[] for _ in range(len(lists))], index=lists.index, dtype=object)
+    if tokens.empty:
+        return result
+    codes, vocab = pd.factorize(tokens.astype(object))
+    cleaned_vocab = _clean_tokens(pd.Series(vocab, dtype=object)).to_numpy()
+    cleaned = cleaned_vocab[codes]
+    keep = pd.notna(cleaned)
+    rows = np.asarray(tokens.index)[keep]
+    values = cleaned[keep]
+    if len(rows):
+        # explode keeps row order, so each row's tokens are one contiguous run
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        groups = np.split(values, starts[1:])
+        result[rows[starts]] = [group.tolist() for group in groups]
+    return result
+
+
+def needs_llm(tokens: Sequence[str]) -> bool:
+    """
+    Whether a cleaned list may still hold a term split across tokens, which only the
+    model can merge: adjacent tokens where one is a lone CJK character, or both are
+    capitalized latin words (multi-word names such as "Final Fantasy"). Ordinary
+    English text, where most words are lower case, stays local.
+    """
+    for left, right in zip(tokens, tokens[1:]):
+        if _SINGLE_CJK.match(left) or _SINGLE_CJK.match(right):
+            return True
+        if _NAME_WORD.match(left) and _NAME_WORD.match(right):
+            return True
+    return False
+
+
+def refine_token_column(values: pd.Series,
+                        refine: Callable[[List[list]], List[Any]]) -> Tuple[List[Any], Dict[str, int]]:
+    """
+    Parse and clean a token column locally, then refine only the hard cases.
+
+    Identical cleaned lists are refined once; `refine` receives the distinct lists
+    that `needs_llm` flags and returns their refined versions in the same order.
+
+    Returns:
+        Tuple[List, Dict]: Refined lists aligned with `values`, and counts of
+            rows, distinct lists and lists sent to the model.
+    """
+    try:
+        # Identical raw rows are parsed and cleaned once
+        raw_codes, raw_distinct = pd.factorize(values.astype(object), use_na_sentinel=False)
+        raw_distinct = pd.Series(raw_distinct, dtype=object)
+    except TypeError:  # rows that already are lists are unhashable
+        raw_codes, raw_distinct = np.arange(len(values)), values.reset_index(drop=True)
+    lists = clean_token_lists(parse_token_lists(raw_distinct))
+    codes, _ = pd.factorize(lists.str.join("\x1f"))
+    _, first = np.unique(codes, return_index=True)
+    distinct = [lists.iloc[i] for i in first]
+
+    hard = [pos for pos, tokens in enumerate(distinct) if needs_llm(tokens)]
+    refined = list(distinct)
+    if hard:
+        for pos, result in zip(hard, refine([distinct[pos] for pos in hard])):
+            refined[pos] = result
+    stats = {"rows": len(values), "distinct": len(distinct), "sent_to_llm": len(hard)}
+    return [refined[codes[raw]] for raw in raw_codes], stats
@@ -0,0 +1,89 @@
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from coding.metrics import METRICS
+
+FOREVER = None  # ttl for results that never change during a conversation
+
+
+def canonical_arguments(func: Callable, args: tuple, kwargs: dict) -> str:
+    """
+    Cache key for one call: arguments bound to `func`'s signature with defaults applied.
+
+    Strings are stripped and lists are treated as sets (sorted, deduplicated), since the
+    agent tools take their list arguments as OR filters; None and a missing argument
+    give the same key.
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    def canonical(value: Any) -> Any:
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, (list, tuple, set)):
+            items = {json.dumps(canonical(v), sort_keys=True, default=str) for v in value}
+            return sorted(items)
+        if isinstance(value, dict):
+            return {k: canonical(v) for k, v in value.items()}
+        return value
+
+    return json.dumps({name: canonical(v) for name, v in bound.arguments.items()},
+                      sort_keys=True, default=str)
+
+
+class ToolMemo:
+    """
+    Memoizes tool results for the duration of one conversation.
+
+    Agents tend to repeat identical tool calls across turns; with the tools wrapped at
+    register_function time, a repeated call returns the earlier result instead of
+    filtering or fetching again. Each wrapped tool has its own TTL: 0 disables
+    caching (e.g. the clock), FOREVER keeps the result until `clear()` is called at
+    the end of the conversation. Errors are never cached.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def wrap(self, func: Callable, ttl: Optional[float] = FOREVER) -> Callable:
+        """
+        Return `func` memoized with `ttl` seconds; signature and docs are kept for the tool schema.
+        """
+        if ttl == 0:
+            return func
+
+        @functools.wraps(func)
+        def memoized(*args, **kwargs):
+            key = (func.__qualname__, canonical_arguments(func, args, kwargs))
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and (ttl is None or now - entry[0] < ttl):
+                    self._counters["hits"] += 1
+                    logging.info(f"Tool call memoized: {func.__name__}")
+                    METRICS.count("tool_cache_hits", labels={"tool": func.__name__})
+                    return entry[1]
+                self._counters["misses"] += 1
+            result = func(*args, **kwargs)
+            with self._lock:
+                self._entries[key] = (now, result)
+            return result
+
+        return memoized
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["entries"] = len(self._entries)
+        return snapshot
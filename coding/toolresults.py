@@ -0,0 +1,100 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+from coding.chatstore import estimate_tokens
+
+TOOL_TOKEN_BUDGET = 1200  # estimated tokens per tool result
+ELLIPSIS = "…"
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """
+    Cut `text` to about `budget` estimated tokens, preferring a word boundary.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text
+    while tokens > budget and text:
+        text = text[:max(int(len(text) * budget / tokens) - 1, 0)]
+        tokens = estimate_tokens(text)
+    head, sep, _ = text.rpartition(" ")
+    if sep and len(head) > len(text) // 2:
+        text = head
+    return text.rstrip(" ,;:.") + ELLIPSIS
+
+
+class ResultShape:
+    """
+    Shapes a tool result before it is serialized into the calling agent's context.
+
+    Keeps only `fields` (in that order), cuts long strings to each field's token
+    budget, and keeps whole records, in ranking order, while the estimated size
+    of the JSON payload stays within `token_budget`. Tool payloads therefore have
+    a predictable size whatever columns the upstream data carries.
+
+    Args:
+        fields (Dict[str, Optional[int]]): Field name -> token budget for its value (None: uncut).
+        token_budget (int): Budget for the whole result.
+    """
+
+    def __init__(self, fields: Dict[str, Optional[int]], token_budget: int = TOOL_TOKEN_BUDGET):
+        self.fields = fields
+        self.token_budget = token_budget
+
+    def project(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        shaped = {}
+        for field, budget in self.fields.items():
+            if field not in record:
+                continue
+            value = record[field]
+            if budget is not None and isinstance(value, str):
+                value = truncate_tokens(value, budget)
+            shaped[field] = value
+        return shaped
+
+    def __call__(self, result: Union[pd.DataFrame, List[Dict[str, Any]], Dict[str, Any]]) -> Any:
+        if isinstance(result, dict):
+            # Error or status payloads pass through unchanged
+            return result
+        if isinstance(result, pd.DataFrame):
+            result = result[[c for c in self.fields if c in result.columns]].to_dict(orient="records")
+
+        shaped, used = [], 2  # the enclosing brackets
+        for record in result:
+            record = self.project(record)
+            cost = estimate_tokens(json.dumps(record, ensure_ascii=False, default=str)) + 1
+            if shaped and used + cost > self.token_budget:
+                logging.info(f"Tool result trimmed to {len(shaped)} of {len(result)} records "
+                             f"(~{used} tokens)")
+                break
+            shaped.append(record)
+            used += cost
+        return shaped
+
+
+# What the teacher persona uses from each tool: enough to pick a story and cite its sources
+NEWS_RESULT = ResultShape({
+    "ar_head": 40,
+    "ar_desc": 120,
+    "ar_section": None,
+    "ar_pubdate": None,
+    "url": None,
+})
+
+EXPERT_RESULT = ResultShape({
+    "NAME": None,
+    "DISCIPLINE": None,
+    "INTEREST": 40,
+    "DESCRIPTION": 80,
+})
+
+TEXTBOOK_RESULT = ResultShape({
+    "TITLE": None,
+    "AUTHOR": None,
+    "DISCIPLINE": None,
+    "RELATED_EXPERT": None,
+    "DESCRIPTION": 80,
+})
@@ -1,44 +1,118 @@
+import os
+import random
+import re
+import threading
+import time
+import numpy as np
 import requests
 import pandas as pd
-from coding.constant import TEXTBOOK_LIST, EXPERTS_LIST
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from coding.catalog import EXPERT_INDEX, TEXTBOOK_INDEX
+from coding.metrics import measured
+from typing import Optional, List, Union, TYPE_CHECKING
 import streamlit as st
 
-def fetch_news_json(page_idx: int, list_type: str = 'all') -> dict:
+if TYPE_CHECKING:
+    from coding.newsindex import NewsIndex
+
+# Overridable to point every fetch at a local stand-in server (benchmarks, load tests)
+TAIPEI_TIMES_BASE_URL = os.getenv("TAIPEI_TIMES_BASE_URL", "https://www.taipeitimes.com/ajax_json")
+REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Pages fetched at once, and connections kept alive; covers a 50-page fetch in one round.
+# Lower it to go easier on the news site
+MAX_FETCH_WORKERS = int(os.getenv("NEWS_FETCH_WORKERS", "50"))
+# Characters that make str.contains read a query as a regular expression rather than plain text
+_REGEX_META = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Shared keep-alive session; its connection pool is sized for MAX_FETCH_WORKERS.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_FETCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+def fetch_news_json(page_idx: int,
+                    list_type: str = 'all',
+                    session: Optional[requests.Session] = None,
+                    base_url: str = TAIPEI_TIMES_BASE_URL,
+                    timeout=REQUEST_TIMEOUT,
+                    retries: int = MAX_RETRIES) -> dict:
     if list_type == 'all':  
-        api_url = f"https://www.taipeitimes.com/ajax_json/{page_idx}/list/"
+        api_url = f"{base_url}/{page_idx}/list/"
     else:
-        api_url = f"https://www.taipeitimes.com/ajax_json/{page_idx}/list/{list_type}/"
+        api_url = f"{base_url}/{page_idx}/list/{list_type}/"
 
-    response = requests.get(api_url)
-    response.raise_for_status()
-    return response.json()
+    session = session or get_session()
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(api_url, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            retryable = not isinstance(e, requests.HTTPError) or (
+                e.response is not None and e.response.status_code in RETRY_STATUS)
+            if not retryable or attempt >= retries:
+                raise
+            # Full jitter keeps parallel workers from retrying in lockstep.
+            time.sleep(random.uniform(0, RETRY_BACKOFF * (2 ** attempt)))
 
 def json_to_dataframe(json_data: dict) -> pd.DataFrame:
     return pd.DataFrame.from_dict(json_data, orient='columns')
 
+@measured("fetch_all_news")
 def fetch_all_news(start_page: int = 1,
                    end_page: int = 1,
-                   list_type: str = 'all') -> pd.DataFrame:
+                   list_type: str = 'all',
+                   max_workers: int = MAX_FETCH_WORKERS,
+                   base_url: str = TAIPEI_TIMES_BASE_URL) -> pd.DataFrame:
     """
     Retrieve and compile Taipei Times news into a single DataFrame from API.
 
+    Pages are fetched concurrently over the shared session, so the total cost is
+    roughly that of the slowest page rather than the sum of all of them.
+
     Args:
         start_page (int): First page index to retrieve.
         end_page (int): Last page index to retrieve (inclusive).
         list_type (str): Section of news ('front', 'taiwan', etc.).
+        max_workers (int): Maximum number of pages in flight; 1 fetches serially.
+        base_url (str): API root, overridable to point at a local stand-in server.
 
     Returns:
         pd.DataFrame: Consolidated, sorted, and deduplicated DataFrame of news items.
     """
-    frames = []
-    for page in range(start_page, end_page + 1):
+    session = get_session()
+    pages = list(range(start_page, end_page + 1))
+
+    def fetch_page(page: int) -> Optional[pd.DataFrame]:
         try:
-            json_data = fetch_news_json(page, list_type)
-            df = json_to_dataframe(json_data)
-            frames.append(df)
-        except requests.HTTPError as e:
+            json_data = fetch_news_json(page, list_type, session=session, base_url=base_url)
+            return json_to_dataframe(json_data)
+        except requests.RequestException as e:
             print(f"Failed to fetch page {page}: {e}")
+            return None
+
+    workers = max(1, min(max_workers, MAX_FETCH_WORKERS, len(pages) or 1))
+    if workers == 1:
+        results = [fetch_page(page) for page in pages]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="news-fetch") as pool:
+            results = list(pool.map(fetch_page, pages))
+    frames = [df for df in results if df is not None]
 
     if not frames:
         return pd.DataFrame()
@@ -51,20 +125,127 @@ def fetch_all_news(start_page: int = 1,
 
     return all_df
 
+def normalize_news(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a fetched news DataFrame into its typed, search-ready form.
+
+    `ar_pubdate` becomes datetime64 (unparseable dates become NaT), `ar_section`
+    becomes categorical, and rows are ordered newest first by (ar_pubdate, ar_id)
+    with undated rows last, on a fresh RangeIndex.
+    """
+    df = df.copy()
+    if 'ar_pubdate' in df.columns:
+        dates = pd.to_datetime(df['ar_pubdate'], errors='coerce')
+        if getattr(dates.dtype, 'tz', None) is not None:
+            dates = dates.dt.tz_convert(None)
+        df['ar_pubdate'] = dates
+    if 'ar_section' in df.columns:
+        df['ar_section'] = df['ar_section'].astype('category')
+    sort_cols = [c for c in ('ar_pubdate', 'ar_id') if c in df.columns]
+    if sort_cols:
+        df.sort_values(by=sort_cols, ascending=False, na_position='last',
+                       kind='stable', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+class NewsCorpus:
+    """
+    A normalized news DataFrame plus the lookup structures search_news filters with.
+
+    Because rows are sorted by publish date, a date range is a contiguous block of
+    rows found by binary search, and each section maps to a sorted array of row
+    positions. Filtering therefore costs time proportional to the result size.
+
+    Args:
+        df (pd.DataFrame): News as returned by fetch_all_news.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = normalize_news(df)
+        self.empty = self.df.empty
+        self.columns = self.df.columns
+        if 'ar_pubdate' in self.df.columns:
+            dates = self.df['ar_pubdate'].to_numpy()
+            self._n_dated = int(self.df['ar_pubdate'].notna().sum())
+            self._dates_asc = dates[:self._n_dated][::-1]
+        else:
+            self._n_dated = 0
+            self._dates_asc = np.array([], dtype='datetime64[ns]')
+        if 'ar_section' in self.df.columns:
+            sections = self.df['ar_section']
+            self._section_codes = sections.cat.codes.to_numpy()
+            self._code_of = {cat: code for code, cat in enumerate(sections.cat.categories)}
+            self.section_rows = {
+                cat: rows.astype(np.intp)
+                for cat, rows in self.df.groupby('ar_section', observed=True).indices.items()
+            }
+        else:
+            self._section_codes = np.array([], dtype=np.int8)
+            self._code_of = {}
+            self.section_rows = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def date_bounds(self, date_from: Optional[str] = None, date_to: Optional[str] = None):
+        """
+        Row range [start, stop) whose ar_pubdate lies in the inclusive date range.
+        """
+        if date_from is None and date_to is None:
+            return 0, len(self.df)
+        asc = self._dates_asc
+        lo, hi = 0, len(asc)
+        if date_from is not None:
+            lo = int(np.searchsorted(asc, pd.to_datetime(date_from).to_datetime64().astype(asc.dtype), side='left'))
+        if date_to is not None:
+            hi = int(np.searchsorted(asc, pd.to_datetime(date_to).to_datetime64().astype(asc.dtype), side='right'))
+        hi = max(hi, lo)
+        return self._n_dated - hi, self._n_dated - lo
+
+    def filter_rows(self,
+                    sections: Optional[List[str]] = None,
+                    date_from: Optional[str] = None,
+                    date_to: Optional[str] = None,
+                    candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Row positions matching the section and date filters.
+
+        Without `candidates` the result is in frame (newest first) order; otherwise
+        `candidates` is filtered in place of the whole frame and keeps its order.
+        """
+        start, stop = self.date_bounds(date_from, date_to)
+        if candidates is not None:
+            keep = (candidates >= start) & (candidates < stop)
+            if sections is not None:
+                codes = [self._code_of[s] for s in sections if s in self._code_of]
+                keep &= np.isin(self._section_codes[candidates], codes)
+            return candidates[keep]
+
+        if sections is None:
+            return np.arange(start, stop, dtype=np.intp)
+        parts = [self.section_rows[s] for s in dict.fromkeys(sections) if s in self.section_rows]
+        if not parts:
+            return np.array([], dtype=np.intp)
+        rows = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+        return rows[np.searchsorted(rows, start):np.searchsorted(rows, stop)]
+
+@measured("search_news")
 def search_news(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, NewsCorpus],
     query: Optional[str] = None,
     search_columns: Optional[List[str]] = None,
     sections: Optional[List[str]] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    news_number: Optional[int] = 5
+    news_number: Optional[int] = 5,
+    index: Optional["NewsIndex"] = None
 ) -> pd.DataFrame:
     """
     Search a pre-fetched news DataFrame with multiple optional filters.
 
     Args:
-        df (pd.DataFrame): DataFrame of news articles. Required columns:
+        df (pd.DataFrame | NewsCorpus): DataFrame of news articles, or a NewsCorpus
+            built from one (filters then avoid scanning the whole frame). Required columns:
             - ar_section: section name (e.g. 'Taiwan News', 'Sports', etc.)
             - ar_pubdate: publishing date string 'YYYY-MM-DD'
             - ar_head: article title
@@ -77,6 +258,11 @@ def search_news(
         sections (List[str], optional): List of ar_section values to include.
         date_from (str, optional): Start date (inclusive) 'YYYY-MM-DD'.
         date_to (str, optional): End date (inclusive) 'YYYY-MM-DD'.
+        news_number (int, optional): Maximum number of rows to return.
+        index (NewsIndex, optional): Inverted index built for `df`. When given,
+            only the rows the index finds for `query` are scanned, and matches
+            are ranked by BM25 relevance instead of listed newest first. Which
+            rows match is the same as without the index.
 
     Returns:
         pd.DataFrame: Filtered DataFrame matching all provided criteria.
@@ -103,6 +289,27 @@ def search_news(
     if missing_search:
         raise KeyError(f"Search columns not found in DataFrame: {missing_search}")
 
+    # Ranked retrieval: the index narrows the rows the substring scan below has to
+    # check, so matches are the same as a full scan. Queries it cannot narrow are
+    # scanned in full: regular expressions, and text without index terms (e.g. only
+    # punctuation).
+    ranked_rows = None
+    if query is not None and index is not None and set(search_columns) <= set(index.fields):
+        from coding.newsindex import tokenize
+
+        if tokenize(query) and not _REGEX_META.search(query):
+            ranked_rows = [row for row, _ in index.search(query, fields=search_columns)]
+
+    if isinstance(df, NewsCorpus):
+        candidates = None if ranked_rows is None else np.asarray(ranked_rows, dtype=np.intp)
+        rows = df.filter_rows(sections, date_from, date_to, candidates=candidates)
+        if query is None and news_number is not None:
+            rows = rows[:news_number]
+        df = df.df.iloc[rows]
+        sections = date_from = date_to = None
+    elif ranked_rows is not None:
+        df = df.iloc[ranked_rows]
+
     mask = pd.Series(True, index=df.index)
 
     # Text query filter
@@ -117,14 +324,17 @@ def search_news(
         mask &= df['ar_section'].isin(sections)
 
     # Date range filter
-    dates = pd.to_datetime(df['ar_pubdate'], errors='coerce')
-    if date_from is not None:
-        start = pd.to_datetime(date_from)
-        mask &= (dates >= start)
+    if date_from is not None or date_to is not None:
+        dates = df['ar_pubdate']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors='coerce')
+        if date_from is not None:
+            start = pd.to_datetime(date_from)
+            mask &= (dates >= start)
 
-    if date_to is not None:
-        end = pd.to_datetime(date_to)
-        mask &= (dates <= end)
+        if date_to is not None:
+            end = pd.to_datetime(date_to)
+            mask &= (dates <= end)
 
     result = df[mask].reset_index(drop=True)
 
@@ -136,21 +346,11 @@ def search_news(
 def search_expert(name: str = None,
                   discipline: str = None,
                   interest: str = None):
-    results = []
-    for exp in EXPERTS_LIST["EXPERTS"]:
-        if ((name and name.lower() in exp["NAME"].lower()) or
-            (discipline and discipline.lower() in exp["DISCIPLINE"].lower()) or
-            (interest and interest.lower() in exp["INTEREST"].lower())):
-            results.append(exp)
+    results = EXPERT_INDEX.lookup(NAME=name, DISCIPLINE=discipline, INTEREST=interest)
     return results or [{"error": "No matching experts found."}]
 
 def search_textbook(title: str = None,
                     discipline: str = None,
                     related_expert: str = None):
-    results = []
-    for tb in TEXTBOOK_LIST["TEXTBOOKS"]:
-        if ((title and title.lower() in tb["TITLE"].lower()) or
-            (discipline and discipline.lower() in tb["DISCIPLINE"].lower()) or
-            (related_expert and related_expert.lower() in tb["RELATED_EXPERT"].lower())):
-            results.append(tb)
-    return results or [{"error": "No matching textbooks found."}]
\ No newline at end of file
+    results = TEXTBOOK_INDEX.lookup(TITLE=title, DISCIPLINE=discipline, RELATED_EXPERT=related_expert)
+    return results or [{"error": "No matching textbooks found."}]
@@ -1,20 +1,30 @@
 import streamlit as st
 from typing import List, Dict, Any, Optional
 
-def display_session_msg(container_obj, user_image: Optional[str] = None):
-    # Initialize messages list if not present
-    messages = st.session_state.setdefault("messages", [])
+from coding.chatstore import RENDER_WINDOW, ChatMessage, session_messages, strip_history, windowed_messages
+from coding.metrics import METRICS
 
-    for msg in messages:
-        role = msg.get("role", "user")
-        content = msg.get("content", "")
+def current_session_id() -> Optional[str]:
+    """
+    Id of the Streamlit session running this script, or None outside a script run.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+def display_session_msg(container_obj, user_image: Optional[str] = None, window: int = RENDER_WINDOW):
+    # Only the newest `window` messages are materialized; older ones are paged in on request
+    for msg in windowed_messages(container_obj, window):
+        role = msg.role
+        content = msg.markdown
         avatar = None
 
         # Determine avatar to use
         if role == "assistant":
             avatar = user_image
         elif role not in ["user", "assistant"]:
-            avatar = msg.get("image", None)
+            avatar = msg.image
 
         # Display message
         if avatar:
@@ -22,11 +32,8 @@ def display_session_msg(container_obj, user_image: Optional[str] = None):
         else:
             container_obj.chat_message("ai").markdown(content)
 
-def show_chat_history(container_obj, chat_history: List[Dict[str, Any]], user_image=None):
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
-
-    for entry in chat_history:
+def _visible_history(chat_history: List[Dict[str, Any]]):
+    for index, entry in enumerate(chat_history):
         # 1. Skip any entries whose role is 'tool'
         if entry.get('role') == 'tool':
             continue
@@ -36,20 +43,136 @@ def show_chat_history(container_obj, chat_history: List[Dict[str, Any]], user_im
         if content is None:
             continue
         if isinstance(content, str):
-            # 3. Replace 'ALL DONE' with empty string
-            content = content.replace("ALL_DONE", "")
+            # 3. Replace 'ALL DONE' with empty string and drop history added to the prompt
+            content = strip_history(content.replace("ALL_DONE", ""))
             if not content.strip():
                 continue
         else:
             # non‐string content: skip
             continue
 
-        role = entry.get('role', 'user')
-        # Append to session history
-        st.session_state.messages.append({"role": role, "content": content})
+        yield index, entry.get('role', 'user'), content
+
+def store_chat_history(chat_history: List[Dict[str, Any]], conversation_id: Optional[str] = None):
+    """
+    Append the displayable entries of `chat_history` to the session without rendering them.
+
+    With a `conversation_id`, entries already saved for that conversation are skipped,
+    so saving a conversation again only adds its new turns.
+    """
+    messages = session_messages()
+    for index, role, content in _visible_history(chat_history):
+        key = (conversation_id, index) if conversation_id is not None else None
+        messages.append(ChatMessage(role, content, key=key))
+
+def show_chat_history(container_obj, chat_history: List[Dict[str, Any]], user_image=None,
+                      conversation_id: Optional[str] = None):
+    messages = session_messages()
+
+    for index, role, content in _visible_history(chat_history):
+        # Append to session history; turns of this conversation saved before are not shown again
+        key = (conversation_id, index) if conversation_id is not None else None
+        if not messages.append(ChatMessage(role, content, key=key)):
+            continue
 
         # Display according to role
         if role == 'assistant':
             container_obj.chat_message("assistant", avatar=user_image).write(content)
         else:
             container_obj.chat_message(role).write(content)
+
+def render_chat_entry(container_obj, entry: Dict[str, Any], user_image=None):
+    """
+    Render one live conversation message, including tool calls and tool results.
+    """
+    role = entry.get('role', 'user')
+    if role == 'tool':
+        for response in entry.get('tool_responses') or []:
+            with container_obj.expander("🔧 Tool result"):
+                st.code(str(response.get('content', '')), language=None, wrap_lines=True)
+        return
+
+    message = container_obj.chat_message("assistant", avatar=user_image) if role == 'assistant' \
+        else container_obj.chat_message(role)
+    content = entry.get('content')
+    if isinstance(content, str):
+        content = strip_history(content.replace("ALL_DONE", ""))
+        if content.strip():
+            message.write(content)
+    for call in entry.get('tool_calls') or []:
+        function = call.get('function', {})
+        message.caption(f"🔧 {function.get('name')}({function.get('arguments', '')})")
+
+def show_dataframe_page(container_obj, df, key: str, page_size: int = 100):
+    """
+    Show one page of `df` with a page selector, instead of sending the whole frame to the browser.
+    """
+    pages = max(1, -(-len(df) // page_size))
+    page = container_obj.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key)
+    start = (page - 1) * page_size
+    container_obj.dataframe(df.iloc[start:start + page_size])
+    container_obj.caption(f"Rows {min(start + 1, len(df))}–{min(start + page_size, len(df))} of {len(df)}")
+
+def _series_name(row: Dict[str, Any]) -> str:
+    if row.get("metric") == "model_call_seconds":
+        cached = " (cached)" if str(row.get("cached")) == "True" else ""
+        return f"model: {row.get('agent')} {row.get('call')}{cached}"
+    for label in ("tool", "step"):
+        if row.get(label):
+            return f"{label}: {row[label]}"
+    name = row.get("metric", "").replace("_seconds", "")
+    if row.get("provider"):
+        # Queueing and latency per provider, which the router steers by
+        return f"{name}: {row['provider']}/{row.get('model')}"
+    return name
+
+def show_news_cache_stats(container_obj):
+    """
+    Hit, stale-hit, miss and refresh counts of the shared news cache behind AG_search_news.
+    """
+    # Imported here so pages that never search news do not load the scraper
+    from coding.newscache import NEWS_CACHE
+
+    stats = NEWS_CACHE.stats()
+    lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+    if not lookups:
+        return
+    container_obj.caption(
+        f"News cache: {stats['hits']} hits, {stats['stale_hits']} stale, {stats['misses']} misses "
+        f"of {lookups} lookups; {stats['refreshes']} refreshes ({stats['refresh_errors']} failed), "
+        f"{stats['entries']} entries")
+
+def show_metrics_panel(container_obj, conversation_id: Optional[str] = None):
+    """
+    Where the time went: one conversation broken down by model call, tool and step,
+    then percentiles over everything this process has measured.
+    """
+    if conversation_id is not None:
+        breakdown: Dict[str, Dict[str, float]] = {}
+        for event in METRICS.conversation_events(conversation_id):
+            if "metric" not in event:
+                continue
+            row = breakdown.setdefault(_series_name(event), {"calls": 0, "seconds": 0.0, "tokens": 0})
+            row["calls"] += 1
+            row["seconds"] += event["value"]
+            row["tokens"] += event.get("prompt_tokens", 0) + event.get("completion_tokens", 0)
+        if breakdown:
+            container_obj.caption("Last conversation")
+            container_obj.dataframe([{"what": name, "calls": row["calls"], "seconds": round(row["seconds"], 3),
+                                      "tokens": row["tokens"]} for name, row in breakdown.items()],
+                                    hide_index=True)
+
+    show_news_cache_stats(container_obj)
+
+    rows = METRICS.summary()
+    if not rows:
+        container_obj.caption("No measurements yet.")
+        return
+    container_obj.caption("All conversations")
+    container_obj.dataframe([{"what": _series_name(row), "calls": row["calls"],
+                              "p50 ms": round(row["p50_s"] * 1000, 1), "p95 ms": round(row["p95_s"] * 1000, 1),
+                              "total s": round(row["total_s"], 2)} for row in rows], hide_index=True)
+    for counter in METRICS.counters():
+        if counter["metric"] != "model_tokens":
+            labels = ", ".join(f"{k}={v}" for k, v in counter.items() if k not in ("metric", "value"))
+            container_obj.caption(f"{counter['metric']} ({labels}): {counter['value']:g}")
@@ -1,26 +1,23 @@
 import streamlit as st
-from openai import OpenAI
 import time
 import re
-from dotenv import load_dotenv
 import os
+import uuid
 
-# Import ConversableAgent class
-import autogen
-from autogen import ConversableAgent, LLMConfig, Agent
-from autogen import AssistantAgent, UserProxyAgent, LLMConfig, register_function
-from autogen.code_utils import content_str
 from coding.constant import JOB_DEFINITION, RESPONSE_FORMAT
-from coding.utils import show_chat_history, display_session_msg
-from coding.agenttools import AG_search_expert, AG_search_news, AG_search_textbook, get_time
+from coding.utils import store_chat_history, display_session_msg, render_chat_entry, show_metrics_panel, current_session_id
+from coding.lazy import lazy_import
+from coding.agentpool import AgentPool
+from coding.conversation import ConversationRun
+from coding.chatstore import session_messages, prompt_with_history
+from coding.responsecache import RESPONSE_CACHE_ENABLED, open_response_cache
+from coding.localllm import local_llm_config, register_local_clients, save_transcript
+from coding.metrics import METRICS, conversation_scope, enable_model_metrics, instrument_tool, serve_metrics
+from coding.llmpool import LLM_POOL, llm_session
+from coding.summaries import summary_method
 
-# Load environment variables from .env file
-load_dotenv(override=True)
-
-# https://ai.google.dev/gemini-api/docs/pricing
-# URL configurations
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', None)
-OPEN_API_KEY = os.getenv('OPEN_API_KEY', None)
+# Heavy dependencies load on first use, so rendering the page and chat history stays cheap
+autogen = lazy_import("autogen")
 
 placeholderstr = "Please input your command"
 user_name = "Gild"
@@ -28,64 +25,54 @@ user_image = "https://www.w3schools.com/howto/img_avatar.png"
 
 seed = 42
 
-llm_config_gemini = LLMConfig(
-    api_type = "google", 
-    model="gemini-2.0-flash",                    # The specific model
-    api_key=GEMINI_API_KEY,   # Authentication
-)
-
-llm_config_openai = LLMConfig(
-    api_type = "openai", 
-    model="gpt-4o-mini",                    # The specific model
-    api_key=OPEN_API_KEY,   # Authentication
-)
+# "local" swaps in the deterministic stand-in model (coding/localllm.py) for offline load tests
+AGENT_MODEL = os.getenv('AGENT_MODEL', 'openai')
+# Config that takes over slow or failing calls (coding/llmrouter.py), e.g. "gemini"; hedged calls
+# can be paid twice, so none is used unless set
+AGENT_FALLBACK_MODEL = os.getenv('AGENT_FALLBACK_MODEL', '')
+TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR')  # finished conversations are saved here for replay
+POLL_INTERVAL = 0.5  # seconds between refreshes of a running conversation
+# Reuse the results of repeated tool calls within one conversation (coding/toolmemo.py); off by default
+TOOL_MEMO = os.getenv('TOOL_MEMO', 'off').lower() in ('on', '1', 'true')
+NEWS_TOOL_TTL = 300  # seconds a news search is reused within one conversation
+# How the finished conversation is summarized (coding/summaries.py). The page renders the
+# chat history and never the summary, so by default none is made; "llm" costs a model call
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'none')
 
-def stream_data(stream_str):
-    for word in stream_str.split(" "):
-        yield word + " "
-        time.sleep(0.05)
+@st.cache_resource(show_spinner=False)
+def get_llm_configs():
+    from dotenv import load_dotenv
 
-def save_lang():
-    st.session_state['lang_setting'] = st.session_state.get("language_select")
+    # Load environment variables from .env file
+    load_dotenv(override=True)
+    # Latency and tokens of every model call made by agents built from these configs
+    enable_model_metrics()
 
-def paging():
-    st.page_link("streamlit_app.py", label="Home", icon="🏠")
-    st.page_link("pages/two_agents.py", label="Two Agents' Talk", icon="💭")
+    # https://ai.google.dev/gemini-api/docs/pricing
+    # URL configurations
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', None)
+    OPEN_API_KEY = os.getenv('OPEN_API_KEY', None)
 
-def main():
-    st.set_page_config(
-        page_title='K-Assistant - The Residemy Agent',
-        layout='wide',
-        initial_sidebar_state='auto',
-        menu_items={
-            'Get Help': 'https://streamlit.io/',
-            'Report a bug': 'https://github.com',
-            'About': 'About your application: **Hello world**'
-            },
-        page_icon="img/favicon.ico"
+    llm_config_gemini = autogen.LLMConfig(
+        api_type = "google", 
+        model="gemini-2.0-flash",                    # The specific model
+        api_key=GEMINI_API_KEY,   # Authentication
     )
 
-    # Show title and description.
-    st.title(f"💬 {user_name}'s Chatbot")
-
-    with st.sidebar:
-        paging()
-
-        selected_lang = st.selectbox("Language", ["English", "繁體中文"], index=0, on_change=save_lang, key="language_select")
-        if 'lang_setting' in st.session_state:
-            lang_setting = st.session_state['lang_setting']
-        else:
-            lang_setting = selected_lang
-            st.session_state['lang_setting'] = lang_setting
-
-        st_c_1 = st.container(border=True)
-        with st_c_1:
-            st.image("https://www.w3schools.com/howto/img_avatar.png")
-
-    st_c_chat = st.container(border=True)
-    
-    display_session_msg(st_c_chat, user_image)
+    llm_config_openai = autogen.LLMConfig(
+        api_type = "openai", 
+        model="gpt-4o-mini",                    # The specific model
+        api_key=OPEN_API_KEY,   # Authentication
+    )
+    return {
+        "openai": llm_config_openai,
+        "gemini": llm_config_gemini,
+        "local": local_llm_config(),
+        # Second stand-in, to try hedging and failover offline (AGENT_FALLBACK_MODEL=local_backup)
+        "local_backup": local_llm_config(model="local-backup"),
+    }
 
+def agent_personas(lang_setting):
     student_persona = f"""You are a student willing to learn. After your result, say 'ALL DONE'. Please output in {lang_setting}"""
 
     teacher_persona = f"""You are a teacher. Please try to use tools to answer student's question according to the following rules:
@@ -105,8 +92,24 @@ def main():
     6. Please output in {lang_setting}
 
     """
-    with llm_config_openai:
-    # with llm_config_gemini:
+    return student_persona, teacher_persona
+
+def fallback_config(fallback_key):
+    # Only a provider we hold credentials for can take over
+    config = get_llm_configs().get(fallback_key) if fallback_key else None
+    if config is None or not config.config_list[0].api_key:
+        return None
+    return config
+
+def build_agents(lang_setting, model_key, fallback_key=None, tool_memo=None):
+    from autogen import ConversableAgent, register_function
+    from autogen.code_utils import content_str
+    from coding.agenttools import AG_search_expert, AG_search_news, AG_search_textbook, get_time
+    from coding.toolmemo import FOREVER
+
+    student_persona, teacher_persona = agent_personas(lang_setting)
+
+    with get_llm_configs()[model_key]:
         student_agent = ConversableAgent(
             name="Student_Agent",
             system_message=student_persona,
@@ -119,49 +122,210 @@ def main():
             human_input_mode="NEVER",
         )
 
+    # Executions are timed; with a tool_memo, repeated calls reuse the earlier result
+    memoized = tool_memo.wrap if tool_memo is not None else lambda func, ttl: func
+
     register_function(
-        AG_search_expert,
+        memoized(instrument_tool(AG_search_expert), ttl=FOREVER),
         caller=teacher_agent,
         executor=student_agent,
         description="Search EXPERTS_LIST by name, discipline, or interest.",
     )
 
     register_function(
-        AG_search_textbook,
+        memoized(instrument_tool(AG_search_textbook), ttl=FOREVER),
         caller=teacher_agent,
         executor=student_agent,
         description="Search TEXTBOOK_LIST by title, discipline, or related_expert.",
     )
 
     register_function(
-        AG_search_news,
+        memoized(instrument_tool(AG_search_news), ttl=NEWS_TOOL_TTL),
         caller=teacher_agent,
         executor=student_agent,
         description="Search a pre-fetched news DataFrame by keywords, sections, and date range.",
     )
 
     register_function(
-        get_time,
+        instrument_tool(get_time),
         caller=teacher_agent,
         executor=student_agent,
         description="Get the current date & time.",
     )
+    register_local_clients(student_agent, teacher_agent)
+    # Model calls share the process-wide rate limits, concurrency bound and request coalescing,
+    # and are hedged or failed over to the fallback provider when it is configured
+    LLM_POOL.attach(student_agent, teacher_agent, fallback=fallback_config(fallback_key))
+
+    return student_agent, teacher_agent
+
+def build_agent_group(lang_setting, model_key, fallback_key=None, memoize_tools=False):
+    # What the pool leases: the agent pair and its tool memo (None when disabled)
+    from coding.toolmemo import ToolMemo
+
+    tool_memo = ToolMemo() if memoize_tools else None
+    return build_agents(lang_setting, model_key, fallback_key, tool_memo) + (tool_memo,)
+
+def reset_agents(group):
+    student_agent, teacher_agent, tool_memo = group
+    for agent in (student_agent, teacher_agent):
+        agent.clear_history()
+    if tool_memo is not None:
+        tool_memo.clear()
+
+@st.cache_resource(show_spinner=False)
+def get_agent_pool(lang_setting, model_key, fallback_key, memoize_tools):
+    # One pool per language and model for the whole process; sessions lease agent pairs from it
+    return AgentPool(lambda: build_agent_group(lang_setting, model_key, fallback_key, memoize_tools),
+                     reset=reset_agents)
+
+# Answers to repeated openers, shared by all sessions and worker processes
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return open_response_cache()
+
+def used_tool(chat_history, name):
+    return any(call.get("function", {}).get("name") == name
+               for entry in chat_history for call in entry.get("tool_calls") or [])
+
+def cacheable_history(chat_history):
+    # Only what the page renders; tool calls and results are not replayed
+    return [{"role": entry.get("role", "user"), "content": entry["content"]}
+            for entry in chat_history if isinstance(entry.get("content"), str)]
+
+def save_lang():
+    st.session_state['lang_setting'] = st.session_state.get("language_select")
+
+def paging():
+    st.page_link("streamlit_app.py", label="Home", icon="🏠")
+    st.page_link("pages/two_agents.py", label="Two Agents' Talk", icon="💭")
+
+def main():
+    st.set_page_config(
+        page_title='K-Assistant - The Residemy Agent',
+        layout='wide',
+        initial_sidebar_state='auto',
+        menu_items={
+            'Get Help': 'https://streamlit.io/',
+            'Report a bug': 'https://github.com',
+            'About': 'About your application: **Hello world**'
+            },
+        page_icon="img/favicon.ico"
+    )
+
+    # Show title and description.
+    st.title(f"💬 {user_name}'s Chatbot")
+
+    with st.sidebar:
+        paging()
+
+        selected_lang = st.selectbox("Language", ["English", "繁體中文"], index=0, on_change=save_lang, key="language_select")
+        if 'lang_setting' in st.session_state:
+            lang_setting = st.session_state['lang_setting']
+        else:
+            lang_setting = selected_lang
+            st.session_state['lang_setting'] = lang_setting
+
+        st_c_1 = st.container(border=True)
+        with st_c_1:
+            st.image("https://www.w3schools.com/howto/img_avatar.png")
+
+        st.toggle("Reuse cached answers", value=RESPONSE_CACHE_ENABLED, key="use_response_cache")
+        if st.toggle("Show timings", value=False, key="show_metrics"):
+            with st.expander("Timings", expanded=True):
+                show_metrics_panel(st, st.session_state.get("last_conversation_id"))
+
+    # OpenMetrics endpoint for dashboards, when METRICS_PORT is set; one per process
+    serve_metrics()
+
+    st_c_chat = st.container(border=True)
+    
+    display_session_msg(st_c_chat, user_image)
+
+    agent_pool = get_agent_pool(lang_setting, AGENT_MODEL, AGENT_FALLBACK_MODEL, TOOL_MEMO)
 
     def generate_response(prompt):
-        chat_result = student_agent.initiate_chat(
-            teacher_agent,
-            message = prompt,
-            summary_method="reflection_with_llm",
-            max_turns=10,
-        )
+        # The bounded session history (rolling summary plus recent turns) goes along with the prompt
+        message = prompt_with_history(prompt, session_messages().context())
+        session_id = current_session_id()
+
+        # Runs on the conversation's worker thread; the script only polls it
+        def converse(run):
+            with llm_session(session_id), conversation_scope(run.id), \
+                    METRICS.timer("conversation_seconds", page="two_agents") as fields:
+                with agent_pool.lease() as (student_agent, teacher_agent, _):
+                    with run.watch(student_agent, teacher_agent):
+                        result = student_agent.initiate_chat(
+                            teacher_agent,
+                            message = message,
+                            summary_method=summary_method(SUMMARY_MODE),
+                            max_turns=10,
+                        )
+                fields["messages"] = len(result.chat_history)
+                fields["summary_mode"] = SUMMARY_MODE
+                return result
+
+        return ConversationRun(converse).start()
+
+    def live_conversation():
+        run = st.session_state.get("conversation")
+        if run is None:
+            return
+        run.touch()
 
-        response = chat_result.chat_history
-        # st.write(response)
-        return response
+        for entry in run.messages():
+            render_chat_entry(st, entry, user_image)
+
+        if run.done:
+            # Keep the finished exchange in the session history and stop polling
+            response = run.result.chat_history if run.result is not None else run.messages()
+            store_chat_history(response, conversation_id=run.id)
+            st.session_state["last_conversation_id"] = run.id
+            if TRANSCRIPT_DIR and run.result is not None:
+                save_transcript(os.path.join(TRANSCRIPT_DIR, f"{run.id}.json"), response)
+            del st.session_state["conversation"]
+            cache_request = st.session_state.pop("conversation_cache", None)
+            if cache_request is not None and run.result is not None:
+                prompt, cache_scope = cache_request
+                # Answers built on a news search go stale as fast as the search itself
+                max_age = NEWS_TOOL_TTL if used_tool(response, "AG_search_news") else None
+                get_response_cache().put(prompt, cacheable_history(response), max_age=max_age, **cache_scope)
+            if run.error is not None:
+                st.session_state["conversation_error"] = str(run.error)
+            st.rerun()
+        elif run.cancelled:
+            st.caption("Stopping after the current turn…")
+        else:
+            st.status("Agents are talking…", state="running")
+            if st.button("Stop", key="stop_conversation"):
+                run.cancel()
 
     def chat(prompt: str):
-        response = generate_response(prompt)
-        show_chat_history(st_c_chat, response, user_image)
+        previous = st.session_state.get("conversation")
+        if previous is not None:
+            previous.cancel()
+        st.session_state.pop("conversation_cache", None)
+
+        # Openers (nothing earlier in the conversation) can be answered from the response cache
+        if len(session_messages()) == 0 and st.session_state.get("use_response_cache", RESPONSE_CACHE_ENABLED):
+            cache_scope = dict(lang=lang_setting, persona=agent_personas(lang_setting), model=AGENT_MODEL)
+            cached = get_response_cache().get(prompt, **cache_scope)
+            METRICS.count("response_cache_lookups", labels={"result": "miss" if cached is None else "hit"})
+            if cached is not None:
+                # Saved like a finished conversation, then rendered by display_session_msg
+                store_chat_history(cached, conversation_id=uuid.uuid4().hex)
+                st.rerun()
+            st.session_state["conversation_cache"] = (prompt, cache_scope)
+
+        st.session_state["conversation"] = generate_response(prompt)
+        st.rerun()
+
+    if error := st.session_state.pop("conversation_error", None):
+        st_c_chat.error(f"The conversation stopped early: {error}")
+
+    with st_c_chat:
+        running = "conversation" in st.session_state
+        st.fragment(live_conversation, run_every=POLL_INTERVAL if running else None)()
 
     if prompt := st.chat_input(placeholder=placeholderstr, key="chat_bot"):
         chat(prompt)
@@ -1,28 +1,27 @@
-from openai import OpenAI
 import time
 import re
-from dotenv import load_dotenv
 import os
 import ast
-import pandas as pd
 import logging
-
-# Import ConversableAgent class
-import autogen
-from autogen import ConversableAgent, LLMConfig
-from autogen import AssistantAgent, UserProxyAgent, LLMConfig
-from autogen.code_utils import content_str
-from coding.constant import JOB_DEFINITION, RESPONSE_FORMAT
+import statistics
 
 import streamlit as st
 
-# Load environment variables from .env file
-load_dotenv(override=True)
-
-# https://ai.google.dev/gemini-api/docs/pricing
-# URL configurations
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', None)
-OPEN_API_KEY = os.getenv('OPEN_API_KEY', None)
+from coding.lazy import lazy_import
+from coding.agentpool import AgentPool, ask_agent
+from coding.refiner import refine_in_batches
+from coding.llmcache import SQLiteCache, DEFAULT_CACHE_PATH, make_key, normalize_tokens
+from coding.streaming import StreamingRun
+from coding.responsecache import RESPONSE_CACHE_ENABLED, open_response_cache
+from coding.utils import show_dataframe_page, show_metrics_panel, current_session_id
+from coding.chatstore import session_messages, windowed_messages, prompt_with_history
+from coding.localllm import local_llm_config, register_local_clients
+from coding.metrics import enable_model_metrics, serve_metrics
+from coding.llmpool import LLM_POOL, in_session
+
+# Heavy dependencies load on first use, so rendering the page and chat history stays cheap
+autogen = lazy_import("autogen")
+pd = lazy_import("pandas")
 
 placeholderstr = "Please input your command"
 user_name = "Gild"
@@ -30,73 +29,205 @@ user_image = "https://www.w3schools.com/howto/img_avatar.png"
 
 seed = 42
 
-llm_config_gemini = LLMConfig(
-    api_type = "google", 
-    model="gemini-2.0-flash-lite",                    # The specific model
-    api_key=GEMINI_API_KEY,   # Authentication
+# LLM config used by the storyteller; "openai_stream" renders replies token by token,
+# "local"/"local_stream" use the offline stand-in model (coding/localllm.py)
+STORY_MODEL = os.getenv('STORY_MODEL', 'gemini')
+# Config that takes over slow or failing calls (coding/llmrouter.py), e.g. "openai"; hedged calls
+# can be paid twice, so none is used unless set
+STORY_FALLBACK_MODEL = os.getenv('STORY_FALLBACK_MODEL', '')
+REFINER_FALLBACK_MODEL = os.getenv('REFINER_FALLBACK_MODEL', '')
+# Prompts the local intent classifier is unsure about are sent to the LLM only when this is on
+INTENT_LLM = os.getenv('INTENT_LLM', 'off').lower() in ('on', '1', 'true')
+# Seconds a token list whose refinement failed keeps its cleaned tokens before the model is asked again
+REFINE_RETRY_AFTER = float(os.getenv('REFINE_RETRY_AFTER', '600'))
+
+REFINER_MODEL = "gpt-4o-mini"
+REFINER_SYSTEM_MESSAGE = (
+    "You are a Chinese token refinement expert.\n"
+    "Input: a list of tokens, or a JSON object that maps row ids to token lists, already stop-word "
+    "filtered and cleaned of control characters and punctuation.\n"
+    "Merge game-specific terminologies split across tokens and remove meaningless tokens.\n"
+    "Return the cleaned tokens in the shape of the input: a list for a single list, or a JSON object "
+    "with the same row ids as keys for several."
 )
 
-llm_config_openai = LLMConfig(
-    api_type = "openai", 
-    model="gpt-4o-mini",                    # The specific model
-    api_key=OPEN_API_KEY,   # Authentication
-)
+@st.cache_resource(show_spinner=False)
+def get_llm_configs():
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv(override=True)
+    # Latency and tokens of every model call made by agents built from these configs
+    enable_model_metrics()
+
+    # https://ai.google.dev/gemini-api/docs/pricing
+    # URL configurations
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', None)
+    OPEN_API_KEY = os.getenv('OPEN_API_KEY', None)
 
-with llm_config_gemini:
-    assistant = AssistantAgent(
-        name="assistant",
-        system_message=(
-        "You are a helpful storyteller assistant. "
-        "Please give me a story. After your result, say 'ALL DONE'. "
-        "Do not say 'ALL DONE' in the same response."
-        ),
-        max_consecutive_auto_reply=2
+    llm_config_gemini = autogen.LLMConfig(
+        api_type = "google", 
+        model="gemini-2.0-flash-lite",                    # The specific model
+        api_key=GEMINI_API_KEY,   # Authentication
     )
 
-with llm_config_openai:
-    tokens_refiner = ConversableAgent(
-        name="tokens_refiner",
-        system_message=(
-            "You are a Chinese token refinement expert.\n"
-            "Input: a list of tokens, already stop-word filtered.\n"
-            "Remove control characters, punctuation, meaningless tokens, and merge game-specific terminologies.\n"
-            "Return the cleaned tokens as a Python list."
+    llm_config_openai = autogen.LLMConfig(
+        api_type = "openai", 
+        model=REFINER_MODEL,                    # The specific model
+        api_key=OPEN_API_KEY,   # Authentication
+    )
+    # Same model with streaming on; ag2 only streams OpenAI-compatible clients, not Gemini
+    llm_config_openai_stream = autogen.LLMConfig(
+        api_type = "openai", 
+        model=REFINER_MODEL,
+        api_key=OPEN_API_KEY,
+        stream=True,
+    )
+    return {
+        "openai": llm_config_openai,
+        "openai_stream": llm_config_openai_stream,
+        "gemini": llm_config_gemini,
+        "local": local_llm_config(),
+        "local_stream": local_llm_config(stream=True),
+    }
+
+def story_streams():
+    # ag2 streams only configs with stream=True, and only from OpenAI-compatible clients
+    return bool(getattr(get_llm_configs()[STORY_MODEL].config_list[0], "stream", False))
+
+def fallback_config(fallback_key):
+    # Only a provider we hold credentials for can take over
+    config = get_llm_configs().get(fallback_key) if fallback_key else None
+    if config is None or not config.config_list[0].api_key:
+        return None
+    return config
+
+def build_story_agents():
+    from autogen.code_utils import content_str
+
+    with get_llm_configs()[STORY_MODEL]:
+        assistant = autogen.AssistantAgent(
+            name="assistant",
+            system_message=(
+            "You are a helpful storyteller assistant. "
+            "Please give me a story. After your result, say 'ALL DONE'. "
+            "Do not say 'ALL DONE' in the same response."
+            ),
+            max_consecutive_auto_reply=2
         )
+
+    user_proxy = autogen.UserProxyAgent(
+        "user_proxy",
+        human_input_mode="NEVER",
+        code_execution_config=False,
+        is_termination_msg=lambda x: content_str(x.get("content")).find("ALL DONE") >= 0,
     )
+    register_local_clients(assistant)
+    # Model calls share the process-wide rate limits, concurrency bound and request coalescing,
+    # and are hedged or failed over to the fallback provider when it is configured
+    LLM_POOL.attach(assistant, fallback=fallback_config(STORY_FALLBACK_MODEL))
+    return user_proxy, assistant
+
+def build_tokens_refiner():
+    with get_llm_configs()["openai"]:
+        tokens_refiner = autogen.ConversableAgent(
+            name="tokens_refiner",
+            system_message=REFINER_SYSTEM_MESSAGE
+        )
+    register_local_clients(tokens_refiner)
+    LLM_POOL.attach(tokens_refiner, fallback=fallback_config(REFINER_FALLBACK_MODEL))
+    return (tokens_refiner,)
+
+def build_intent_agent():
+    with get_llm_configs()[STORY_MODEL]:
+        intent_agent = autogen.ConversableAgent(
+            name="intent_classifier",
+            system_message="You classify user prompts into jobs. Reply with the requested JSON only."
+        )
+    register_local_clients(intent_agent)
+    LLM_POOL.attach(intent_agent)
+    return (intent_agent,)
+
+def reset_agents(agents):
+    for agent in agents:
+        agent.clear_history()
+
+# Agents are built on first use and shared by all sessions; each conversation leases its own group
+@st.cache_resource(show_spinner=False)
+def get_story_pool():
+    return AgentPool(build_story_agents, reset=reset_agents)
+
+@st.cache_resource(show_spinner=False)
+def get_refiner_pool():
+    return AgentPool(build_tokens_refiner, reset=reset_agents)
+
+@st.cache_resource(show_spinner=False)
+def get_intent_pool():
+    return AgentPool(build_intent_agent, reset=reset_agents)
+
+# Answers to repeated openers, shared by all sessions and worker processes
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return open_response_cache()
+
+# Refined token lists survive reruns and restarts; shared by all worker processes
+@st.cache_resource(show_spinner=False)
+def get_refine_cache():
+    return SQLiteCache(os.getenv('LLM_CACHE_PATH', DEFAULT_CACHE_PATH))
+
+def refine_cache_key(token_list):
+    return make_key("tokens_refiner", normalize_tokens(token_list), REFINER_MODEL, REFINER_SYSTEM_MESSAGE)
+
+def known_refinement(token_list, cached):
+    # A failed refinement is remembered as a marker, answered with the cleaned tokens until it is retried
+    if isinstance(cached, dict) and "failed_at" in cached:
+        return token_list if time.time() - cached["failed_at"] < REFINE_RETRY_AFTER else None
+    return cached
+
+def cached_refinements(token_lists):
+    keys = [refine_cache_key(tokens) for tokens in token_lists]
+    found = get_refine_cache().get_many(keys)
+    known = {i: known_refinement(token_lists[i], found.get(key)) for i, key in enumerate(keys)}
+    return {i: refined for i, refined in known.items() if refined is not None}
+
+def cache_refinements(pairs):
+    get_refine_cache().put_many([(refine_cache_key(tokens), refined) for tokens, refined in pairs])
 
 # 3. Helper to refine tokens via LLM
-def refine_by_llm(token_list):
+def ask_tokens_refiner(prompt, refiner_pool=None):
+    # Worker threads get the pool passed in; st.cache_resource getters belong to the script thread
+    with (refiner_pool or get_refiner_pool()).lease() as (tokens_refiner,):
+        return ask_agent(tokens_refiner, prompt)
+
+def ask_intent_agent(prompt):
+    with get_intent_pool().lease() as (intent_agent,):
+        return ask_agent(intent_agent, prompt)
+
+def ask_story_assistant(prompt):
+    with get_story_pool().lease() as (_, assistant):
+        return ask_agent(assistant, prompt)
+
+def refine_by_llm(token_list, refiner_pool=None, refine_cache=None):
+    refine_cache = get_refine_cache() if refine_cache is None else refine_cache
+    key = refine_cache_key(token_list)
+    cached = known_refinement(token_list, refine_cache.get(key))
+    if cached is not None:
+        return cached
+
     prompt = f"Refine the following token list: {token_list}"
     try:
         
-        result = tokens_refiner.run(task=prompt)
-        
-        return ast.literal_eval(result.final_output)
+        refined = ast.literal_eval(ask_tokens_refiner(prompt, refiner_pool))
+        refine_cache.put(key, refined)
+        return refined
     except Exception as e:
         logging.error(f"Error refining tokens: {e}")
+        refine_cache.put(key, {"failed_at": time.time()})
         return token_list
 
-def refine_tokens_list(token_list):
-    if not isinstance(token_list, list):
-        return token_list
-    
-    return refine_by_llm(token_list)
-
-
-user_proxy = UserProxyAgent(
-    "user_proxy",
-    human_input_mode="NEVER",
-    code_execution_config=False,
-    is_termination_msg=lambda x: content_str(x.get("content")).find("ALL DONE") >= 0,
-)
 
 # Function Declaration 
 
-def stream_data(stream_str):
-    for word in stream_str.split(" "):
-        yield word + " "
-        time.sleep(0.05)
-
 def save_lang():
     st.session_state['lang_setting'] = st.session_state.get("language_select")
 
@@ -117,21 +248,51 @@ def main():
         page_icon="img/favicon.ico"
     )
 
+    # Model calls made for this session, on any thread, are scheduled fairly against other sessions
+    session_id = current_session_id()
+
     #Read Data
     csv_path = 'article_data.csv'
     if not os.path.exists(csv_path):
         st.error(f"CSV file not found at {csv_path}. 請確認檔案已放在專案根目錄。")
         return
 
-    df = pd.read_csv(csv_path)
+    # Parsed once per file version and shared by all sessions; large tables are paged, not shipped whole
+    from coding.articles import load_articles, TOKENS_COLUMN
+
+    df = load_articles(csv_path)
     st.subheader("Preview of Raw Data")
-    st.dataframe(df)
+    show_dataframe_page(st, df, key="raw_data_page")
 
-    raw_col = 'tokenize and stop words without remove control'
+    raw_col = TOKENS_COLUMN
     if raw_col in df.columns:
         st.subheader("Refining tokens with LLM skill")
-        df['tokens_refined'] = df[raw_col].apply(refine_tokens_list)
-        st.dataframe(df[[raw_col, 'tokens_refined']])
+        progress_bar = st.progress(0.0, text="Refining tokens...")
+
+        def show_progress(done, total):
+            progress_bar.progress(done / total if total else 1.0, text=f"Refined {done}/{total} rows")
+
+        # Parsing, cleaning and deduplication run locally; only lists that may hold split terms reach the model
+        from coding.tokenclean import refine_token_column
+
+        refiner_pool, refine_cache = get_refiner_pool(), get_refine_cache()
+        tokens_refined, refine_stats = refine_token_column(
+            df[raw_col],
+            refine=lambda token_lists: refine_in_batches(
+                token_lists,
+                ask=in_session(session_id, lambda prompt: ask_tokens_refiner(prompt, refiner_pool)),
+                refine_one=in_session(session_id, lambda tokens: refine_by_llm(tokens, refiner_pool, refine_cache)),
+                progress=show_progress,
+                cache_get=cached_refinements,
+                cache_put=cache_refinements,
+            ),
+        )
+        progress_bar.progress(1.0, text=f"Refined {refine_stats['rows']} rows")
+        st.caption(f"{refine_stats['distinct']} distinct token lists after local cleaning, "
+                   f"{refine_stats['sent_to_llm']} needed the LLM")
+        # The loaded frame is shared, so the refined column goes into a new frame
+        refined_df = pd.DataFrame({raw_col: df[raw_col], 'tokens_refined': tokens_refined})
+        show_dataframe_page(st, refined_df, key="refined_page")
     else:
         st.warning(f"Column '{raw_col}' not found in CSV.")
 
@@ -151,59 +312,96 @@ def main():
         with st_c_1:
             st.image("https://www.w3schools.com/howto/img_avatar.png")
 
+        st.toggle("Reuse cached answers", value=RESPONSE_CACHE_ENABLED, key="use_response_cache")
+
+        if not story_streams():
+            st.caption(f"Replies appear once complete: the '{STORY_MODEL}' config does not stream. "
+                       "Set STORY_MODEL=openai_stream to see them token by token.")
+        ttft_history = [t for t in st.session_state.get("ttft_history", []) if t is not None]
+        if ttft_history:
+            st.caption(f"Time to first token: {ttft_history[-1]:.2f}s "
+                       f"(median {statistics.median(ttft_history):.2f}s over {len(ttft_history)} replies)")
+
+        # Filled below, once this run's prompt has been classified
+        intent_slot = st.empty()
+
+        if st.toggle("Show timings", value=False, key="show_metrics"):
+            with st.expander("Timings", expanded=True):
+                show_metrics_panel(st)
+
+    # OpenMetrics endpoint for dashboards, when METRICS_PORT is set; one per process
+    serve_metrics()
+
     st_c_chat = st.container(border=True)
 
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    else:
-        for msg in st.session_state.messages:
-            if msg["role"] == "user":
-                if user_image:
-                    st_c_chat.chat_message(msg["role"],avatar=user_image).markdown((msg["content"]))
-                else:
-                    st_c_chat.chat_message(msg["role"]).markdown((msg["content"]))
-            elif msg["role"] == "assistant":
-                st_c_chat.chat_message(msg["role"]).markdown((msg["content"]))
+    messages = session_messages()
+    # Only the newest page of messages is rendered on each rerun
+    for msg in windowed_messages(st_c_chat):
+        if msg.role == "user":
+            if user_image:
+                st_c_chat.chat_message(msg.role,avatar=user_image).markdown(msg.markdown)
             else:
-                try:
-                    image_tmp = msg.get("image")
-                    if image_tmp:
-                        st_c_chat.chat_message(msg["role"],avatar=image_tmp).markdown((msg["content"]))
-                except:
-                    st_c_chat.chat_message(msg["role"]).markdown((msg["content"]))
+                st_c_chat.chat_message(msg.role).markdown(msg.markdown)
+        elif msg.role == "assistant":
+            st_c_chat.chat_message(msg.role).markdown(msg.markdown)
+        elif msg.image:
+            st_c_chat.chat_message(msg.role,avatar=msg.image).markdown(msg.markdown)
+        else:
+            st_c_chat.chat_message(msg.role).markdown(msg.markdown)
     
     st.header("Chat with Assistant")
     user_prompt = st.text_input("Enter a prompt for story generation:")
     if user_prompt:
         st.markdown(f"**You:** {user_prompt}")
-        result = assistant.run(task=user_prompt)
-        response = result.final_output
+        response = in_session(session_id, ask_story_assistant)(user_prompt)
         st.markdown(f"**Assistant:** {response}")
 
     story_template = ("Give me a story started from '##PROMPT##'."
                       f"And remeber to mention user's name {user_name} in the end. Add some emoji in the end of each sentence."
                       f"Please express in {lang_setting}")
 
-    classification_template = ("You are a classification agent, your job is to classify what ##PROMPT## is according to the job definition list in <JOB_DEFINITION>"
-    "<JOB_DEFINITION>"
-    f"{JOB_DEFINITION}"
-    "</JOB_DEFINITION>"
-    "Please output in JSON-format only."
-    "JSON-format is as below:"
-    f"{RESPONSE_FORMAT}"
-    "Let's think step by step."
-    f"Please output in {lang_setting}"
-    )
+    def classify_job(prompt):
+        # Clear-cut prompts are classified locally in microseconds; uncertain ones stay unclassified
+        # unless INTENT_LLM allows an LLM call for them
+        from coding.intent import INTENT_CLASSIFIER, build_classification_prompt
+
+        if not INTENT_LLM:
+            return INTENT_CLASSIFIER.classify(prompt)
+        classification_template = build_classification_prompt("##PROMPT##", lang_setting)
+        try:
+            return INTENT_CLASSIFIER.route(prompt, ask_llm=in_session(session_id, ask_intent_agent),
+                                           template=classification_template)
+        except Exception as e:
+            logging.error(f"Error classifying prompt: {e}")
+            return None
+
+    def show_intent():
+        if "last_intent" not in st.session_state:
+            return
+        last_intent = st.session_state["last_intent"]
+        if last_intent is None:
+            intent_slot.caption("Intent: unclear")
+        else:
+            intent_slot.caption(f"Intent: {last_intent.job} ({'local' if last_intent.local else 'LLM'})")
+
+    def job_template(intent):
+        # [REPLY_TASK] prompts are answered exactly as written; everything else becomes a story
+        if intent is not None and intent.job == "REPLY_TASK":
+            return "##PROMPT##"
+        return story_template
+
+    # Resolved on the script thread; generate_response runs on a worker thread
+    story_pool = get_story_pool()
 
-    def generate_response(prompt):
+    def generate_response(prompt, history="", template=story_template):
 
         # prompt_template = f"Give me a story started from '{prompt}'"
-        prompt_template = story_template.replace('##PROMPT##',prompt)
-        # prompt_template = classification_template.replace('##PROMPT##',prompt)
-        result = user_proxy.initiate_chat(
-        recipient=assistant,
-        message=prompt_template
-        )
+        prompt_template = prompt_with_history(template.replace('##PROMPT##',prompt), history)
+        with story_pool.lease() as (user_proxy, assistant):
+            result = user_proxy.initiate_chat(
+            recipient=assistant,
+            message=prompt_template
+            )
 
         response = result.summary
         return response
@@ -212,14 +410,35 @@ def main():
     # Chat function section (timing included inside function)
     def chat(prompt: str):
         st_c_chat.chat_message("user",avatar=user_image).write(prompt)
-        st.session_state.messages.append({"role": "user", "content": prompt})
-
-        response = generate_response(prompt)
-
-        st_c_chat.chat_message("assistant").write(response)
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        intent = classify_job(prompt)
+        st.session_state["last_intent"] = intent
+        show_intent()
+        template = job_template(intent)
+        # Earlier turns, folded into a rolling summary beyond the token budget, are sent along
+        history = messages.context()
+        messages.append({"role": "user", "content": prompt})
+
+        # Openers (nothing earlier in the conversation) can be answered from the response cache
+        cacheable = not history and st.session_state.get("use_response_cache", RESPONSE_CACHE_ENABLED)
+        cache_scope = dict(lang=lang_setting, persona=template, model=STORY_MODEL)
+        cached = get_response_cache().get(prompt, **cache_scope) if cacheable else None
+        if cached is not None:
+            response = st_c_chat.chat_message("assistant").write_stream([cached])
+        else:
+            # Tokens are rendered as the provider streams them, each reply replacing the one before;
+            # the chat summary, as shown without streaming, is what stays on screen
+            run = StreamingRun(in_session(session_id, lambda: generate_response(prompt, history, template)))
+            placeholder = st_c_chat.chat_message("assistant").empty()
+            response = ""
+            for response in run.replies(final=lambda summary: summary):
+                placeholder.markdown(response)
+            st.session_state.setdefault("ttft_history", []).append(run.ttft)
+            if cacheable:
+                get_response_cache().put(prompt, response, **cache_scope)
+        messages.append({"role": "assistant", "content": response})
         
     
+    show_intent()
     if prompt := st.chat_input(placeholder=placeholderstr, key="chat_bot"):
         chat(prompt)
 
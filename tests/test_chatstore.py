@@ -0,0 +1,74 @@
+from coding.chatstore import ChatMessage, MessageStore, estimate_tokens, prompt_with_history
+
+
+def message(role, content, key=None):
+    return ChatMessage(role, content, key=key)
+
+
+def test_keyed_messages_are_added_once():
+    store = MessageStore()
+    turns = [message("user", "hi", key=0), message("assistant", "hello", key=1)]
+
+    assert all(store.append(turn) for turn in turns)
+    # Saving the same conversation again only adds its new turn
+    added = [store.append(turn) for turn in turns + [message("user", "again", key=2)]]
+
+    assert added == [False, False, True]
+    assert [msg.content for msg in store] == ["hi", "hello", "again"]
+
+
+def test_unkeyed_messages_and_dicts_are_always_appended():
+    store = MessageStore([{"role": "user", "content": "hi"}, {"role": "user", "content": "hi"}])
+
+    assert len(store) == 2
+    assert store[0]["role"] == "user" and store[0].get("image") is None
+
+
+def test_window_returns_the_newest_messages_oldest_first():
+    store = MessageStore(message("user", f"m{i}") for i in range(10))
+
+    assert [msg.content for msg in store.window(3)] == ["m7", "m8", "m9"]
+    assert len(store.window(50)) == 10
+    assert store.window(0) == []
+
+
+def test_log_is_bounded_and_trimmed_messages_are_summarized():
+    store = MessageStore(max_messages=5, token_budget=10_000)
+    for i in range(300):
+        store.append(message("user", f"turn {i}."))
+
+    assert len(store) <= 5 + 200
+    assert store.dropped == 300 - len(store)
+    assert store[-1].content == "turn 299."
+    # The newest dropped turn made it into the summary
+    assert store.summary.endswith(f"- user: turn {store.dropped - 1}.")
+
+
+def test_context_folds_old_turns_beyond_the_token_budget():
+    store = MessageStore(token_budget=40)
+    for i in range(20):
+        store.append(message("user" if i % 2 == 0 else "assistant", f"Sentence number {i}. More detail here."))
+
+    context = store.context()
+    assert context.startswith("Summary of the earlier conversation:\n- user: Sentence number 0.")
+    assert context.endswith("assistant: Sentence number 19. More detail here.")
+    assert store.tokens <= 40
+    # Folded turns leave the context but stay in the log
+    assert store.folded > 0 and len(store) == 20
+
+
+def test_context_strips_history_blocks_added_to_prompts():
+    store = MessageStore()
+    store.append(message("user", prompt_with_history("Tell a story", "user: earlier turn")))
+
+    assert store.context() == "user: Tell a story"
+
+
+def test_clear_empties_log_summary_and_keys():
+    store = MessageStore([message("user", "hi", key="a")], token_budget=1)
+    store.append(message("user", "more", key="b"))
+    store.clear()
+
+    assert len(store) == 0 and store.summary == "" and store.context() == ""
+    assert store.append(message("user", "hi", key="a"))
+    assert store.tokens == estimate_tokens("hi")
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+import pytest
+
+from coding import tools
+from coding.tools import fetch_all_news
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from newsserver import ITEMS_PER_PAGE, NewsServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with NewsServer(latency=0.2) as server:
+        yield server
+
+
+def test_fifty_pages_cost_about_one_page(server):
+    started = time.monotonic()
+    df = fetch_all_news(1, 50, base_url=server.base_url)
+    elapsed = time.monotonic() - started
+
+    assert server.requests == 50
+    assert len(df) == 50 * ITEMS_PER_PAGE
+    # Serially this would take 10 s
+    assert elapsed < 1.5
+
+
+def test_result_is_sorted_and_deduplicated(server):
+    df = fetch_all_news(2, 4, base_url=server.base_url)
+    again = fetch_all_news(3, 3, base_url=server.base_url)
+
+    assert df['ar_id'].is_monotonic_decreasing and df['ar_id'].is_unique
+    assert set(again['ar_id']) <= set(df['ar_id'])
+
+
+def test_workers_are_bounded(server, monkeypatch):
+    monkeypatch.setattr(tools, "MAX_FETCH_WORKERS", 4)
+    started = time.monotonic()
+    fetch_all_news(1, 8, max_workers=16, base_url=server.base_url)
+
+    # Two rounds of four pages
+    assert time.monotonic() - started >= 0.4
+
+
+def test_failed_fetch_returns_an_empty_frame(monkeypatch):
+    monkeypatch.setattr(tools, "RETRY_BACKOFF", 0)
+
+    assert fetch_all_news(1, 2, base_url="http://127.0.0.1:9/ajax_json").empty
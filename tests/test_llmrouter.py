@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+from coding.llmpool import ClientPool, FairScheduler, llm_session
+from coding.llmrouter import ProviderRouter
+
+PRIMARY = ("openai", "primary")
+BACKUP = ("google", "backup")
+
+
+class StubBackend:
+    """
+    A provider stand-in: answers after `latency` seconds, or raises `error`.
+    """
+
+    def __init__(self, name, latency=0.0, error=None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return self.name
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def make_router(**kwargs):
+    kwargs.setdefault("hedge_after", 0.05)
+    return ProviderRouter(**kwargs)
+
+
+def test_fast_primary_is_not_hedged():
+    router = make_router()
+    primary, backup = StubBackend("primary", 0.01), StubBackend("backup")
+
+    assert router.call({PRIMARY: primary, BACKUP: backup}) == "primary"
+    assert backup.calls == 0
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    router = make_router()
+    primary, backup = StubBackend("primary", 0.5), StubBackend("backup", 0.01)
+
+    assert router.call({PRIMARY: primary, BACKUP: backup}) == "backup"
+    assert primary.calls == backup.calls == 1
+    assert router.stats()["google/backup"]["hedges_won"] == 1
+
+
+def test_hedging_off_waits_for_primary():
+    router = make_router()
+    primary, backup = StubBackend("primary", 0.2), StubBackend("backup")
+
+    assert router.call({PRIMARY: primary, BACKUP: backup}, hedge=False) == "primary"
+    assert backup.calls == 0
+
+
+def test_failover_on_error_then_primary_cools_down():
+    router = make_router(error_cooldown=60)
+    primary, backup = StubBackend("primary", error=RuntimeError("boom")), StubBackend("backup")
+
+    assert router.call({PRIMARY: primary, BACKUP: backup}, hedge=False) == "backup"
+    assert router.order([PRIMARY, BACKUP]) == [BACKUP, PRIMARY]
+    stats = router.stats()["openai/primary"]
+    assert stats["errors"] == 1 and stats["cooling_down"]
+
+
+def test_every_provider_failing_raises_first_error():
+    router = make_router()
+    first = RuntimeError("primary down")
+    calls = {PRIMARY: StubBackend("primary", error=first), BACKUP: StubBackend("backup", error=RuntimeError())}
+
+    with pytest.raises(RuntimeError) as raised:
+        router.call(calls)
+    assert raised.value is first
+
+
+def test_rate_limit_cools_down_longer_than_errors():
+    router = make_router(error_cooldown=0.05, rate_limit_cooldown=60)
+    router.call({PRIMARY: StubBackend("primary", error=RateLimited()), BACKUP: StubBackend("backup")})
+    router.call({BACKUP: StubBackend("backup", error=RuntimeError()), PRIMARY: StubBackend("primary")})
+    time.sleep(0.1)
+
+    # The plain error has cooled down, the 429 has not
+    assert router.order([PRIMARY, BACKUP]) == [BACKUP, PRIMARY]
+    assert router.stats()["openai/primary"]["rate_limited"] == 1
+
+
+def test_faster_provider_becomes_primary_once_measured():
+    router = make_router()
+    for _ in range(20):
+        router.record(PRIMARY, 0.5)
+        router.record(BACKUP, 0.1)
+
+    assert router.order([PRIMARY, BACKUP]) == [BACKUP, PRIMARY]
+
+
+def test_call_queued_in_the_pool_is_neither_hedged_nor_timed():
+    router = make_router()
+    pool = ClientPool(max_concurrency=1, rate_limits={}, default_rate=0, router=router)
+    release = threading.Event()
+    blocker = threading.Thread(target=pool.call, args=(PRIMARY, release.wait))
+    blocker.start()
+    while pool.stats()["in_use"] == 0:
+        time.sleep(0.001)
+
+    primary, backup = StubBackend("primary", 0.01), StubBackend("backup", 0.01)
+    result = []
+    routed = threading.Thread(target=lambda: result.append(pool.routed_call({PRIMARY: primary, BACKUP: backup})))
+    routed.start()
+    # Queued behind the blocking call for well past the hedge delay
+    time.sleep(0.3)
+    release.set()
+    routed.join(5)
+    blocker.join(5)
+
+    assert result == ["primary"]
+    assert backup.calls == 0
+    assert router.stats()["openai/primary"]["p95_s"] < 0.2
+
+
+def test_fair_scheduler_alternates_between_sessions():
+    scheduler = FairScheduler(1)
+    release = threading.Event()
+    order = []
+
+    def hold():
+        with scheduler.slot("holder"):
+            release.wait()
+
+    def take(session):
+        with scheduler.slot(session):
+            order.append(session)
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    while scheduler.stats()["in_use"] == 0:
+        time.sleep(0.001)
+    # Session "a" queues three calls before "b" queues its one
+    for waiting, session in enumerate(["a", "a", "a", "b"], start=1):
+        thread = threading.Thread(target=take, args=(session,))
+        thread.start()
+        threads.append(thread)
+        while scheduler.stats()["waiting"] < waiting:
+            time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_routed_calls_wait_in_their_session_queue():
+    pool = ClientPool(max_concurrency=1, rate_limits={}, default_rate=0, router=make_router())
+    release = threading.Event()
+    order = []
+
+    def hold():
+        with llm_session("holder"):
+            pool.call(PRIMARY, release.wait)
+
+    def routed(session):
+        with llm_session(session):
+            pool.routed_call({PRIMARY: lambda: order.append(session)}, hedge=False)
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    while pool.stats()["in_use"] == 0:
+        time.sleep(0.001)
+    for waiting, session in enumerate(["a", "a", "b"], start=1):
+        thread = threading.Thread(target=routed, args=(session,))
+        thread.start()
+        threads.append(thread)
+        while pool.stats()["waiting"] < waiting:
+            time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["a", "b", "a"]
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pandas as pd
+
+from coding.newscache import NewsCache
+
+
+class StubLoader:
+    """
+    Returns ("corpus", n) for the n-th load after `latency` seconds, or the queued `results` first.
+    """
+
+    def __init__(self, latency=0.0, results=()):
+        self.latency = latency
+        self.results = list(results)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, start_page, end_page, list_type):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+            queued = self.results.pop(0) if self.results else None
+        time.sleep(self.latency)
+        return queued if queued is not None else ("corpus", calls)
+
+
+def wait_idle(cache):
+    while cache.stats()["inflight"]:
+        time.sleep(0.005)
+
+
+def test_concurrent_misses_share_one_load():
+    loader = StubLoader(latency=0.2)
+    cache = NewsCache(loader=loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(1, 2, 'all'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert loader.calls == 1
+    assert results == [("corpus", 1)] * 8
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 7
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    loader = StubLoader(latency=0.1)
+    cache = NewsCache(loader=loader, ttl=0.05, max_stale=60)
+    cache.get()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    stale = [cache.get() for _ in range(5)]
+    assert time.monotonic() - started < 0.05
+    assert stale == [("corpus", 1)] * 5
+
+    wait_idle(cache)
+    assert cache.get() == ("corpus", 2)
+    stats = cache.stats()
+    assert loader.calls == 2
+    assert stats["stale_hits"] == 5 and stats["refreshes"] == 1
+
+
+def test_entries_past_max_stale_are_loaded_again():
+    loader = StubLoader()
+    cache = NewsCache(loader=loader, ttl=0.01, max_stale=0.02)
+    cache.get()
+    time.sleep(0.05)
+
+    assert cache.get() == ("corpus", 2)
+    assert cache.stats()["stale_hits"] == 0
+
+
+def test_empty_results_are_not_cached():
+    loader = StubLoader(results=[pd.DataFrame()])
+    cache = NewsCache(loader=loader)
+
+    assert cache.get().empty
+    assert cache.stats()["entries"] == 0
+    assert cache.get() == ("corpus", 2)
+
+
+def test_empty_refresh_keeps_the_stale_entry():
+    loader = StubLoader()
+    cache = NewsCache(loader=loader, ttl=0.01, max_stale=60)
+    cache.get()
+    time.sleep(0.02)
+    loader.results.append(pd.DataFrame())
+
+    cache.get()
+    wait_idle(cache)
+
+    assert cache.get() == ("corpus", 1)
+    assert cache.stats()["refresh_errors"] == 1
+
+
+def test_invalidate_matches_any_part_of_the_key():
+    cache = NewsCache(loader=StubLoader())
+    for key in [(1, 1, 'all'), (1, 3, 'all'), (1, 3, 'world'), (2, 3, 'all')]:
+        cache.get(*key)
+
+    cache.invalidate(list_type='all', end_page=3)
+    assert cache.stats()["entries"] == 2
+    cache.invalidate(start_page=1)
+    assert cache.stats()["entries"] == 0
+
+    cache.get(2, 3, 'all')
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_refresh_indexes_with_the_previous_index():
+    seen = []
+
+    def indexer(corpus, previous):
+        seen.append(previous)
+        return f"index of {corpus[1]}"
+
+    cache = NewsCache(loader=StubLoader(), ttl=0.01, max_stale=60, indexer=indexer)
+    assert cache.get_indexed() == (("corpus", 1), "index of 1")
+    time.sleep(0.02)
+    cache.get_indexed()
+    wait_idle(cache)
+
+    assert cache.get_indexed() == (("corpus", 2), "index of 2")
+    assert seen == [None, "index of 1"]
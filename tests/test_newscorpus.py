@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from coding.tools import NewsCorpus, search_news
+
+
+@pytest.fixture(autouse=True)
+def quiet_streamlit(monkeypatch):
+    monkeypatch.setattr("coding.tools.st.info", lambda *args, **kwargs: None)
+
+
+@pytest.fixture
+def news():
+    rng = np.random.default_rng(11)
+    rows = 400
+    dates = pd.date_range('2024-05-25', '2024-06-10', freq='D').strftime('%Y-%m-%d').tolist()
+    pubdates = rng.choice(dates + ['not a date', None], size=rows).tolist()
+    return pd.DataFrame({
+        'ar_id': np.arange(rows),
+        'ar_section': rng.choice(['Taiwan News', 'World News', 'Sports', 'Business'], size=rows),
+        'ar_pubdate': pubdates,
+        'ar_head': [f"headline {i}" for i in range(rows)],
+        'ar_desc': [f"description {i}" for i in range(rows)],
+    })
+
+
+def baseline_ids(df, sections=None, date_from=None, date_to=None):
+    # The mask filter search_news applies to a plain frame
+    mask = pd.Series(True, index=df.index)
+    if sections is not None:
+        mask &= df['ar_section'].isin(sections)
+    dates = pd.to_datetime(df['ar_pubdate'], errors='coerce')
+    if date_from is not None:
+        mask &= dates >= pd.to_datetime(date_from)
+    if date_to is not None:
+        mask &= dates <= pd.to_datetime(date_to)
+    return set(df.loc[mask, 'ar_id'])
+
+
+CASES = [
+    dict(),
+    dict(date_from='2024-06-01'),
+    dict(date_to='2024-06-01'),
+    dict(date_from='2024-06-01', date_to='2024-06-01'),  # a single day, both edges inclusive
+    dict(date_from='2024-05-25', date_to='2024-06-10'),  # exactly the first and last day
+    dict(date_from='2024-06-03', date_to='2024-06-02'),  # inverted: empty
+    dict(date_from='2023-01-01', date_to='2023-12-31'),  # before every article
+    dict(date_from='2025-01-01'),  # after every article
+    dict(date_from='2024-06-01 12:00'),  # mid-day bound excludes that day
+    dict(sections=['Sports']),
+    dict(sections=['Sports', 'Business', 'Sports'], date_from='2024-06-02', date_to='2024-06-05'),
+    dict(sections=['Weather']),  # unknown section
+    dict(sections=['Weather', 'Sports'], date_to='2024-05-30'),
+    dict(sections=[]),
+]
+
+
+@pytest.mark.parametrize("filters", CASES, ids=[str(case) for case in CASES])
+def test_corpus_filters_match_the_mask_filter(news, filters):
+    result = search_news(NewsCorpus(news), news_number=None, **filters)
+
+    assert set(result['ar_id']) == baseline_ids(news, **filters)
+    assert len(result) == len(set(result['ar_id']))
+
+
+@pytest.mark.parametrize("filters", CASES, ids=[str(case) for case in CASES])
+def test_candidates_are_filtered_in_their_own_order(news, filters):
+    corpus = NewsCorpus(news)
+    candidates = np.random.default_rng(5).permutation(len(corpus)).astype(np.intp)
+
+    rows = corpus.filter_rows(candidates=candidates, **filters)
+
+    assert set(corpus.df['ar_id'].iloc[rows]) == baseline_ids(news, **filters)
+    positions = {row: pos for pos, row in enumerate(candidates)}
+    assert [positions[row] for row in rows] == sorted(positions[row] for row in rows)
+
+
+def test_unfiltered_rows_are_newest_first(news):
+    result = search_news(NewsCorpus(news), news_number=None, sections=['Business'])
+
+    dated = result['ar_pubdate'].dropna()
+    assert dated.is_monotonic_decreasing
+    # Undated and unparseable rows come last
+    assert result['ar_pubdate'].iloc[len(dated):].isna().all()
+
+
+def test_date_bounds_of_an_undated_corpus(news):
+    corpus = NewsCorpus(news.assign(ar_pubdate=None))
+
+    assert corpus.date_bounds() == (0, len(news))
+    assert corpus.date_bounds('2024-06-01') == (0, 0)
+    assert search_news(corpus, date_to='2024-06-01').empty
+
+
+def test_news_tool_formats_dates_without_touching_the_cached_corpus(news, monkeypatch):
+    from coding import agenttools
+
+    corpus = NewsCorpus(news.assign(url="https://example.com"))
+
+    class StubCache:
+        def get_indexed(self, start_page, end_page, list_type):
+            return corpus, None
+
+    monkeypatch.setattr(agenttools, "NEWS_CACHE", StubCache())
+    result = agenttools.AG_search_news(sections=['Sports'], date_from='2024-06-01', date_to='2024-06-01')
+
+    assert result and {row["ar_pubdate"] for row in result} == {"2024-06-01"}
+    assert pd.api.types.is_datetime64_any_dtype(corpus.df['ar_pubdate'])
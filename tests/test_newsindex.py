@@ -0,0 +1,123 @@
+import random
+
+import pandas as pd
+import pytest
+
+from coding import newsindex
+from coding.newsindex import NewsIndex, tokenize
+from coding.tools import _REGEX_META, NewsCorpus, search_news
+
+WORDS = ["Taiwan", "Taiwanese", "election", "typhoon", "chip", "TSMC", "baseball", "U.S.", "(update)",
+         "台灣", "颱風", "選舉", "晶片", "棒球", "台北市", "a+b", "co-op", "100%"]
+
+
+def synthetic_news(rows=300, seed=7):
+    rng = random.Random(seed)
+
+    def text(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    return pd.DataFrame({
+        'ar_id': list(range(rows, 0, -1)),
+        'ar_section': [rng.choice(['Taiwan News', 'World News', 'Sports']) for _ in range(rows)],
+        'ar_pubdate': [f"2024-06-{rng.randint(1, 28):02d}" for _ in range(rows)],
+        'ar_head': [text(4) for _ in range(rows)],
+        'ar_desc': [text(10) for _ in range(rows)],
+    })
+
+
+def baseline_ids(df, query):
+    # The unindexed search: a case-insensitive str.contains (regex) over both text columns
+    mask = pd.Series(False, index=df.index)
+    for col in ['ar_head', 'ar_desc']:
+        mask |= df[col].astype(str).str.contains(query, case=False, na=False)
+    return set(df.loc[mask, 'ar_id'])
+
+
+def sample_queries(df, count=200, seed=3):
+    rng = random.Random(seed)
+    texts = df['ar_head'].tolist() + df['ar_desc'].tolist()
+    queries = []
+    while len(queries) < count:
+        text = rng.choice(texts)
+        start = rng.randrange(len(text))
+        queries.append(text[start:start + rng.randint(1, 12)])
+    return queries
+
+
+@pytest.fixture(autouse=True)
+def quiet_streamlit(monkeypatch):
+    monkeypatch.setattr("coding.tools.st.info", lambda *args, **kwargs: None)
+
+
+def test_index_results_are_a_superset_of_substring_matches():
+    df = synthetic_news()
+    index = NewsIndex.build(df)
+
+    # Queries search_news reads as regular expressions never reach the index
+    for query in sample_queries(df):
+        if not tokenize(query) or _REGEX_META.search(query):
+            continue
+        found = {df['ar_id'].iloc[row] for row, _ in index.search(query)}
+        assert baseline_ids(df, query) <= found, query
+
+
+@pytest.mark.parametrize("as_corpus", [False, True])
+def test_indexed_search_matches_the_full_scan(as_corpus):
+    df = synthetic_news()
+    corpus = NewsCorpus(df) if as_corpus else df
+    index = NewsIndex.build(corpus.df if as_corpus else df)
+
+    for query in sample_queries(df, count=100) + ["U.S.", "a+b", "(update)", "Taiwan|颱風", "chi?p", "zzz"]:
+        try:
+            expected = baseline_ids(df, query)
+        except Exception as e:  # not a valid regular expression, with or without the index
+            with pytest.raises(type(e)):
+                search_news(corpus, query=query, index=index)
+            continue
+        indexed = search_news(corpus, query=query, news_number=None, index=index)
+        assert set(indexed['ar_id']) == expected, query
+
+
+def test_plain_frame_rows_are_positions_not_labels():
+    df = synthetic_news(rows=50)
+    df.index = df.index[::-1] + 1000  # labels unrelated to positions
+    index = NewsIndex.build(df)
+
+    result = search_news(df, query="typhoon", news_number=None, index=index)
+
+    assert set(result['ar_id']) == baseline_ids(df, "typhoon")
+    assert len(result) == len(baseline_ids(df, "typhoon"))
+
+
+def test_query_without_matches_does_not_scan_everything():
+    df = synthetic_news()
+    index = NewsIndex.build(df)
+
+    result = search_news(df, query="nowhere", index=index)
+
+    assert result.empty
+
+
+def test_expansion_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(newsindex, "MAX_EXPANSIONS", 5)
+    index = NewsIndex.build(synthetic_news(rows=20))
+
+    for term in ["tai", "wan", "chip", "typ", "base", "ball", "elect", "ion"]:
+        index.expand('ar_head', term)
+
+    assert len(index._expansions) == 5
+    assert ('ar_head', 'ion') in index._expansions
+    assert ('ar_head', 'tai') not in index._expansions
+
+
+def test_incremental_build_reuses_and_drops_articles():
+    df = synthetic_news(rows=40)
+    old = NewsIndex.build(df.iloc[10:])
+    new = NewsIndex.build(df.iloc[:30], previous=old)
+    fresh = NewsIndex.build(df.iloc[:30])
+
+    assert new.rows == fresh.rows
+    assert new.search("typhoon 台灣") == fresh.search("typhoon 台灣")
+    # The older version is left untouched
+    assert len(old) == 30 and set(old.rows) == set(df['ar_id'].iloc[10:])
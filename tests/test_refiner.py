@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+
+import pytest
+
+from coding.agentpool import AgentPool, ask_agent
+from coding.refiner import build_batch_prompt, parse_batch_reply, refine_in_batches
+
+
+class StubModel:
+    """
+    Answers batch prompts by upper-casing every token, or with `reply` when it is set.
+    """
+
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if self.reply is not None:
+            return self.reply
+        payload = json.loads(prompt[prompt.index("{"):])
+        refined = {row_id: [token.upper() for token in tokens] for row_id, tokens in payload.items()}
+        return "```json\n" + json.dumps(refined) + "\n```"
+
+
+def test_parse_batch_reply_keeps_only_requested_list_rows():
+    reply = '{"0": ["a"], "1": "not a list", "7": ["stray"], "x": ["b"]}'
+
+    assert parse_batch_reply(reply, [0, 1]) == {0: ["a"]}
+
+
+def test_parse_batch_reply_accepts_python_literals_and_rejects_the_rest():
+    assert parse_batch_reply("{0: ['a']}", [0]) == {0: ["a"]}
+    with pytest.raises(ValueError):
+        parse_batch_reply("['a', 'b']", [0])
+    with pytest.raises(ValueError):
+        parse_batch_reply("sorry, I cannot help", [0])
+
+
+def test_batches_are_parsed_back_in_input_order():
+    ask = StubModel()
+    rows = [["a"], None, ["b", "c"], ["d"], ["e"]]
+
+    results = refine_in_batches(rows, ask, refine_one=lambda tokens: pytest.fail("no fallback expected"),
+                                batch_size=2, max_workers=2, requests_per_second=0)
+
+    assert results == [["A"], None, ["B", "C"], ["D"], ["E"]]
+    assert len(ask.prompts) == 2
+
+
+def test_malformed_batch_reply_falls_back_per_row():
+    fallback = []
+
+    def refine_one(tokens):
+        fallback.append(tokens)
+        return tokens[::-1]
+
+    results = refine_in_batches([["a", "b"], ["c", "d"]], StubModel(reply="not json"), refine_one,
+                                batch_size=2, requests_per_second=0)
+
+    assert results == [["b", "a"], ["d", "c"]]
+    assert sorted(fallback) == [["a", "b"], ["c", "d"]]
+
+
+def test_rows_missing_from_the_reply_fall_back_alone():
+    results = refine_in_batches([["a"], ["b"]], StubModel(reply='{"0": ["x"]}'), refine_one=lambda tokens: ["fb"],
+                                batch_size=2, requests_per_second=0)
+
+    assert results == [["x"], ["fb"]]
+
+
+def test_model_calls_are_rate_limited():
+    rows = [[str(i)] for i in range(6)]
+    started = time.monotonic()
+
+    refine_in_batches(rows, StubModel(), refine_one=lambda tokens: tokens,
+                      batch_size=1, max_workers=6, requests_per_second=4)
+
+    # A burst of 4, then the remaining 2 calls at 4 per second
+    assert time.monotonic() - started >= 0.45
+
+
+def test_progress_counts_cached_rows_then_each_batch():
+    reports = []
+    stored = []
+
+    results = refine_in_batches([["a"], ["b"], ["c"]], StubModel(), refine_one=lambda tokens: tokens,
+                                batch_size=1, max_workers=1, requests_per_second=0,
+                                progress=lambda done, total: reports.append((done, total)),
+                                cache_get=lambda pending: {0: ["cached"]},
+                                cache_put=stored.extend)
+
+    assert results == [["cached"], ["B"], ["C"]]
+    assert reports == [(1, 3), (2, 3), (3, 3)]
+    assert sorted(stored) == [(["b"], ["B"]), (["c"], ["C"])]
+
+
+def test_ask_agent_answers_through_the_local_model(tmp_path):
+    autogen = pytest.importorskip("autogen")
+    from coding.localllm import local_llm_config, register_local_clients
+
+    rows = [["遊戲", "王者", "榮耀"], ["新聞"]]
+    transcript = tmp_path / "refiner.json"
+    transcript.write_text(json.dumps([
+        {"role": "user", "content": build_batch_prompt(list(enumerate(rows)))},
+        {"role": "assistant", "content": json.dumps({"0": ["遊戲", "王者榮耀"], "1": ["新聞"]})},
+    ]), encoding="utf-8")
+
+    def build():
+        agent = autogen.ConversableAgent(
+            name="tokens_refiner",
+            llm_config=local_llm_config(transcript=str(transcript), latency=0, tokens_per_second=0),
+        )
+        register_local_clients(agent)
+        return (agent,)
+
+    pool = AgentPool(build)
+
+    def ask(prompt):
+        with pool.lease() as (agent,):
+            return ask_agent(agent, prompt)
+
+    threads = threading.active_count()
+    results = refine_in_batches(rows, ask, refine_one=lambda tokens: pytest.fail("no fallback expected"))
+
+    assert results == [["遊戲", "王者榮耀"], ["新聞"]]
+    # Answered on the worker thread itself: nothing left running, nothing left in the agent's history
+    assert threading.active_count() == threads
+    (agent,) = pool._idle[0]
+    assert not any(agent.chat_messages.values())
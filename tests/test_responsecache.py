@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from coding.llmcache import SQLiteCache
+from coding.responsecache import ResponseCache, normalize_prompt
+
+SCOPE = dict(lang="English", persona="storyteller", model="gemini")
+# Eleven distinct terms
+PROMPT = "tell me a story about dragon knight castle forest river night"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteCache(str(tmp_path / "responses.sqlite3"))
+
+
+@pytest.fixture
+def cache(store):
+    return ResponseCache(store)
+
+
+def test_exact_match_ignores_case_spacing_and_trailing_punctuation(cache):
+    cache.put("Tell me a  story!", "Once upon a time", **SCOPE)
+
+    assert normalize_prompt("  TELL me a story ?") == "tell me a story"
+    assert cache.get("  TELL me a story ?", **SCOPE) == "Once upon a time"
+    assert cache.stats() == {"hits": 1, "near_hits": 0, "misses": 0}
+
+
+def test_near_duplicates_hit_only_above_the_jaccard_threshold(cache):
+    cache.put(PROMPT, "A dragon story", **SCOPE)
+
+    # 11 shared terms of 12: 0.92
+    assert cache.get(PROMPT + " please", **SCOPE) == "A dragon story"
+    # 11 shared terms of 13: 0.85
+    assert cache.get(PROMPT + " please now", **SCOPE) is None
+    assert cache.stats() == {"hits": 0, "near_hits": 1, "misses": 1}
+
+
+def test_near_matching_can_be_disabled(store):
+    cache = ResponseCache(store, near_threshold=None)
+    cache.put(PROMPT, "A dragon story", **SCOPE)
+
+    assert cache.get(PROMPT + " please", **SCOPE) is None
+
+
+def test_answers_stay_in_their_scope(cache):
+    cache.put(PROMPT, "A dragon story", **SCOPE)
+
+    for other in [dict(SCOPE, lang="繁體中文"), dict(SCOPE, model="openai"), dict(lang="English")]:
+        assert cache.get(PROMPT, **other) is None
+        assert cache.get(PROMPT + " please", **other) is None
+    assert cache.get(PROMPT, **dict(reversed(list(SCOPE.items())))) == "A dragon story"
+
+
+def test_max_age_expires_an_answer_before_the_store_ttl(cache):
+    cache.put(PROMPT, "Today's news", max_age=0.05, **SCOPE)
+    cache.put("another prompt", "Timeless", **SCOPE)
+
+    assert cache.get(PROMPT, **SCOPE) == "Today's news"
+    time.sleep(0.06)
+    assert cache.get(PROMPT, **SCOPE) is None
+    assert cache.get(PROMPT + " please", **SCOPE) is None
+    assert cache.get("another prompt", **SCOPE) == "Timeless"
+
+
+def test_store_ttl_expires_near_matches_too(tmp_path):
+    cache = ResponseCache(SQLiteCache(str(tmp_path / "responses.sqlite3"), ttl=0.05))
+    cache.put(PROMPT, "A dragon story", **SCOPE)
+    time.sleep(0.06)
+
+    assert cache.get(PROMPT, **SCOPE) is None
+    assert cache.get(PROMPT + " please", **SCOPE) is None
+
+
+def test_empty_answers_are_not_cached(cache):
+    cache.put(PROMPT, "", **SCOPE)
+
+    assert cache.get(PROMPT, **SCOPE) is None
+
+
+def test_near_duplicate_index_is_rebuilt_from_the_store(store):
+    ResponseCache(store).put(PROMPT, "A dragon story", **SCOPE)
+
+    # Another process sharing the file
+    assert ResponseCache(store).get(PROMPT + " please", **SCOPE) == "A dragon story"
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from coding.tokenclean import needs_llm, refine_token_column
+
+
+def test_split_cjk_terms_need_the_model():
+    assert needs_llm(["王者", "榮", "耀"])
+    assert not needs_llm(["王者榮耀", "玩家"])
+
+
+def test_only_capitalized_latin_runs_need_the_model():
+    assert needs_llm(["Final", "Fantasy", "遊戲"])
+    assert needs_llm(["League", "of", "Legends", "LOL", "Worlds"])
+    assert not needs_llm(["game", "players", "said", "update"])
+    assert not needs_llm(["Taiwan", "players", "said"])
+
+
+def test_only_distinct_hard_lists_are_refined():
+    values = pd.Series(["['遊戲', '王者', '榮', '耀']", "['新聞', '玩家']", "['遊戲', '王者', '榮', '耀']",
+                        "['the', 'game', 'update']", None])
+    sent = []
+
+    def refine(token_lists):
+        sent.extend(token_lists)
+        return [["merged"] for _ in token_lists]
+
+    refined, stats = refine_token_column(values, refine)
+
+    assert sent == [["遊戲", "王者", "榮", "耀"]]
+    assert refined == [["merged"], ["新聞", "玩家"], ["merged"], ["the", "game", "update"], []]
+    assert stats == {"rows": 5, "distinct": 4, "sent_to_llm": 1}
@@ -0,0 +1,102 @@
+import importlib.util
+import os
+import time
+
+import pytest
+
+from coding.toolmemo import FOREVER, ToolMemo, canonical_arguments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def search(name=None, discipline=None, interest=None):
+    search.calls += 1
+    return {"name": name, "discipline": discipline, "interest": interest}
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    search.calls = 0
+
+
+def load_page(path):
+    spec = importlib.util.spec_from_file_location("two_agents_page", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_equivalent_calls_share_a_key():
+    key = canonical_arguments(search, (" Gild ",), {"discipline": ["Sociology", "Design", "Sociology"]})
+
+    assert key == canonical_arguments(search, (), {"name": "Gild", "discipline": ["Design", "Sociology"],
+                                                   "interest": None})
+    assert key != canonical_arguments(search, ("Gild",), {"discipline": ["Design"]})
+
+
+def test_canonicalized_repeats_hit_the_memo():
+    memo = ToolMemo()
+    memoized = memo.wrap(search, ttl=FOREVER)
+
+    first = memoized("Gild", discipline=["Sociology", "Design"])
+    again = memoized(name=" Gild", discipline=["Design", "Sociology", "Design"])
+
+    assert again is first
+    assert search.calls == 1
+    assert memo.stats() == {"hits": 1, "misses": 1, "entries": 1}
+    assert memoized.__name__ == "search"
+
+
+def test_ttl_zero_expiry_and_clear():
+    memo = ToolMemo()
+    assert memo.wrap(search, ttl=0) is search
+
+    memoized = memo.wrap(search, ttl=0.05)
+    memoized("Gild")
+    time.sleep(0.06)
+    memoized("Gild")
+    assert search.calls == 2
+
+    memo.clear()
+    memoized("Gild")
+    assert search.calls == 3
+
+
+def test_errors_are_not_cached():
+    memo = ToolMemo()
+    failures = []
+
+    def flaky():
+        failures.append(None)
+        if len(failures) == 1:
+            raise RuntimeError("down")
+        return "ok"
+
+    memoized = memo.wrap(flaky)
+    with pytest.raises(RuntimeError):
+        memoized()
+    assert memoized() == memoized() == "ok"
+    assert len(failures) == 2
+
+
+@pytest.mark.parametrize("setting, enabled", [(None, False), ("off", False), ("on", True), ("1", True)])
+def test_tool_memo_is_opt_in(monkeypatch, setting, enabled):
+    pytest.importorskip("autogen")
+    if setting is None:
+        monkeypatch.delenv("TOOL_MEMO", raising=False)
+    else:
+        monkeypatch.setenv("TOOL_MEMO", setting)
+    page = load_page(os.path.join(ROOT, "pages", "two_agents.py"))
+
+    assert page.TOOL_MEMO is enabled
+    student_agent, teacher_agent, tool_memo = page.build_agent_group("English", "local", memoize_tools=page.TOOL_MEMO)
+    search_expert = student_agent.function_map["AG_search_expert"]
+    search_expert(discipline=["Digital Sociology", "Information Systems Strategy"])
+    search_expert(discipline=["Information Systems Strategy", "Digital Sociology"])
+
+    if enabled:
+        assert tool_memo.stats()["hits"] == 1
+        page.reset_agents((student_agent, teacher_agent, tool_memo))
+        assert tool_memo.stats()["entries"] == 0
+    else:
+        assert tool_memo is None